@@ -0,0 +1,265 @@
+"""
+Measures the storage and query engine on synthetic tables of several sizes, and writes the results
+as json so that the numbers of two commits can be compared.
+
+Two tables are created from sql text, so their schemas go through grammar.lark like any statement:
+customer, with a primary key, and orders, whose customer_id is a foreign key to it.
+Rows are loaded by calling DatabaseRepository directly, and the queries are run both directly
+and through DatabaseManagementSystem.parse_queries, whose output is thrown away.
+
+Each size is run in a new process in its own directory, so that the peak memory (max rss) is the one of that size,
+and the startup time of load_from_instance is measured in another process once the tables are loaded.
+
+usage: python benchmark/engineBenchmark.py [--rows 1000,10000,100000,1000000] [--output FILE] [--compare FILE]
+"""
+import argparse
+import datetime
+import json
+import os
+import platform
+import random
+import resource
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from contextlib import redirect_stdout
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+RESULTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "results")
+DEFAULT_ROWS = [1000, 10000, 100000, 1000000]
+# Rows given to one call of insert_many
+BATCH_SIZE = 1000
+# Statements timed for the single row inserts and the point lookups
+STATEMENT_COUNT = 1000
+# Orders of each customer on average
+ORDERS_PER_CUSTOMER = 2
+SEED = 10371
+
+SCHEMA = [
+    "create table customer (id int, name char(20) not null, joined date, primary key (id))",
+    "create table orders (id int, customer_id int, amount int, placed date, primary key (id),"
+    " foreign key (customer_id) references customer (id))",
+]
+
+# The metrics of a size, with the unit in which they are shown, and whether more is better
+METRICS = [
+    ("bulk_insert_rows_per_s", "rows/s", True),
+    ("bulk_insert_fk_rows_per_s", "rows/s", True),
+    ("sql_insert_per_s", "stmt/s", True),
+    ("point_lookup_per_s", "lookup/s", True),
+    ("sql_point_lookup_per_s", "lookup/s", True),
+    ("full_scan_rows_per_s", "rows/s", True),
+    ("join_s", "s", False),
+    ("startup_s", "s", False),
+    ("peak_memory_kb", "kb", False),
+    ("startup_peak_memory_kb", "kb", False),
+]
+
+def random_date(chooser: random.Random) -> str:
+    return (datetime.date(2000, 1, 1) + datetime.timedelta(days=chooser.randrange(9000))).isoformat()
+
+def customer_rows(start: int, count: int, chooser: random.Random):
+    return [[str(key), f"customer{key}", random_date(chooser)] for key in range(start, start + count)]
+
+def order_rows(start: int, count: int, customer_count: int, chooser: random.Random):
+    return [
+        [str(key), str(chooser.randrange(customer_count) + 1), str(chooser.randrange(100000)), random_date(chooser)]
+        for key in range(start, start + count)
+    ]
+
+def max_rss_kb() -> int:
+    usage = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in bytes on macOS and in kilobytes elsewhere
+    return usage // 1024 if sys.platform == "darwin" else usage
+
+def drain(result) -> int:
+    """
+    Consumes a select result, which is a message or a generator of text chunks, and returns its length.
+    """
+    return len(result) if isinstance(result, str) else sum(len(chunk) for chunk in result)
+
+def insert(dbrepo, table_name: str, rows: list):
+    """
+    Inserts a batch, a benchmark of rows which were refused would measure nothing.
+    """
+    from message import Message
+    result = dbrepo.insert_many(table_name, rows, None)
+    if result != Message.InsertManyResult.get_message(len(rows)):
+        raise RuntimeError(f"insert into {table_name} failed: {result}")
+    dbrepo.end_statement()
+
+def run_sql(dbms, text: str):
+    with open(os.devnull, "w") as devnull, redirect_stdout(devnull):
+        dbms.transform_query(dbms.parse_queries(text.split(";")[:-1]))
+
+def per_second(count: int, seconds: float) -> float:
+    return round(count / seconds, 1) if seconds > 0 else 0.0
+
+def run_load(rows: int) -> dict:
+    """
+    Loads the tables with the given number of customers, runs the queries, and returns the metrics.
+    It runs in the working directory of the size, where myDB.db is created.
+    """
+    sys.path.insert(0, BASE_DIR)
+    from databaseRepository import Query, ColumnDefinition, dbrepo
+    from predicate import Column, Comparison, Value
+    from run import DatabaseManagementSystem
+
+    chooser = random.Random(SEED)
+    dbms = DatabaseManagementSystem()
+    run_sql(dbms, ";".join(SCHEMA) + ";")
+    results = {"rows" : rows}
+
+    start = time.perf_counter()
+    for first in range(1, rows + 1, BATCH_SIZE):
+        insert(dbrepo, "customer", customer_rows(first, min(BATCH_SIZE, rows + 1 - first), chooser))
+    results["bulk_insert_rows_per_s"] = per_second(rows, time.perf_counter() - start)
+
+    order_count = rows * ORDERS_PER_CUSTOMER
+    start = time.perf_counter()
+    for first in range(1, order_count + 1, BATCH_SIZE):
+        insert(dbrepo, "orders", order_rows(first, min(BATCH_SIZE, order_count + 1 - first), rows, chooser))
+    results["bulk_insert_fk_rows_per_s"] = per_second(order_count, time.perf_counter() - start)
+
+    # Single row inserts, each one a statement of its own, as a client sends them
+    statements = "".join(
+        f"insert into customer values ({row[0]}, '{row[1]}', {row[2]});"
+        for row in customer_rows(rows + 1, STATEMENT_COUNT, chooser)
+    )
+    start = time.perf_counter()
+    run_sql(dbms, statements)
+    results["sql_insert_per_s"] = per_second(STATEMENT_COUNT, time.perf_counter() - start)
+
+    keys = [chooser.randrange(rows) + 1 for _ in range(STATEMENT_COUNT)]
+    start = time.perf_counter()
+    for key in keys:
+        drain(dbrepo.select(Query(
+            select_list=[Query.Select(None, "name", None)],
+            from_clause=[Query.TableReference("customer", None)],
+            where_clause=Comparison(Column(None, "id"), "=", Value(ColumnDefinition.INT, str(key)))
+        )))
+        dbrepo.end_statement()
+    results["point_lookup_per_s"] = per_second(len(keys), time.perf_counter() - start)
+
+    statements = "".join(f"select name from customer where id = {key};" for key in keys)
+    start = time.perf_counter()
+    run_sql(dbms, statements)
+    results["sql_point_lookup_per_s"] = per_second(len(keys), time.perf_counter() - start)
+
+    # No order has a negative amount, so every row is read and none is shown
+    start = time.perf_counter()
+    run_sql(dbms, "select id from orders where amount < 0;")
+    results["full_scan_rows_per_s"] = per_second(order_count, time.perf_counter() - start)
+
+    start = time.perf_counter()
+    run_sql(dbms, "select count(*) from customer as c, orders as o where c.id = o.customer_id and o.amount < 50000;")
+    results["join_s"] = round(time.perf_counter() - start, 4)
+
+    results["peak_memory_kb"] = max_rss_kb()
+    dbrepo.close()
+    return results
+
+def run_startup() -> dict:
+    """
+    Opens the db of the size again, and times loading the tables from it.
+    """
+    sys.path.insert(0, BASE_DIR)
+    from databaseRepository import DatabaseRepository, dbrepo
+    dbrepo.close()
+    start = time.perf_counter()
+    repository = DatabaseRepository()
+    seconds = time.perf_counter() - start
+    repository.close()
+    return {"startup_s" : round(seconds, 4), "startup_peak_memory_kb" : max_rss_kb()}
+
+def run_worker(mode: str, rows: int, directory: str) -> dict:
+    """
+    Runs the load or the startup of a size in a new process, which writes its metrics to a file.
+    """
+    result_file = os.path.join(directory, f"{mode}.json")
+    subprocess.run(
+        [sys.executable, os.path.abspath(__file__), "--worker", mode, "--rows", str(rows), "--output", result_file],
+        cwd=directory, check=True
+    )
+    with open(result_file) as file:
+        return json.load(file)
+
+def get_commit() -> dict:
+    def git(*args) -> str:
+        try :
+            return subprocess.run(["git", *args], cwd=BASE_DIR, capture_output=True, text=True, check=True).stdout.strip()
+        except (OSError, subprocess.CalledProcessError):
+            return ""
+    return {"commit" : git("rev-parse", "HEAD") or None, "dirty" : git("status", "--porcelain", "--untracked-files=no") != ""}
+
+def show_results(results: list, baseline: dict):
+    """
+    Prints the metrics of each size, and the change from the baseline of the same size when there is one.
+    """
+    for result in results:
+        print(f"rows {result['rows']}")
+        previous = baseline.get(result["rows"], {})
+        for metric, unit, higher_is_better in METRICS:
+            if metric not in result:
+                continue
+            line = f"  {metric:<28} {result[metric]:>14} {unit}"
+            if previous.get(metric):
+                change = (result[metric] - previous[metric]) / previous[metric] * 100
+                worse = change < 0 if higher_is_better else change > 0
+                line += f"   {change:+.1f}%" + (" (worse)" if worse and abs(change) >= 5 else "")
+            print(line)
+
+def main():
+    argument_parser = argparse.ArgumentParser(description="Benchmark of the storage and query engine")
+    argument_parser.add_argument("--rows", default=",".join(str(rows) for rows in DEFAULT_ROWS),
+                                 help="comma separated numbers of customers, each with twice as many orders")
+    argument_parser.add_argument("--output", help="json file of the results, benchmark/results/<commit>.json by default")
+    argument_parser.add_argument("--compare", help="json file of earlier results to compare with")
+    argument_parser.add_argument("--worker", choices=["load", "startup"], help=argparse.SUPPRESS)
+    arguments = argument_parser.parse_args()
+
+    if arguments.worker is not None:
+        rows = int(arguments.rows)
+        result = run_load(rows) if arguments.worker == "load" else run_startup()
+        with open(arguments.output, "w") as file:
+            json.dump(result, file)
+        return
+
+    commit = get_commit()
+    report = {
+        **commit,
+        "started" : datetime.datetime.now().isoformat(timespec="seconds"),
+        "python" : platform.python_version(),
+        "platform" : platform.platform(),
+        "settings" : {name : value for name, value in os.environ.items() if name.startswith("MYDB_")},
+        "results" : [],
+    }
+    for rows in (int(rows) for rows in arguments.rows.split(",")):
+        directory = tempfile.mkdtemp(prefix=f"mydb-bench-{rows}-")
+        try :
+            result = run_worker("load", rows, directory)
+            result.update(run_worker("startup", rows, directory))
+        finally :
+            shutil.rmtree(directory, ignore_errors=True)
+        report["results"].append(result)
+        print(f"rows {rows} done", file=sys.stderr)
+
+    output = arguments.output
+    if output is None:
+        os.makedirs(RESULTS_DIR, exist_ok=True)
+        name = (commit["commit"] or "unknown")[:12] + ("-dirty" if commit["dirty"] else "")
+        output = os.path.join(RESULTS_DIR, name + ".json")
+    with open(output, "w") as file:
+        json.dump(report, file, indent=2)
+
+    baseline = {}
+    if arguments.compare is not None:
+        with open(arguments.compare) as file:
+            baseline = {result["rows"] : result for result in json.load(file)["results"]}
+    show_results(report["results"], baseline)
+    print(f"results are written to {output}")
+
+if __name__ == "__main__":
+    main()
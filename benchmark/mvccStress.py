@@ -0,0 +1,200 @@
+"""
+Checks that the statements which only read see consistent snapshots while other sessions write, through dbServer.
+
+The writers keep the rows of the ledger in pairs whose amounts add up to 0: each transaction inserts a pair,
+deletes one, or moves one to another group, so between two transactions the sum of every group is 0
+and the number of rows is even. One of the writers also creates and drops an index on the groups,
+which the readers may or may not use depending on the version of the tables they see.
+The readers check in a single statement each that
+    the sum of the amounts of every group is 0      (select grp, sum(amount) ... group by grp)
+    the sum of the amounts of a group is 0          (select sum(amount) ... where grp = g, by the index if it exists)
+    the number of rows is even                      (select count(*), from the row count of the snapshot)
+and some of them run a long join, during which the writers are timed to see that they are not held up.
+At the end the rows are counted against the pairs which the writers know to exist.
+
+usage: python benchmark/mvccStress.py [--seconds 10] [--writers 2] [--readers 4]
+"""
+import argparse
+import os
+import random
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from typing import List
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from dbClient import Connection
+
+SERVER = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "dbServer.py")
+GROUPS = 8
+# Rowids of a writer start at its number times this, so that the writers never insert the same key
+WRITER_RANGE = 100000000
+
+def result_rows(output: str) -> List[List[str]]:
+    """
+    The rows of a result table in the output, without its header.
+    """
+    lines = [line for line in output.splitlines() if line.startswith("|")]
+    return [[value.strip() for value in line.strip("|").split("|")] for line in lines[1:]]
+
+def to_int(value: str) -> int:
+    return 0 if value == "null" else int(value)
+
+class Stress:
+    def __init__(self, address: str, seconds: float) -> None:
+        self.address = address
+        self.deadline = time.perf_counter() + seconds
+        self.errors: List[str] = []
+        self.error_lock = threading.Lock()
+        self.write_latencies: List[float] = []
+        # Write latencies measured while a long join was running
+        self.write_latencies_during_join: List[float] = []
+        self.joins_running = 0
+        self.reads = 0
+        self.live_pairs = 0
+        self.count_lock = threading.Lock()
+
+    def fail(self, message: str):
+        with self.error_lock:
+            self.errors.append(message)
+
+    def running(self) -> bool:
+        return time.perf_counter() < self.deadline and len(self.errors) < 10
+
+    def write(self, number: int):
+        connection = Connection(self.address)
+        chooser = random.Random(number)
+        pairs = []
+        next_id = number * WRITER_RANGE
+        indexed = False
+        while self.running():
+            choice = chooser.random()
+            if number == 0 and choice < 0.05:
+                text = "drop index ledger_grp;" if indexed else "create index ledger_grp on ledger (grp);"
+                indexed = not indexed
+            elif choice < 0.6 or not pairs:
+                amount = chooser.randrange(1, 1000)
+                group = chooser.randrange(GROUPS)
+                text = (f"begin; insert into ledger values ({next_id}, {group}, {amount});"
+                        f" insert into ledger values ({next_id + 1}, {group}, {-amount}); commit;")
+                pairs.append(next_id)
+                next_id += 2
+            elif choice < 0.8:
+                first = pairs.pop(chooser.randrange(len(pairs)))
+                text = f"begin; delete from ledger where id = {first}; delete from ledger where id = {first + 1}; commit;"
+            else :
+                first = chooser.choice(pairs)
+                group = chooser.randrange(GROUPS)
+                text = (f"begin; update ledger set grp = {group} where id = {first};"
+                        f" update ledger set grp = {group} where id = {first + 1}; commit;")
+            start = time.perf_counter()
+            output = connection.execute(text)
+            latency = time.perf_counter() - start
+            if "failed" in output or "error" in output.lower() or "No such" in output:
+                self.fail(f"writer {number}: {text} -> {output.strip()}")
+            with self.count_lock:
+                self.write_latencies.append(latency)
+                if self.joins_running > 0:
+                    self.write_latencies_during_join.append(latency)
+        with self.count_lock:
+            self.live_pairs += len(pairs)
+        connection.close()
+
+    def read(self, number: int):
+        connection = Connection(self.address)
+        chooser = random.Random(1000 + number)
+        while self.running():
+            choice = chooser.random()
+            if choice < 0.3:
+                for group, total in result_rows(connection.execute("select grp, sum(amount) from ledger group by grp;")):
+                    if to_int(total) != 0:
+                        self.fail(f"reader {number}: the sum of group {group} is {total}")
+            elif choice < 0.6:
+                group = chooser.randrange(GROUPS)
+                rows = result_rows(connection.execute(f"select sum(amount) from ledger where grp = {group};"))
+                if len(rows) != 1 or to_int(rows[0][0]) != 0:
+                    self.fail(f"reader {number}: the sum of group {group} is {rows}")
+            elif choice < 0.9 or number != 0:
+                rows = result_rows(connection.execute("select count(*) from ledger;"))
+                if len(rows) != 1 or to_int(rows[0][0]) % 2 != 0:
+                    self.fail(f"reader {number}: the row count is {rows}")
+            else :
+                with self.count_lock:
+                    self.joins_running += 1
+                try :
+                    rows = result_rows(connection.execute(
+                        "select a.grp, sum(b.amount) from ledger as a, ledger as b where a.id = b.id group by a.grp;"
+                    ))
+                finally :
+                    with self.count_lock:
+                        self.joins_running -= 1
+                for group, total in rows:
+                    if to_int(total) != 0:
+                        self.fail(f"reader {number}: the joined sum of group {group} is {total}")
+            with self.count_lock:
+                self.reads += 1
+        connection.close()
+
+    def check_final(self):
+        connection = Connection(self.address)
+        rows = result_rows(connection.execute("select count(*), sum(amount) from ledger;"))
+        connection.close()
+        count, total = to_int(rows[0][0]), to_int(rows[0][1])
+        if count != 2 * self.live_pairs or total != 0:
+            self.fail(f"final: {count} rows with sum {total}, expected {2 * self.live_pairs} rows with sum 0")
+
+def percentile(values: List[float], fraction: float) -> float:
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * fraction))]
+
+def main():
+    argument_parser = argparse.ArgumentParser(description="Stress test of the snapshots of dbServer")
+    argument_parser.add_argument("--seconds", type=float, default=10)
+    argument_parser.add_argument("--writers", type=int, default=2)
+    argument_parser.add_argument("--readers", type=int, default=4)
+    arguments = argument_parser.parse_args()
+
+    directory = tempfile.mkdtemp(prefix="mydb-stress-")
+    address = os.path.join(directory, "server.sock")
+    server = subprocess.Popen([sys.executable, SERVER, "--unix", address], cwd=directory)
+    try :
+        while not os.path.exists(address):
+            if server.poll() is not None:
+                sys.exit("the server has stopped")
+            time.sleep(0.1)
+        connection = Connection(address)
+        connection.execute("create table ledger (id int, grp int, amount int, primary key (id));")
+        connection.close()
+
+        stress = Stress(address, arguments.seconds)
+        threads = [threading.Thread(target=stress.write, args=(number,)) for number in range(arguments.writers)]
+        threads += [threading.Thread(target=stress.read, args=(number,)) for number in range(arguments.readers)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        stress.check_final()
+    finally :
+        server.terminate()
+        server.wait()
+        shutil.rmtree(directory, ignore_errors=True)
+
+    print(f"write transactions   {len(stress.write_latencies)}")
+    print(f"read statements      {stress.reads}")
+    print(f"write latency        p50 {percentile(stress.write_latencies, 0.5) * 1000:.1f} ms"
+          f"   p99 {percentile(stress.write_latencies, 0.99) * 1000:.1f} ms")
+    print(f"  during long joins  p50 {percentile(stress.write_latencies_during_join, 0.5) * 1000:.1f} ms"
+          f"   p99 {percentile(stress.write_latencies_during_join, 0.99) * 1000:.1f} ms"
+          f"   ({len(stress.write_latencies_during_join)} transactions)")
+    for error in stress.errors:
+        print(error)
+    print("failed" if stress.errors else "passed")
+    sys.exit(1 if stress.errors else 0)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,56 @@
+"""
+Compares the parser which was used before (earley, built on every start)
+with the cached lalr parser, on the start time and on the time to parse a statement.
+
+usage: python benchmark/parserBenchmark.py [repeat]
+"""
+import os
+import sys
+import time
+from lark import Lark
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from sqlParser import GRAMMAR_FILE, PARSER_CACHE_FILE, load_parser
+
+STATEMENTS = [
+    "create table account (id int, name char(20) not null, opened date, primary key (id));",
+    "insert into account values (1, 'kim', 2020-01-01), (2, 'lee', 2021-02-03);",
+    "select a.name as owner, t.amount from account as a, transfer as t where a.id = t.account_id and (t.amount > 100 or t.memo is not null);",
+    "update account set name = 'park' where id = 2;",
+    "delete from account where opened < 2020-06-01 and not name = 'kim';",
+]
+
+def earley_parser() -> Lark:
+    with open(GRAMMAR_FILE) as file:
+        return Lark(file.read(), start="command", lexer="basic")
+
+def time_build(build, repeat: int) -> float:
+    start = time.perf_counter()
+    for _ in range(repeat):
+        build()
+    return (time.perf_counter() - start) / repeat
+
+def time_parse(parser: Lark, repeat: int) -> float:
+    start = time.perf_counter()
+    for _ in range(repeat):
+        for statement in STATEMENTS:
+            parser.parse(statement)
+    return (time.perf_counter() - start) / (repeat * len(STATEMENTS))
+
+def main():
+    repeat = int(sys.argv[1]) if len(sys.argv) > 1 else 20
+    if os.path.exists(PARSER_CACHE_FILE):
+        os.remove(PARSER_CACHE_FILE)
+
+    results = [
+        ("earley build", time_build(earley_parser, repeat)),
+        ("lalr build without cache", time_build(lambda: load_parser(cache=False), repeat)),
+        ("lalr build from cache", time_build(load_parser, repeat)),
+        ("earley parse per statement", time_parse(earley_parser(), repeat)),
+        ("lalr parse per statement", time_parse(load_parser(), repeat)),
+    ]
+    for name, seconds in results:
+        print(f"{name:<28} {seconds * 1000:9.3f} ms")
+
+if __name__ == "__main__":
+    main()
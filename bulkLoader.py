@@ -0,0 +1,83 @@
+import csv
+import re
+from typing import Iterable, List, Optional
+from message import Message
+
+# Number of rows which are validated and written to the db at once
+BATCH_SIZE = 1000
+
+# A field which is null, so that it is told apart from an empty text.
+# A text of backslashes followed by N is written with one more backslash
+NULL_FIELD = "\\N"
+ESCAPED_PATTERN = re.compile(r"\\+N")
+
+class FileFormatError(Exception):
+    """
+    Raised when a line of a file can not be read, message is the one to show to the user.
+    """
+    def __init__(self, message: str) -> None:
+        super().__init__(message)
+        self.message = message
+
+class BulkLoader:
+    """
+    Streams csv/tsv files in and out of the database.
+    Files are read and written one record at a time, so only a single batch of rows is in memory.
+    Files with the .tsv extension are tab separated, the others are comma separated.
+    """
+
+    def get_delimiter(file_path: str) -> str:
+        return "\t" if file_path.lower().endswith(".tsv") else ","
+
+    def read_field(field: str) -> Optional[str]:
+        if field == NULL_FIELD:
+            return None
+        if ESCAPED_PATTERN.fullmatch(field) is not None:
+            return field[1:]
+        return field
+
+    def write_field(value: Optional[str]) -> str:
+        if value is None:
+            return NULL_FIELD
+        if ESCAPED_PATTERN.fullmatch(value) is not None:
+            return "\\" + value
+        return value
+
+    def read_batches(file_path: str, header: List[str], batch_size: int = BATCH_SIZE):
+        """
+        Yields lists of (line number, values) from the file, a \\N field is read as null.
+        The first line is skipped if it is the header of the table.
+        The file is decoded line by line, so that a line which is not utf-8 text is known by its number:
+        FileFormatError is raised for it, and for a line which is not valid csv.
+        """
+        with open(file_path, 'rb') as file:
+            reader = csv.reader((line.decode('utf-8') for line in file), delimiter=BulkLoader.get_delimiter(file_path))
+            batch = []
+            try :
+                for record in reader:
+                    if reader.line_num == 1 and [value.strip().lower() for value in record] == header:
+                        continue
+                    batch.append((reader.line_num, [BulkLoader.read_field(value) for value in record]))
+                    if len(batch) == batch_size:
+                        yield batch
+                        batch = []
+            except UnicodeDecodeError:
+                raise FileFormatError(Message.LoadDataEncodingError.get_message(reader.line_num + 1))
+            except csv.Error:
+                raise FileFormatError(Message.LoadDataFormatError.get_message(reader.line_num))
+            if batch:
+                yield batch
+
+    def write_rows(file_path: str, header: List[str], rows: Iterable[List[Optional[str]]]) -> int:
+        """
+        Writes the header and the rows to the file, null is written as a \\N field.
+        Returns the number of written rows.
+        """
+        count = 0
+        with open(file_path, 'w', newline='') as file:
+            writer = csv.writer(file, delimiter=BulkLoader.get_delimiter(file_path))
+            writer.writerow(header)
+            for row in rows:
+                writer.writerow([BulkLoader.write_field(value) for value in row])
+                count += 1
+        return count
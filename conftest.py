@@ -0,0 +1,44 @@
+import os
+import tempfile
+import pytest
+
+# databaseRepository opens myDB.db in the working directory as soon as it is imported,
+# so the modules are imported in a directory of their own
+os.chdir(tempfile.mkdtemp(prefix="mydb-test-"))
+
+import database
+import databaseRepository
+from databaseRepository import DatabaseRepository
+from run import DatabaseManagementSystem, PROMPT_CONST
+
+@pytest.fixture
+def db_files(tmp_path):
+    """
+    Writes the files of the db before the repository opens it, none by default.
+    A test module overrides it to open a db of an older layout.
+    """
+    return None
+
+@pytest.fixture
+def repo(tmp_path, monkeypatch, db_files):
+    """
+    A repository on the db in the directory of the test, a new one by default, which the statements and the schemas use.
+    """
+    monkeypatch.chdir(tmp_path)
+    repository = DatabaseRepository()
+    monkeypatch.setattr(database, "dbrepo", repository)
+    monkeypatch.setattr(databaseRepository, "dbrepo", repository)
+    yield repository
+    repository.close()
+
+@pytest.fixture
+def run_sql(repo, capsys):
+    """
+    Runs the statements of a line of the prompt, and returns the lines they print without the prompt.
+    """
+    dbms = DatabaseManagementSystem()
+    def run(text: str):
+        capsys.readouterr()
+        dbms.transform_query(dbms.parse_queries(text.split(";")[:-1]))
+        return [line.replace(PROMPT_CONST, "", 1) for line in capsys.readouterr().out.splitlines()]
+    return run
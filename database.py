@@ -1,6 +1,9 @@
 from lark import Tree, Token
-from typing import List, Union, Optional
+from typing import Iterator, List, Tuple, Union, Optional
 from databaseRepository import ColumnDefinition, TableConstraint, Query, dbrepo
+from predicate import Predicate, Column, Value, Comparison, NullTest, And, Or, Not, QueryError
+from profiler import profiler
+from message import Message
 
 class Parser:
     """
@@ -14,6 +17,9 @@ class Parser:
     def parse_table_name(item: Tree) -> Token:
         return item.children[0].lower()
     
+    def parse_index_name(item: Tree) -> Token:
+        return item.children[0].lower()
+    
     def parse_table_element_list(item: Tree) -> List[Union[ColumnDefinition, TableConstraint]]:
         li = []
         for child in item.children[1:-1] :
@@ -50,16 +56,19 @@ class Parser:
             li.append(column.children[0].lower())
         return li
 
-    def parse_value_list(item: Tree):
+    def parse_update_value(item: Tree) -> Optional[Value]:
+        """
+        Returns the new value, None for null.
+        """
+        value = item.children[0]
+        if isinstance(value, Token):
+            return None
+        return Parser.parse_comparable_value(value)
+
+    def parse_value_list(item: Tree) -> Optional[List[Value]]:
         if item is None:
             return None
-        li = []
-        for column in item.children[1:-1]:
-            if column.children[0].type == "STR":
-                li.append(column.children[0][1:-1])
-            else :
-                li.append(column.children[0])
-        return li
+        return [Parser.parse_comparable_value(column) for column in item.children[1:-1]]
     
     def parse_column_definition(item: Tree) -> ColumnDefinition:
         data_type, data_len = Parser.parse_data_type(item.children[1])
@@ -76,20 +85,80 @@ class Parser:
         else :
             return item.children[0], item.children[2]
 
+    def parse_query(select_list: Tree, table_expression: Tree) -> Query:
+        return Query(
+            select_list=Parser.parse_select_list(select_list),
+            from_clause=Parser.parse_from_clause(table_expression.children[0]),
+            where_clause=Parser.parse_where_clause(table_expression.children[1]),
+            group_by=Parser.parse_group_by_clause(table_expression.children[2]),
+            order_by=Parser.parse_order_by_clause(table_expression.children[3]),
+            limit=Parser.parse_limit_clause(table_expression.children[4])
+        )
+
     def parse_select_list(item: Tree):
+        """
+        Returns the selected columns, an empty list means '*'.
+        """
         li = []
         for child in item.children:
-            if child.data == "STR":
-                li.append(Query.Select(child[1:-1]))
-            else :
-                li.append(Query.Select(child))
+            if isinstance(child.children[0], Tree) and child.children[0].data == "aggregate":
+                li.append(Parser.parse_aggregate(child))
+                continue
+            table_name, column_name, _, alias = child.children
+            li.append(Query.Select(
+                table_name=Parser.parse_table_name(table_name) if table_name is not None else None,
+                column_name=column_name.children[0].lower(),
+                alias=alias.children[0].lower() if alias is not None else None
+            ))
         return li
 
+    def parse_aggregate(item: Tree) -> Query.Select:
+        aggregate, _, alias = item.children
+        argument = aggregate.children[2]
+        column = Parser.parse_column_reference(*argument.children) if argument.children else None
+        return Query.Select(
+            table_name=column.table_name if column is not None else None,
+            column_name=column.column_name if column is not None else None,
+            alias=alias.children[0].lower() if alias is not None else None,
+            aggregate=aggregate.children[0].children[0].lower()
+        )
+
+    def parse_group_by_clause(item: Optional[Tree]) -> List[Column]:
+        if item is None:
+            return []
+        return [Parser.parse_column_reference(*child.children) for child in item.children[2:]]
+
+    def parse_order_by_clause(item: Optional[Tree]) -> List[Tuple[Column, bool]]:
+        """
+        Returns the (column, descending) of each sort key.
+        """
+        if item is None:
+            return []
+        li = []
+        for child in item.children[2:]:
+            column_reference, direction = child.children
+            li.append((
+                Parser.parse_column_reference(*column_reference.children),
+                direction is not None and direction.type == "DESC"
+            ))
+        return li
+
+    def parse_limit_clause(item: Optional[Tree]) -> Optional[int]:
+        """
+        The limit is an INT token, but a value bound to a parameter may be a string or a date.
+        """
+        if item is None:
+            return None
+        token = item.children[1]
+        if token.type != "INT":
+            raise QueryError(Message.SelectLimitError.get_message())
+        return int(token)
+
     def parse_from_clause(item: Tree):
         li = []
-        for child in item.children[1:]:
-            table_name = child.children[0].children[0].children[0].lower()
-            ref_name = child.children[0].children[2]
+        for child in item.children[1].children:
+            table_name = child.children[0].children[0].lower()
+            ref_name = child.children[2]
             if ref_name is not None:
                 ref_name = ref_name.children[0].lower()
             li.append(Query.TableReference(
@@ -98,8 +167,61 @@ class Parser:
             ))
         return li
 
-    def parse_where_clause(item):
-        pass
+    def parse_file_path(item: Token) -> str:
+        return item[1:-1]
+
+    def parse_where_clause(item: Optional[Tree]) -> Optional[Predicate]:
+        if item is None:
+            return None
+        return Parser.parse_boolean_expr(item.children[1])
+
+    def parse_boolean_expr(item: Tree) -> Predicate:
+        terms = [Parser.parse_boolean_term(child) for child in item.children if type(child) == Tree]
+        return terms[0] if len(terms) == 1 else Or(terms)
+
+    def parse_boolean_term(item: Tree) -> Predicate:
+        factors = [Parser.parse_boolean_factor(child) for child in item.children if type(child) == Tree]
+        return factors[0] if len(factors) == 1 else And(factors)
+
+    def parse_boolean_factor(item: Tree) -> Predicate:
+        test = item.children[1].children[0]
+        if test.data == "parenthesized_boolean_expr":
+            predicate = Parser.parse_boolean_expr(test.children[1])
+        else :
+            predicate = Parser.parse_predicate(test.children[0])
+        return predicate if item.children[0] is None else Not(predicate)
+
+    def parse_predicate(item: Tree) -> Predicate:
+        if item.data == "comparison_predicate":
+            return Comparison(
+                left=Parser.parse_comp_operand(item.children[0]),
+                op=item.children[1].children[0].value,
+                right=Parser.parse_comp_operand(item.children[2])
+            )
+        null_operation = item.children[2]
+        return NullTest(
+            column=Parser.parse_column_reference(item.children[0], item.children[1]),
+            is_null=null_operation.children[1] is None
+        )
+
+    def parse_comp_operand(item: Tree) -> Union[Column, Value]:
+        if len(item.children) == 1:
+            return Parser.parse_comparable_value(item.children[0])
+        return Parser.parse_column_reference(item.children[0], item.children[1])
+
+    def parse_column_reference(table_name: Optional[Tree], column_name: Tree) -> Column:
+        return Column(
+            table_name=Parser.parse_table_name(table_name) if table_name is not None else None,
+            column_name=column_name.children[0].lower()
+        )
+
+    def parse_comparable_value(item: Tree) -> Value:
+        token = item.children[0]
+        if token.type == "STR":
+            return Value(ColumnDefinition.CHAR, token[1:-1])
+        elif token.type == "DATE":
+            return Value(ColumnDefinition.DATE, token.value)
+        return Value(ColumnDefinition.INT, token.value)
 
 class Database:
     """
@@ -127,33 +249,112 @@ class Database:
         table_name = Parser.parse_table_name(items[2])
         return dbrepo.drop_table(table_name)
         
-    def select(self, items: List[Union[Tree, Token]]) -> Optional[str]:
-        select_list = Parser.parse_select_list(items[1])
-        from_clause = Parser.parse_from_clause(items[2].children[0])
-        where_clause = Parser.parse_where_clause(items[2].children[1])
-        return dbrepo.select(Query(
-            select_list=select_list,
-            from_clause=from_clause,
-            where_clause=where_clause
-        ))
+    def select(self, items: List[Union[Tree, Token]]) -> Union[str, Iterator[str]]:
+        try :
+            query = Parser.parse_query(items[1], items[2])
+        except QueryError as error:
+            return error.message
+        return dbrepo.select(query)
         
     def insert(self, items: List[Union[Tree, Token]]) -> Optional[str]:
         table_name = Parser.parse_table_name(items[2])
         column_list = Parser.parse_column_list(items[3])
-        row = Parser.parse_value_list(items[5])
-        return dbrepo.insert(table_name, row, column_list)
+        rows = [Parser.parse_value_list(item) for item in items[5:]]
+        if len(rows) == 1 :
+            return dbrepo.insert(table_name, rows[0], column_list)
+        return dbrepo.insert_many(table_name, rows, column_list)
         
     def explain(self, items: List[Union[Tree, Token]]) -> Optional[str]:
         table_name = Parser.parse_table_name(items[1])
         return dbrepo.explain(table_name)
         
+    def explain_select(self, items: List[Union[Tree, Token]]) -> Optional[str]:
+        try :
+            query = Parser.parse_query(items[2], items[3])
+        except QueryError as error:
+            return error.message
+        return dbrepo.explain_select(query)
+        
+    def analyze(self, items: List[Union[Tree, Token]]) -> Optional[str]:
+        table_name = Parser.parse_table_name(items[1])
+        return dbrepo.analyze(table_name)
+        
     def show_tables(self, items: List[Union[Tree, Token]]) -> Optional[str]:
         return dbrepo.show_tables()
         
     def delete(self, items: List[Union[Tree, Token]]) -> Optional[str]:
-        self.pretty_print(items)
+        table_name = Parser.parse_table_name(items[2])
+        where_clause = Parser.parse_where_clause(items[3])
+        return dbrepo.delete(table_name, where_clause)
         
     def update_tables(self, items: List[Union[Tree, Token]]) -> Optional[str]:
-        self.pretty_print(items)
+        table_name = Parser.parse_table_name(items[1])
+        column_name = items[3].children[0].lower()
+        value = Parser.parse_update_value(items[5])
+        where_clause = Parser.parse_where_clause(items[6])
+        return dbrepo.update_tables(table_name, column_name, value, where_clause)
+        
+    def load_data(self, items: List[Union[Tree, Token]]) -> Optional[str]:
+        file_path = Parser.parse_file_path(items[2])
+        table_name = Parser.parse_table_name(items[4])
+        return dbrepo.load_data(file_path, table_name)
+        
+    def copy_table(self, items: List[Union[Tree, Token]]) -> Optional[str]:
+        table_name = Parser.parse_table_name(items[1])
+        file_path = Parser.parse_file_path(items[3])
+        return dbrepo.copy_table(table_name, file_path)
+        
+    def create_index(self, items: List[Union[Tree, Token]]) -> Optional[str]:
+        index_name = Parser.parse_index_name(items[2])
+        table_name = Parser.parse_table_name(items[4])
+        column_list = Parser.parse_column_list(items[5])
+        return dbrepo.create_index(index_name, table_name, column_list)
+        
+    def drop_index(self, items: List[Union[Tree, Token]]) -> Optional[str]:
+        index_name = Parser.parse_index_name(items[2])
+        return dbrepo.drop_index(index_name)
+        
+    def begin(self, items: List[Union[Tree, Token]]) -> Optional[str]:
+        return dbrepo.begin()
+        
+    def commit(self, items: List[Union[Tree, Token]]) -> Optional[str]:
+        return dbrepo.commit()
+        
+    def rollback(self, items: List[Union[Tree, Token]]) -> Optional[str]:
+        return dbrepo.rollback()
+    
+    def set_profiling(self, items: List[Union[Tree, Token]]) -> Optional[str]:
+        enabled = items[2].type == "ON"
+        profiler.set_enabled(enabled)
+        return Message.ProfilingEnabled.get_message() if enabled else Message.ProfilingDisabled.get_message()
+        
+    def show_profile(self, items: List[Union[Tree, Token]]) -> Optional[str]:
+        text = profiler.show_profile()
+        return Message.NoProfileError.get_message() if text is None else text
+    
+    # Called after every statement, commits its writes unless a transaction is in progress
+    def end_statement(self):
+        dbrepo.end_statement()
+    
+    # Called instead of end_statement after a statement which failed, undoes its writes
+    def abort_statement(self):
+        dbrepo.abort_statement()
+    
+    # Called after every batch of statements, writes the records kept by write behind when they are due
+    def end_batch(self):
+        dbrepo.end_batch()
+    
+    def has_pending_writes(self) -> bool:
+        return dbrepo.has_pending_writes()
+    
+    # Begins a statement which only reads in a snapshot, beside the writers
+    def begin_read(self) -> bool:
+        return dbrepo.begin_read()
+    
+    def in_transaction(self) -> bool:
+        return dbrepo.in_transaction()
+    
+    def close(self):
+        dbrepo.close()
 
 myDatabase = Database()
\ No newline at end of file
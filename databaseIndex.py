@@ -0,0 +1,78 @@
+from typing import List, Optional
+
+# Order preserving encoding of the typed key values.
+# A null sorts before every value, ints and date ordinals are stored as 8 byte big endian numbers shifted by 2^63,
+# and texts are terminated by \x00\x00 (a \x00 inside of a text is escaped to \x00\xff).
+# So the byte order of encoded keys is the order of the values, and no encoded key is a prefix of another.
+NULL_MARK = b"\x00"
+VALUE_MARK = b"\x01"
+INT_OFFSET = 1 << 63
+
+def encode_int(value) -> bytes:
+    return VALUE_MARK + (int(value) + INT_OFFSET).to_bytes(8, 'big')
+
+def encode_text(value) -> bytes:
+    return VALUE_MARK + str(value).encode('utf-8').replace(b"\x00", b"\x00\xff") + b"\x00\x00"
+
+ENCODERS = {
+    "int" : encode_int,
+    "char" : encode_text,
+    "date" : encode_int,
+}
+
+class Index:
+    """
+    Index over one or more columns of a table.
+    Each row has an entry <encoded key><rowid> in the db, so the entries of equal keys are adjacent
+    and the rows can be found by seeking the encoded key in the b-tree.
+    Must be set up with the schema of the table before it is used.
+    The indexes of the primary key and of the foreign keys are made by the database itself,
+    the ones of the foreign keys are named with a number, which a created index can not have.
+    """
+    PRIMARY = "primary"
+    FOREIGN_KEY = "foreign"
+
+    def __init__(self, index_name: str, column_list: List[str], unique: bool = False) -> None:
+        self.index_name = index_name
+        self.column_list = column_list
+        self.unique = unique
+        self.positions = None
+        self.encoders = None
+
+    def setup(self, schema):
+        self.positions = [schema.columns.index(column_name) for column_name in self.column_list]
+        self.encoders = [ENCODERS[schema.get_column(column_name).data_type] for column_name in self.column_list]
+
+    def foreign_key_name(number: int) -> str:
+        return f"{Index.FOREIGN_KEY}{number}"
+
+    def is_internal(self) -> bool:
+        if self.index_name == Index.PRIMARY:
+            return True
+        return self.index_name.startswith(Index.FOREIGN_KEY) and self.index_name[len(Index.FOREIGN_KEY):].isdigit()
+
+    def to_dict(self):
+        return {
+            "index_name" : self.index_name,
+            "column_list" : self.column_list,
+            "unique" : self.unique
+        }
+
+    def from_dict(item: dict):
+        return Index(
+            index_name=item["index_name"],
+            column_list=item["column_list"],
+            unique=item["unique"]
+        )
+
+    def encode(self, values: list) -> bytes:
+        """
+        Encode the values of the indexed columns, given in the order of column_list.
+        """
+        key = b""
+        for encoder, value in zip(self.encoders, values):
+            key += NULL_MARK if value is None else encoder(value)
+        return key
+
+    def encode_row(self, row: list) -> bytes:
+        return self.encode([row[position] for position in self.positions])
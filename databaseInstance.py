@@ -1,34 +1,656 @@
 from berkeleydb import db
 import json
+import os
+import threading
+from typing import List, Optional
+from profiler import profiled, profiler
+from writeBuffer import WriteBuffer, DELETED
+
+DB_FILE = 'myDB.db'
+# Write ahead log of the transactions, next to DB_FILE
+LOG_DIR = 'myDB.log'
+
+# MYDB_TRANSACTIONS=off opens the db without an environment, as it was before transactions.
+# MYDB_DURABILITY is what a commit waits for:
+#   sync          the log is written and flushed to the disk (a commit survives a crash of the machine)
+#   write_nosync  the log is written to the os, not flushed (a commit survives a crash of the process)
+#   nosync        the log is kept in memory until its buffer is full (a commit may be lost, the db stays consistent)
+TRANSACTIONAL = os.environ.get("MYDB_TRANSACTIONS", "on").lower() != "off"
+DURABILITY = os.environ.get("MYDB_DURABILITY", "sync").lower()
+DURABILITY_FLAGS = {
+    "sync" : 0,
+    "write_nosync" : db.DB_TXN_WRITE_NOSYNC,
+    "nosync" : db.DB_TXN_NOSYNC,
+}
+# A transaction holds a lock on every page it touches, so a large load in one transaction needs many of them
+LOCK_LIMIT = 1000000
+# Cache of the pages, which also holds the older versions of the pages that the snapshots still read
+CACHE_SIZE = int(os.environ.get("MYDB_CACHE_MB", "64")) * 1024 * 1024
+
+# Every record is stored in one B-tree under a namespace prefix, so the records of a table are adjacent.
+#   schema\x00<table_name>              -> schema of the table
+#   row\x00<table_name>\x00<rowid>      -> one row of the table packed by rowCodec (rowid is 8 bytes big endian)
+#   index\x00<table_name>\x00<index_name>\x00<key><rowid>
+#                                       -> empty, one entry of an index (the key is encoded by databaseIndex)
+#   meta\x00format                      -> version of this layout
+#   count\x00<table_name>               -> number of rows of the table (8 bytes big endian), absent while it is not up to date
+#   stats\x00<table_name>               -> statistics of the columns of the table, as json
+SEPARATOR = b"\x00"
+SCHEMA_PREFIX = b"schema" + SEPARATOR
+ROW_PREFIX = b"row" + SEPARATOR
+INDEX_PREFIX = b"index" + SEPARATOR
+FORMAT_KEY = b"meta" + SEPARATOR + b"format"
+COUNT_PREFIX = b"count" + SEPARATOR
+STATS_PREFIX = b"stats" + SEPARATOR
+FORMAT_VERSION = 2
+# Version of the layout whose rows are json lists of texts
+JSON_ROWS_VERSION = 1
+ROWID_SIZE = 8
 
 class DatabaseInstance:
     """
-    This class only have responsibility to storing the table_name and table_dict as key/value data
-    When the instance is initialized, it will load the tables from berkeley db
+    This class only have responsibility to storing the schemas and rows of the tables as key/value data
+    Each row is stored as its own record, so that an insert only writes the new row.
+    The records of the rows are given and returned encoded, only the repository knows the schemas to decode them.
+    When the instance is initialized, the old layout (one json blob per table) is migrated if it exists.
+    format_version tells the repository whether the rows are still to be converted to the current layout.
+
+    When TRANSACTIONAL, the db is opened in an environment with a write ahead log, and every access
+    goes through the current transaction (txn). A statement out of BEGIN gets its own transaction
+    on its first access, which end_statement commits, so the writes of a statement are flushed to the log at once.
+    Between BEGIN and COMMIT every statement runs in a child of the same transaction, so they are flushed at once by COMMIT.
+    A statement which fails is aborted (abort_statement): its transaction, or its child one in BEGIN,
+    so that it changes nothing, and in BEGIN the statements before it are kept.
+    The transaction is kept per thread, so the threads of the server each run their statements in their own.
+
+    With write behind (see writeBuffer), the records written out of BEGIN are kept in write_buffer instead, and
+    written in one transaction when it is due. Reads see them: a get looks them up and a cursor merges them in.
+    In a transaction of BEGIN the records are written to its transaction as usual, so that ROLLBACK undoes them.
+
+    The db is multiversion when TRANSACTIONAL, so a statement which only reads may run in a snapshot (begin_snapshot):
+    it reads the records as they were committed when it began, without taking locks, so it neither waits for
+    the writers nor makes them wait. A page which a writer changes is copied, and the copy is freed once
+    no snapshot reads it. The kept records of write behind are not in any snapshot.
     """
     def __init__(self) -> None:
-        self.mydb = db.DB()
-        self.mydb.open('myDB.db', dbtype=db.DB_HASH, flags=db.DB_CREATE)
+        if os.path.exists(DB_FILE) and self.get_db_type(DB_FILE) == db.DB_HASH :
+            self.migrate_legacy(DB_FILE)
+        self.env = self.open_env() if TRANSACTIONAL else None
+        self.local = threading.local()
+        self.write_buffer = WriteBuffer()
+        self.mydb = self.open_db(DB_FILE, self.env)
+        format_version = self.get(FORMAT_KEY)
+        if format_version is None :
+            self.set_format_version(FORMAT_VERSION)
+        else :
+            self.format_version = int(format_version)
+        self.end_statement()
 
-    def get_cursor(self) :
-        return self.mydb.cursor()
-    
-    def getTableDict(self) -> dict:
-        tables = {}
-        cursor = self.get_cursor()
+    @property
+    def txn(self):
+        return getattr(self.local, "txn", None)
+
+    @txn.setter
+    def txn(self, txn):
+        self.local.txn = txn
+
+    # The child transaction of the statement which is running in a transaction of BEGIN
+    @property
+    def statement_txn(self):
+        return getattr(self.local, "statement_txn", None)
+
+    @statement_txn.setter
+    def statement_txn(self, txn):
+        self.local.statement_txn = txn
+
+    # Whether txn was begun by BEGIN, instead of by a statement
+    @property
+    def explicit(self) -> bool:
+        return getattr(self.local, "explicit", False)
+
+    @explicit.setter
+    def explicit(self, explicit: bool):
+        self.local.explicit = explicit
+
+    # Whether txn is the snapshot of a statement which only reads
+    @property
+    def snapshot(self) -> bool:
+        return getattr(self.local, "snapshot", False)
+
+    @snapshot.setter
+    def snapshot(self, snapshot: bool):
+        self.local.snapshot = snapshot
+
+    @profiled("storage write")
+    def set_format_version(self, version: int):
+        self.put(FORMAT_KEY, str(version).encode('utf-8'))
+        self.format_version = version
+
+    def open_env(self):
+        """
+        Open the environment of DB_FILE in the working directory.
+        The committed transactions of a run which crashed are recovered from the log.
+        """
+        os.makedirs(LOG_DIR, exist_ok=True)
+        env = db.DBEnv()
+        env.set_lg_dir(LOG_DIR)
+        env.set_lk_max_locks(LOCK_LIMIT)
+        env.set_lk_max_objects(LOCK_LIMIT)
+        env.set_cachesize(0, CACHE_SIZE, 1)
+        if DURABILITY_FLAGS[DURABILITY] :
+            env.set_flags(DURABILITY_FLAGS[DURABILITY], 1)
+        env.open(
+            ".",
+            db.DB_CREATE | db.DB_INIT_MPOOL | db.DB_INIT_LOCK | db.DB_INIT_LOG | db.DB_INIT_TXN | db.DB_RECOVER | db.DB_PRIVATE | db.DB_THREAD
+        )
+        env.log_set_config(db.DB_LOG_AUTO_REMOVE, 1)
+        return env
+
+    def open_db(self, file_name: str, env = None):
+        mydb = db.DB(env)
+        mydb.set_get_returns_none(2)
+        flags = db.DB_CREATE | db.DB_THREAD if env is None else db.DB_CREATE | db.DB_THREAD | db.DB_AUTO_COMMIT | db.DB_MULTIVERSION
+        mydb.open(file_name, dbtype=db.DB_BTREE, flags=flags)
+        return mydb
+
+    def begin(self) -> bool:
+        """
+        Begin the transaction of BEGIN, returns False if one is in progress.
+        """
+        if self.explicit:
+            return False
+        self.write_pending()
+        self.end_statement()
+        self.txn = self.env.txn_begin()
+        self.explicit = True
+        return True
+
+    @profiled("commit")
+    def commit(self) -> bool:
+        if not self.explicit:
+            return False
+        self.write_pending()
+        self.end_statement_txn()
+        self.txn.commit()
+        self.txn = None
+        self.explicit = False
+        self.write_buffer.end_statement()
+        return True
+
+    def rollback(self) -> bool:
+        if not self.explicit:
+            return False
+        if self.statement_txn is not None:
+            self.statement_txn.abort()
+            self.statement_txn = None
+        self.txn.abort()
+        self.txn = None
+        self.explicit = False
+        return True
+
+    def begin_snapshot(self) -> bool:
+        """
+        Begin the snapshot of a statement which only reads, returns False if it can not have one:
+        without transactions, in a transaction of BEGIN, or while write behind keeps records which are not in the db.
+        """
+        if self.env is None or self.explicit or not self.write_buffer.is_empty():
+            return False
+        self.end_statement()
+        self.txn = self.env.txn_begin(flags=db.DB_TXN_SNAPSHOT)
+        self.snapshot = True
+        return True
+
+    def get_txn(self):
+        """
+        Returns the transaction to access the db in, which is begun for the statement if there is none.
+        Reads are also done in it, so that a cursor never waits for the locks of the writes of its own statement.
+        """
+        if self.env is not None and self.txn is None:
+            self.txn = self.env.txn_begin()
+        if self.explicit:
+            if self.statement_txn is None:
+                self.statement_txn = self.env.txn_begin(self.txn)
+            return self.statement_txn
+        return self.txn
+
+    def end_statement_txn(self):
+        if self.statement_txn is not None:
+            self.statement_txn.commit()
+            self.statement_txn = None
+
+    @profiled("commit")
+    def end_statement(self):
+        """
+        Commit the transaction of the statement, if it is out of BEGIN,
+        with the kept records when there are too many of them or they are too old.
+        In BEGIN, its child transaction is committed into the one of BEGIN.
+        """
+        if self.explicit:
+            self.end_statement_txn()
+            return
+        if self.write_buffer.is_due(end_of_batch=False) and not self.snapshot:
+            self.write_pending()
+        if self.txn is not None:
+            self.txn.commit()
+            self.txn = None
+            if not self.snapshot:
+                self.write_buffer.end_statement()
+            self.snapshot = False
+        elif self.env is None:
+            self.write_buffer.end_statement()
+        return
+
+    def abort_statement(self):
+        """
+        Undo the writes of the statement which failed: its transaction is aborted, or its child one in BEGIN,
+        and the kept records are put back as they were before it.
+        Without transactions, only the records which write behind still keeps are undone.
+        """
+        if self.explicit:
+            if self.statement_txn is not None:
+                self.statement_txn.abort()
+                self.statement_txn = None
+            return
+        if self.txn is not None:
+            self.txn.abort()
+            self.txn = None
+        if not self.snapshot:
+            self.write_buffer.abort_statement(written=self.env is None)
+        self.snapshot = False
+
+    def end_batch(self):
+        """
+        End a batch of statements, whose records are written now for the batch level.
+        """
+        if not self.explicit and self.write_buffer.is_due(end_of_batch=True):
+            self.write_pending()
+            self.end_statement()
+
+    def has_pending_writes(self) -> bool:
+        return not self.write_buffer.is_empty()
+
+    @profiled("storage write")
+    def write_pending(self):
+        """
+        Write the kept records to the transaction, in key order.
+        """
+        items = self.write_buffer.take()
+        if not items:
+            return
+        txn = self.get_txn()
+        for key, value in items:
+            if value is DELETED:
+                try :
+                    self.mydb.delete(key, txn=txn)
+                except db.DBNotFoundError:
+                    # The record was written and deleted while it was kept
+                    pass
+            else :
+                self.mydb.put(key, value, txn=txn)
+        self.sync()
+
+    def close(self):
+        """
+        The transaction of BEGIN which is not committed is rolled back, and the kept records are written.
+        """
+        self.rollback()
+        self.write_pending()
+        self.end_statement()
+        self.mydb.close()
+        if self.env is not None:
+            self.env.txn_checkpoint()
+            self.env.close()
+
+    def get_db_type(self, file_name: str):
+        probe = db.DB()
+        probe.open(file_name, dbtype=db.DB_UNKNOWN, flags=db.DB_RDONLY)
+        db_type = probe.get_type()
+        probe.close()
+        return db_type
+
+    def migrate_legacy(self, file_name: str):
+        """
+        Convert the old layout, a hash db whose values are {"schema", "rows"} blobs of whole tables,
+        into the row-per-key layout. The new file is written aside and swapped in at the end.
+        """
+        legacy = db.DB()
+        legacy.set_get_returns_none(2)
+        legacy.open(file_name, dbtype=db.DB_HASH, flags=db.DB_RDONLY)
+
+        new_file_name = file_name + ".migrating"
+        if os.path.exists(new_file_name):
+            os.remove(new_file_name)
+        migrated = self.open_db(new_file_name)
+        cursor = legacy.cursor()
         item = cursor.next()
         while item :
-            tables[str(item[0], 'utf-8')] = self.bytes_to_dict(item[1])
+            table_name = str(item[0], 'utf-8')
+            table_dict = self.bytes_to_dict(item[1])
+            migrated.put(self.schema_key(table_name), self.dict_to_bytes({"schema" : table_dict["schema"]}))
+            for rowid, row in enumerate(table_dict["rows"], start=1):
+                migrated.put(self.row_key(table_name, rowid), self.dict_to_bytes(row))
             item = cursor.next()
+        cursor.close()
+        migrated.put(FORMAT_KEY, str(JSON_ROWS_VERSION).encode('utf-8'))
+        migrated.close()
+        legacy.close()
+        os.replace(new_file_name, file_name)
+
+    def get_cursor(self) :
+        return self.mydb.cursor(txn=self.get_txn())
+
+    def schema_key(self, table_name: str) -> bytes:
+        return SCHEMA_PREFIX + bytes(table_name, 'utf-8')
+
+    def row_prefix(self, table_name: str) -> bytes:
+        return ROW_PREFIX + bytes(table_name, 'utf-8') + SEPARATOR
+
+    def row_key(self, table_name: str, rowid: int) -> bytes:
+        return self.row_prefix(table_name) + rowid.to_bytes(ROWID_SIZE, 'big')
+
+    def index_prefix(self, table_name: str, index_name: str = None) -> bytes:
+        prefix = INDEX_PREFIX + bytes(table_name, 'utf-8') + SEPARATOR
+        if index_name is not None:
+            prefix += bytes(index_name, 'utf-8') + SEPARATOR
+        return prefix
+
+    def iter_prefix(self, prefix: bytes, counter: str = "records read"):
+        """
+        Yields the (key, value) pairs whose key starts with the given prefix, in key order.
+        When the statement is profiled, they are counted to the counter.
+        """
+        items = self.iter_range(prefix, lambda key: key.startswith(prefix))
+        return profiler.read_items(items, counter) if profiler.is_active() else items
+
+    def iter_range(self, start: bytes, in_range, reverse: bool = False):
+        """
+        Yields the (key, value) pairs from the start key, as long as in_range(key) is true.
+        With reverse, the pairs before the start key are yielded backwards.
+        The kept records of the range are merged in, in place of the records of the db with the same key.
+        """
+        pending = self.write_buffer.items_from(start, in_range, reverse) if not self.write_buffer.is_empty() and not self.snapshot else []
+        cursor = self.get_cursor()
+        try :
+            if reverse:
+                item = cursor.set_range(start)
+                item = cursor.prev() if item else cursor.last()
+                step = cursor.prev
+            else :
+                item = cursor.set_range(start)
+                step = cursor.next
+            if item and not in_range(item[0]):
+                item = None
+            position = 0
+            while item or position < len(pending):
+                if position < len(pending) and (not item or (pending[position][0] >= item[0] if reverse else pending[position][0] <= item[0])):
+                    key, value = pending[position]
+                    position += 1
+                    if item and item[0] == key:
+                        item = step()
+                        if item and not in_range(item[0]):
+                            item = None
+                    if value is not DELETED:
+                        yield key, value
+                    continue
+                yield item
+                item = step()
+                if item and not in_range(item[0]):
+                    item = None
+        finally :
+            cursor.close()
+
+    def getTableDict(self) -> dict:
+        tables = {}
+        for key, value in self.iter_prefix(SCHEMA_PREFIX):
+            tables[str(key[len(SCHEMA_PREFIX):], 'utf-8')] = self.bytes_to_dict(value)
         return tables
-    
+
+    @profiled("storage read")
+    def last_rowid(self, table_name: str) -> int:
+        """
+        Returns the largest rowid of the table (0 if it is empty) by seeking the end of its key range.
+        A rowid which is deleted while it is kept may still be returned, which only leaves a gap in the rowids.
+        """
+        prefix = self.row_prefix(table_name)
+        last = 0
+        kept = self.write_buffer.last_key(prefix)
+        if kept is not None:
+            last = int.from_bytes(kept[len(prefix):], 'big')
+        cursor = self.get_cursor()
+        try :
+            item = cursor.set_range(prefix[:-1] + bytes([prefix[-1] + 1]))
+            item = cursor.prev() if item else cursor.last()
+            if item and item[0].startswith(prefix):
+                return max(last, int.from_bytes(item[0][len(prefix):], 'big'))
+            return last
+        finally :
+            cursor.close()
+
+    def iter_rows(self, table_name: str):
+        prefix = self.row_prefix(table_name)
+        for key, value in self.iter_prefix(prefix, "rows read"):
+            yield int.from_bytes(key[len(prefix):], 'big'), value
+
+    @profiled("storage read")
+    def get_row(self, table_name: str, rowid: int) -> bytes:
+        record = self.get(self.row_key(table_name, rowid))
+        if record is not None and profiler.is_active():
+            profiler.count("rows read", 1)
+            profiler.count("bytes read", len(record))
+        return record
+
+    @profiled("storage write")
+    def rewrite_rows(self, table_name: str, convert):
+        """
+        Replace the record of every row of the table with convert(record), in place through the cursor.
+        """
+        self.write_pending()
+        prefix = self.row_prefix(table_name)
+        cursor = self.get_cursor()
+        try :
+            item = cursor.set_range(prefix)
+            while item and item[0].startswith(prefix):
+                cursor.put(item[0], convert(item[1]), db.DB_CURRENT)
+                item = cursor.next()
+        finally :
+            cursor.close()
+
+    def find_index_rowids(self, table_name: str, index_name: str, key: bytes):
+        """
+        Yields the rowids of the index entries whose key equals (or starts with) the given encoded key.
+        """
+        prefix = self.index_prefix(table_name, index_name) + key
+        for entry, _ in self.iter_prefix(prefix, "index entries read"):
+            yield int.from_bytes(entry[-ROWID_SIZE:], 'big')
+
+    def iter_index(self, table_name: str, index_name: str, low: tuple = None, high: tuple = None, reverse: bool = False):
+        """
+        Yields the rowids of the index entries in key order (or the reverse order), between the given bounds.
+        A bound is (encoded key, inclusive) and an entry matches a bound when it starts with its key,
+        so a bound may give only the leading columns of the index.
+        """
+        prefix = self.index_prefix(table_name, index_name)
+        if low is None:
+            start = prefix
+        else :
+            start = prefix + low[0] if low[1] else self.successor(prefix + low[0])
+        if high is None:
+            stop = self.successor(prefix)
+        else :
+            stop = self.successor(prefix + high[0]) if high[1] else prefix + high[0]
+        
+        if reverse:
+            items = self.iter_range(stop, lambda key: key >= start, reverse=True)
+        else :
+            items = self.iter_range(start, lambda key: key < stop)
+        if profiler.is_active():
+            items = profiler.read_items(items, "index entries read")
+        for key, _ in items:
+            yield int.from_bytes(key[-ROWID_SIZE:], 'big')
+
+    def successor(self, key: bytes) -> bytes:
+        """
+        Returns the smallest key which is larger than every key starting with the given one.
+        """
+        key = key.rstrip(b"\xff")
+        return key[:-1] + bytes([key[-1] + 1])
+
+    @profiled("json")
     def bytes_to_dict(self, item: bytes):
         return json.loads(item)
-    
+
+    @profiled("json")
+    def dict_to_bytes(self, item) -> bytes:
+        return json.dumps(item).encode('utf-8')
+
+    @profiled("storage write")
     def add_table(self, table_name: str, table_dict: dict) :
-        self.mydb.put(bytes(table_name, 'utf-8'), json.dumps(table_dict).encode('utf-8'))
+        self.put(self.schema_key(table_name), self.dict_to_bytes(table_dict))
+        return
+
+    @profiled("storage write")
+    def add_rows(self, table_name: str, first_rowid: int, records: List[bytes]) :
+        """
+        Write the encoded rows with consecutive rowids starting from first_rowid.
+        """
+        prefix = self.row_prefix(table_name)
+        if self.is_writing_behind():
+            for rowid, record in enumerate(records, start=first_rowid):
+                self.write_buffer.put(prefix + rowid.to_bytes(ROWID_SIZE, 'big'), record)
+        else :
+            txn = self.get_txn()
+            for rowid, record in enumerate(records, start=first_rowid):
+                self.mydb.put(prefix + rowid.to_bytes(ROWID_SIZE, 'big'), record, txn=txn)
+        if profiler.is_active():
+            profiler.count("bytes written", sum(len(prefix) + ROWID_SIZE + len(record) for record in records))
+        return
+
+    @profiled("storage read")
+    def get_row_count(self, table_name: str) -> Optional[int]:
+        count = self.get(COUNT_PREFIX + bytes(table_name, 'utf-8'))
+        return None if count is None else int.from_bytes(count, 'big')
+
+    @profiled("storage write")
+    def set_row_count(self, table_name: str, count: int) :
+        self.put(COUNT_PREFIX + bytes(table_name, 'utf-8'), count.to_bytes(ROWID_SIZE, 'big'))
         return
-    
+
+    @profiled("storage write")
+    def delete_row_count(self, table_name: str) :
+        if self.get_row_count(table_name) is not None:
+            self.delete(COUNT_PREFIX + bytes(table_name, 'utf-8'))
+        return
+
+    @profiled("storage read")
+    def get_statistics(self, table_name: str) -> Optional[dict]:
+        item = self.get(STATS_PREFIX + bytes(table_name, 'utf-8'))
+        return None if item is None else self.bytes_to_dict(item)
+
+    @profiled("storage write")
+    def set_statistics(self, table_name: str, item: dict) :
+        self.put(STATS_PREFIX + bytes(table_name, 'utf-8'), self.dict_to_bytes(item))
+        return
+
+    @profiled("storage write")
+    def put_row(self, table_name: str, rowid: int, record: bytes) :
+        self.put(self.row_key(table_name, rowid), record)
+        return
+
+    def is_writing_behind(self) -> bool:
+        return self.write_buffer.is_enabled() and not self.explicit
+
+    def get(self, key: bytes) -> Optional[bytes]:
+        if not self.write_buffer.is_empty() and not self.snapshot:
+            kept, value = self.write_buffer.get(key)
+            if kept:
+                return value
+        return self.mydb.get(key, txn=self.get_txn())
+
+    def put(self, key: bytes, value: bytes) :
+        if self.is_writing_behind():
+            self.write_buffer.put(key, value)
+        else :
+            self.mydb.put(key, value, txn=self.get_txn())
+        if profiler.is_active():
+            profiler.count("bytes written", len(key) + len(value))
+        return
+
+    def delete(self, key: bytes) :
+        if self.is_writing_behind():
+            self.write_buffer.put(key, DELETED)
+        else :
+            self.mydb.delete(key, txn=self.get_txn())
+        return
+
+    @profiled("storage write")
+    def delete_row(self, table_name: str, rowid: int) :
+        self.delete(self.row_key(table_name, rowid))
+        return
+
+    @profiled("storage write")
+    def add_index_entries(self, table_name: str, index_name: str, entries: list) :
+        """
+        Write the (encoded key, rowid) entries of an index.
+        """
+        prefix = self.index_prefix(table_name, index_name)
+        if self.is_writing_behind():
+            for key, rowid in entries:
+                self.write_buffer.put(prefix + key + rowid.to_bytes(ROWID_SIZE, 'big'), b"")
+        else :
+            txn = self.get_txn()
+            for key, rowid in entries:
+                self.mydb.put(prefix + key + rowid.to_bytes(ROWID_SIZE, 'big'), b"", txn=txn)
+        if profiler.is_active():
+            profiler.count("bytes written", sum(len(prefix) + len(key) + ROWID_SIZE for key, _ in entries))
+        return
+
+    @profiled("storage write")
+    def delete_index_entry(self, table_name: str, index_name: str, key: bytes, rowid: int) :
+        self.delete(self.index_prefix(table_name, index_name) + key + rowid.to_bytes(ROWID_SIZE, 'big'))
+        return
+
+    @profiled("storage write")
+    def drop_index(self, table_name: str, index_name: str):
+        self.delete_prefix(self.index_prefix(table_name, index_name))
+        return
+
+    @profiled("storage write")
+    def sync(self):
+        """
+        Flush the written records of a statement to the file at once.
+        In a transaction, the commit flushes them to the log instead.
+        """
+        if self.env is None:
+            self.mydb.sync()
+        return
+
+    @profiled("storage write")
+    def write_cache(self):
+        """
+        Write the pages of the cache to the file, so that other processes reading the file see the committed records.
+        No record is written: the records kept by write behind stay kept.
+        """
+        self.mydb.sync()
+        return
+
+    @profiled("storage write")
+    def delete_prefix(self, prefix: bytes):
+        self.write_pending()
+        cursor = self.get_cursor()
+        try :
+            item = cursor.set_range(prefix)
+            while item and item[0].startswith(prefix):
+                cursor.delete()
+                item = cursor.next()
+        finally :
+            cursor.close()
+
+    @profiled("storage write")
     def drop_table(self, table_name:str):
-        self.mydb.delete(bytes(table_name, 'utf-8'))
-        return
\ No newline at end of file
+        self.delete_prefix(self.row_prefix(table_name))
+        self.delete_prefix(self.index_prefix(table_name))
+        self.delete_row_count(table_name)
+        if self.get_statistics(table_name) is not None:
+            self.delete(STATS_PREFIX + bytes(table_name, 'utf-8'))
+        self.delete(self.schema_key(table_name))
+        return
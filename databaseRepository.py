@@ -1,6 +1,30 @@
-from typing import List, Union, Tuple, Dict, Optional
-from databaseInstance import DatabaseInstance
+from typing import List, Union, Tuple, Dict, Optional, Set
+import copy
+import os
+import re
+import threading
+from itertools import chain, islice
+from databaseInstance import DatabaseInstance, DB_FILE, FORMAT_VERSION, JSON_ROWS_VERSION
+from databaseIndex import Index
+from bulkLoader import BulkLoader, FileFormatError, BATCH_SIZE
 from message import Message, BORDER_LINE
+from parallelScan import ScanTask, partition, run_partitions
+from predicate import Column, Value, QueryError
+from profiler import profiler
+from queryPlan import Plan, instrument
+from queryPlanner import QueryPlanner
+from rowCodec import RowCodec, PARSERS, FORMATTERS, INT_MIN, INT_MAX
+from tableStatistics import TableStatistics
+
+# Number of result rows which are measured before the result table starts to be written
+SAMPLE_SIZE = 1000
+# Number of result rows which are written at once
+CHUNK_SIZE = 100
+# Length of a date value, yyyy-mm-dd
+DATE_WIDTH = 10
+# The row count and the statistics of a table, which are kept in memory, are written to the db once this many
+# of its rows are changed, and also by ANALYZE, by the commit of a transaction of BEGIN and when the db is closed
+WRITE_COUNTERS_ROWS = 10000
 
 class Query:
     """
@@ -8,8 +32,15 @@ class Query:
     Will be used later to process the query
     """
     class Select :
-        def __init__(self, content) -> None:
-            pass
+        """
+        A selected column, or an aggregate when aggregate is the name of its function.
+        column_name is None for COUNT(*).
+        """
+        def __init__(self, table_name: Optional[str], column_name: Optional[str], alias: Optional[str], aggregate: Optional[str] = None) -> None:
+            self.table_name = table_name
+            self.column_name = column_name
+            self.alias = alias
+            self.aggregate = aggregate
     
     class TableReference :
         def __init__(self, table_name, ref_name) -> None:
@@ -17,10 +48,15 @@ class Query:
             self.ref_name = ref_name
     
     
-    def __init__(self, select_list: List[Select], from_clause: List[TableReference], where_clause) -> None:
+    def __init__(self, select_list: List[Select], from_clause: List[TableReference], where_clause,
+                 group_by: List[Column] = None, order_by: List[Tuple[Column, bool]] = None, limit: Optional[int] = None) -> None:
         self.select_list = select_list
         self.from_clause = from_clause
         self.where_clause = where_clause
+        self.group_by = group_by if group_by is not None else []
+        # (column, descending) of each column of the order by
+        self.order_by = order_by if order_by is not None else []
+        self.limit = limit
 
 
 class ColumnDefinition:
@@ -50,6 +86,48 @@ class ColumnDefinition:
     
     def equal_type_with(self, other):
         return self.data_type == other.data_type and self.data_len == other.data_len
+    
+    INT_PATTERN = re.compile(r"[+-]?[0-9]+")
+    DATE_PATTERN = re.compile(r"[0-9]{4}-[0-9]{2}-[0-9]{2}")
+    
+    def is_valid_value(self, value: Optional[str]) -> bool:
+        """
+        Check whether the text value can be stored in this column.
+        """
+        if value is None:
+            return not self.not_null
+        if self.data_type == ColumnDefinition.INT:
+            return ColumnDefinition.INT_PATTERN.fullmatch(value) is not None and INT_MIN <= int(value) <= INT_MAX
+        if self.data_type == ColumnDefinition.DATE:
+            if ColumnDefinition.DATE_PATTERN.fullmatch(value) is None:
+                return False
+            try :
+                PARSERS[ColumnDefinition.DATE](value)
+            except ValueError:
+                return False
+        return True
+    
+    def is_valid_literal(self, literal: Value) -> bool:
+        """
+        Check whether a literal of a statement can be stored in this column. Unlike a text value of a file,
+        it must also be written as a value of the type of the column: a quoted string for a char column.
+        """
+        return literal.data_type == self.data_type and self.is_valid_value(literal.value)
+    
+    def to_value(self, text: Optional[str]):
+        """
+        Turn a valid text value into the typed value which is stored in the rows,
+        a char value longer than the column is truncated.
+        """
+        if text is None:
+            return None
+        value = PARSERS[self.data_type](text)
+        if self.data_type == ColumnDefinition.CHAR:
+            value = value[:self.data_len]
+        return value
+    
+    def to_text(self, value) -> Optional[str]:
+        return None if value is None else FORMATTERS[self.data_type](value)
 
 class TableConstraint:
     """
@@ -118,10 +196,10 @@ class Schema:
             if self.primary_key_column is not None and column.column_name in self.primary_key_column.column_list:
                 column.not_null = True
 
-    def key_check(self) -> Tuple[bool, str]:
+    def key_check(self, table_name: str = None) -> Tuple[bool, str]:
         """
         Check whether the given schema is valid or not.
-        Must be called before creating the table.
+        Must be called before creating the table, whose name is given so that a foreign key may reference the table itself.
         """
         
         if len(self.columns) != len(set(self.columns)) :
@@ -137,18 +215,24 @@ class Schema:
                 return False, Message.DuplicatePrimaryKeyDefError.get_message()
             
             
-            ref_table = dbrepo.get_table_instance(table_constraint.reference_table)
-            # Check whether refereced table exists
-            if ref_table is None and not table_constraint.is_primary_key():
-                return False, Message.ReferenceTableExistenceError.get_message()
-
             if not table_constraint.is_primary_key() :
+                if table_constraint.reference_table == table_name:
+                    # A table may reference itself, such as a row referencing its parent row
+                    self.setup()
+                    ref_schema = self
+                else :
+                    ref_table = dbrepo.get_table_instance(table_constraint.reference_table)
+                    # Check whether refereced table exists
+                    if ref_table is None:
+                        return False, Message.ReferenceTableExistenceError.get_message()
+                    ref_schema = ref_table.schema
+
                 # Check whether the reference column list is subset of the reference table's columns
-                if not set(table_constraint.reference_column_list).issubset(set(ref_table.schema.columns)):
+                if not set(table_constraint.reference_column_list).issubset(set(ref_schema.columns)):
                     return False, Message.ReferenceColumnExistenceError.get_message()
 
                 # Check whether the reference table's primary key is equal to the reference column list
-                if set(ref_table.schema.primary_key_column.column_list) != set(table_constraint.reference_column_list) :
+                if ref_schema.primary_key_column is None or set(ref_schema.primary_key_column.column_list) != set(table_constraint.reference_column_list) :
                     return False, Message.ReferenceNonPrimaryKeyError.get_message()
             
             for index, column_name in enumerate(table_constraint.column_list):
@@ -164,7 +248,7 @@ class Schema:
 
                 # Check type of referenced columns
                 if not table_constraint.is_primary_key():
-                    ref_col = ref_table.schema.get_column(table_constraint.reference_column_list[index])
+                    ref_col = ref_schema.get_column(table_constraint.reference_column_list[index])
                     if not curr_col.equal_type_with(ref_col):
                         return False, Message.ReferenceTypeError.get_message()
 
@@ -211,66 +295,327 @@ class Table:
     
     def __init__(self, table_name: str = "", schema: Schema = None, item: dict = None) -> None:
         self.table_name = table_name
+        # rowid which will be given to the next inserted row, rows are stored in berkeley db by this id
+        # It is looked up from the db on the first insert, so that loading a table never touches its rows
+        self.next_rowid = 1 if item is None else None
+        # Number of rows of the table, which is kept so that COUNT(*) does not scan the table
+        # It is looked up from the db when it is needed first, and kept in memory as the rows change
+        self.row_count: Optional[int] = 0 if item is None else None
+        # Number of rows changed since the row count and the statistics were written to the db
+        self.changed_rows = 0
+        self.indexes: Dict[str, Index] = {}
+        # Names of the tables which have a foreign key to this table, the other way of the foreign key constraints
+        # It is None for a table saved before it was kept, until the repository finds them again
+        self.referenced_by: Optional[List[str]] = [] if item is None else item.get("referenced_by")
         if item is None:
             self.schema = schema
-            self.rows = []
         else :
             self.schema = Schema(item = item["schema"])
-            self.rows = item["rows"]
+            for index_dict in item.get("indexes", []):
+                self.add_index(Index.from_dict(index_dict))
+        self.codec = RowCodec(self.schema.column_definitions)
+        # Statistics of the columns for the planner, kept like the row count and looked up when they are needed first
+        # They are None for a table saved before they were kept, until it is analyzed
+        self.statistics: Optional[TableStatistics] = TableStatistics(self.schema.columns) if item is None else None
+        self.statistics_loaded = item is None
     
     def to_dict(self):
+        """
+        Only the schema and the index definitions are encoded, the rows and the index entries
+        are stored as separate records of their own.
+        """
         return {
             "schema" : self.schema.to_dict(),
-            "rows" : self.rows
+            "indexes" : [index.to_dict() for index in self.indexes.values()],
+            "referenced_by" : self.referenced_by
         }
+    
+    def copy(self) -> "Table":
+        """
+        A copy whose indexes, referencing tables, counters and statistics can be changed without changing this table,
+        for the statements which still read this version of it.
+        """
+        table = copy.copy(self)
+        table.indexes = dict(self.indexes)
+        table.referenced_by = None if self.referenced_by is None else list(self.referenced_by)
+        table.statistics = None if self.statistics is None else self.statistics.copy()
+        return table
+    
+    def add_index(self, index: Index):
+        index.setup(self.schema)
+        self.indexes[index.index_name] = index
+    
+    def get_primary_index(self) -> Optional[Index]:
+        return self.indexes.get(Index.PRIMARY)
+    
+    def create_primary_index(self) -> Optional[Index]:
+        """
+        Returns the index of the primary key, which every table with a primary key must have.
+        """
+        if self.schema.primary_key_column is None:
+            return None
+        return Index(
+            index_name=Index.PRIMARY,
+            column_list=self.schema.primary_key_column.column_list,
+            unique=True
+        )
         
-    def references(self, target_table_name: str):
+    def get_foreign_keys(self) -> List[Tuple[Index, TableConstraint]]:
+        """
+        Returns the foreign key constraints with the indexes over their columns,
+        which every table with a foreign key must have, so that its referencing rows can be found by a seek.
+        """
+        foreign_keys = []
+        number = 0
         for table_constraint in self.schema.table_constraints:
-            if not table_constraint.is_primary_key():
-                if table_constraint.reference_table == target_table_name :
-                    return True
-
-        return False
+            if table_constraint.is_primary_key():
+                continue
+            number += 1
+            foreign_keys.append((
+                self.indexes.get(Index.foreign_key_name(number)) or Index(
+                    index_name=Index.foreign_key_name(number),
+                    column_list=table_constraint.column_list
+                ),
+                table_constraint
+            ))
+        return foreign_keys
     
-    def insert_row(self, row, column_list):
-        if column_list is not None:
-            row_dict = {}
-            for index in range(len(row)):
-                row_dict[column_list[index]] = row[index]
-            
-            new_row = []
-            for column in self.schema.columns:
-                new_row.append(row_dict[column])
-            self.rows.append(new_row)
-        else :
-            self.rows.append(row)
+    def get_value_positions(self, column_list) -> Tuple[bool, Union[List[Optional[int]], str]]:
+        """
+        Check the column list of an insert and return, for each column of the schema,
+        the position of its value in the inserted rows (None if the column is not given).
+        It only depends on the statement, so it is done once for all the rows of an insert.
+        """
+        if column_list is None:
+            return True, list(range(len(self.schema.columns)))
+        
+        for column_name in column_list:
+            if column_name not in self.schema.columns:
+                return False, Message.InsertColumnExistenceError.get_message(column_name)
+        if len(column_list) != len(set(column_list)):
+            return False, Message.InsertTypeMismatchError.get_message()
+        for column in self.schema.column_definitions:
+            if column.not_null and column.column_name not in column_list:
+                return False, Message.InsertColumnNonNullableError.get_message(column.column_name)
+        
+        return True, [column_list.index(column) if column in column_list else None for column in self.schema.columns]
+    
+    def build_row(self, row, positions: List[Optional[int]], value_count: int) -> Tuple[bool, Union[list, str]]:
+        """
+        Arrange the given values in the column order of the schema, as typed values.
+        The values are the literals of a statement, or text values.
+        """
+        if len(row) != value_count:
+            return False, Message.InsertTypeMismatchError.get_message()
         
-        return True, Message.InsertResult.get_message()
+        new_row = []
+        for column, position in zip(self.schema.column_definitions, positions):
+            value = row[position] if position is not None else None
+            if isinstance(value, Value):
+                if not column.is_valid_literal(value):
+                    return False, Message.InsertTypeMismatchError.get_message()
+                value = value.value
+            elif not column.is_valid_value(value):
+                return False, Message.InsertTypeMismatchError.get_message()
+            new_row.append(column.to_value(value))
+        return True, new_row
+    
+    def to_text_row(self, row: list) -> List[Optional[str]]:
+        return [column.to_text(value) for column, value in zip(self.schema.column_definitions, row)]
 
 class DatabaseRepository:
     """
     Abstraction layer between the berkeley db and the project's custom database.
     DatabaseRepository will save itself values to the berkeley db whenever there is a change.
     All the query processing logic is done in this repository.
-    """
     
-    # This tables variable saves the tables as a class form
-    # All the queries will be applied both this variable and db instance
-    tables: Dict[str, Table]
+    The tables are kept in versions, so that a statement which only reads runs beside the writers (begin_read).
+    It takes the version of the tables which is published (catalog) with a snapshot of the db from the same moment,
+    and reads both until it ends. A writer never changes the dict or a table of a published version:
+    it changes copies of them (a draft), which are published when its transaction commits.
+    The row counts, the next rowids and the statistics are changed on the draft as well (see _edit_table),
+    so a snapshot counts and plans with those of its version. The only change to a published table is
+    the lazy load of one of them by a writer, from None to the value of that version.
+    An old version is freed once no statement reads it.
+    """
     
     def __init__(self) -> None:
         """
         When the class is initialized, it will load the tables which are in dictionary form
         """
-        self.tables = {}
+        # The published version of the tables, by name
+        self.catalog: Dict[str, Table] = {}
+        # The version of the tables of a statement, which is kept per thread like the transaction
+        self.local = threading.local()
+        # A snapshot is begun and a transaction is committed under it, so that a snapshot sees the tables of its records
+        self.version_lock = threading.Lock()
         self.dbInstance = DatabaseInstance()
+        self.planner = QueryPlanner(self)
+        self.tables = {}
         self.load_from_instance()
+        self.end_statement()
+    
+    @property
+    def tables(self) -> Dict[str, Table]:
+        """
+        The tables which the statement of the thread sees: its snapshot or its draft, the published ones if it has neither.
+        """
+        tables = getattr(self.local, "tables", None)
+        return self.catalog if tables is None else tables
+    
+    @tables.setter
+    def tables(self, tables: Dict[str, Table]):
+        self.local.tables = tables
+    
+    def _edit_table(self, table_name: str) -> Table:
+        """
+        Returns the table of the draft, which is copied the first time the thread changes it.
+        """
+        table = self.tables[table_name]
+        if table is self.catalog.get(table_name):
+            table = table.copy()
+            self.tables = {**self.tables, table_name : table}
+        return table
+    
+    def begin_read(self) -> bool:
+        """
+        Begin a statement which only reads in a snapshot, returns False if it can not have one.
+        """
+        with self.version_lock:
+            if not self.dbInstance.begin_snapshot():
+                return False
+            self.tables = self.catalog
+            self.local.snapshot = True
+        return True
+    
+    def reads_snapshot(self) -> bool:
+        return getattr(self.local, "snapshot", False)
+    
+    def sees_only_file(self) -> bool:
+        """
+        Whether the statement sees only the committed records, which other processes read from the file:
+        it is neither in a snapshot nor in a transaction of BEGIN, and write behind keeps no record.
+        """
+        return not (self.reads_snapshot() or self.in_transaction() or self.has_pending_writes())
+    
+    def _publish(self):
+        """
+        Commit the transaction of the statement, and publish its draft of the tables with it.
+        """
+        with self.version_lock:
+            self.dbInstance.end_statement()
+            self._publish_draft()
+    
+    def _publish_draft(self):
+        draft = getattr(self.local, "tables", None)
+        if draft is not None and not self.reads_snapshot():
+            self.catalog = draft
+        self.local.tables = None
+        self.local.snapshot = False
     
     def load_from_instance(self) :
+        """
+        Only the schemas are loaded, rows are read from the db whenever a query scans the table.
+        """
         table_dicts = self.dbInstance.getTableDict()
+        upgrade = self.dbInstance.format_version == JSON_ROWS_VERSION
         for table_name, table_dict in table_dicts.items():
-            self.tables[table_name] = self.table_dict_to_class(table_name = table_name, item = table_dict)
+            table = self.table_dict_to_class(table_name = table_name, item = table_dict)
+            self.tables[table_name] = table
+            if upgrade:
+                self._upgrade_rows(table)
             
+            # Tables saved before the primary key and foreign key indexes existed get them built once
+            primary_index = table.create_primary_index()
+            if primary_index is not None and table.get_primary_index() is None:
+                self._build_index(table, primary_index)
+                self._save_table(table)
+            for index, _ in table.get_foreign_keys():
+                if index.index_name not in table.indexes:
+                    self._build_index(table, index)
+                    self._save_table(table)
+        if upgrade:
+            self.dbInstance.set_format_version(FORMAT_VERSION)
+        
+        if any(table.referenced_by is None for table in self.tables.values()):
+            self._rebuild_references()
+            
+    def begin(self):
+        if self.dbInstance.env is None:
+            return Message.TransactionDisabledError.get_message()
+        if not self.dbInstance.begin():
+            return Message.TransactionInProgressError.get_message()
+        return Message.TransactionBegin.get_message()
+    
+    def commit(self):
+        """
+        The row counts and the statistics of the tables are written with the transaction.
+        """
+        if not self.in_transaction():
+            return Message.NoTransactionError.get_message()
+        self._write_changed_counters()
+        with self.version_lock:
+            self.dbInstance.commit()
+            self._publish_draft()
+        return Message.TransactionCommit.get_message()
+    
+    def rollback(self):
+        """
+        The draft of the transaction is dropped, the tables which it changed are copies of the published ones.
+        """
+        if not self.dbInstance.rollback():
+            return Message.NoTransactionError.get_message()
+        with self.version_lock:
+            self.local.tables = None
+            self.local.snapshot = False
+        return Message.TransactionRollback.get_message()
+    
+    def end_statement(self):
+        """
+        In a transaction of BEGIN, the draft is kept until it commits.
+        """
+        if self.in_transaction():
+            self.dbInstance.end_statement()
+            return
+        self._publish()
+    
+    def abort_statement(self):
+        """
+        Undo the statement which failed, with its draft or its snapshot.
+        In a transaction of BEGIN the draft is that of the transaction, which the statements before changed as well,
+        so the tables are loaded again from the transaction, like for a rollback.
+        So are they without transactions, since the records which the statement wrote may not be undone.
+        """
+        with self.version_lock:
+            self.dbInstance.abort_statement()
+            snapshot = self.reads_snapshot()
+            self.local.tables = None
+            self.local.snapshot = False
+        if snapshot or not (self.in_transaction() or self.dbInstance.env is None):
+            return
+        self.tables = {}
+        self.load_from_instance()
+        self.end_statement()
+
+    def end_batch(self):
+        self.dbInstance.end_batch()
+    
+    def has_pending_writes(self) -> bool:
+        return self.dbInstance.has_pending_writes()
+    
+    def in_transaction(self) -> bool:
+        return self.dbInstance.explicit
+    
+    def close(self):
+        """
+        The row counts and the statistics which are kept in memory are written before the db is closed,
+        unless a transaction of BEGIN is left, which is rolled back.
+        """
+        if not self.in_transaction() and any(table.changed_rows > 0 for table in self.tables.values()):
+            self._write_changed_counters()
+            self.end_statement()
+        self.dbInstance.close()
+    
     def table_dict_to_class(self, table_name: str, item: dict):
         return Table(
             table_name=table_name,
@@ -293,7 +638,7 @@ class DatabaseRepository:
             table_constraints=table_constraints
         )
         
-        is_valid_key, message = schema.key_check()
+        is_valid_key, message = schema.key_check(table_name)
         if not is_valid_key:
             return message
         
@@ -301,38 +646,158 @@ class DatabaseRepository:
             table_name=table_name,
             schema=schema
         )
+        primary_index = new_table.create_primary_index()
+        if primary_index is not None:
+            new_table.add_index(primary_index)
+        for index, _ in new_table.get_foreign_keys():
+            new_table.add_index(index)
         
         self._save_table(new_table)
+        self.dbInstance.set_row_count(table_name, 0)
+        self.dbInstance.set_statistics(table_name, new_table.statistics.to_dict())
+        for reference_table in set(tc.reference_table for _, tc in new_table.get_foreign_keys()):
+            parent = self._edit_table(reference_table)
+            parent.referenced_by.append(table_name)
+            self._save_table(parent)
         return Message.CreateTableSuccess.get_message(table_name)
         
     def drop_table(self, table_name: str):
         if table_name not in self.tables :
             return Message.NoSuchTable.get_message()
         
-        for t_name, t_inst in self.tables.items():
-            if t_inst.references(table_name) :
-                return Message.DropReferencedTableError.get_message(t_name)
+        # A table which references itself can be dropped
+        referenced_by = [name for name in self.tables[table_name].referenced_by if name != table_name]
+        if referenced_by :
+            return Message.DropReferencedTableError.get_message(table_name)
         
         self._drop_table(table_name)
         return Message.DropSuccess.get_message(table_name)
         
     def select(self, query: Query):
+        """
+        Returns the error message, or the result table as a generator of text chunks.
+        """
         for table_ref in query.from_clause:
             if table_ref.table_name not in self.tables :
                 return Message.NoSuchTable.get_message()
-            
-        return self._show_query(*self._parse_query(query))
         
-    def insert(self, table_name: str, row: List[str], column_list: Optional[List[str]]):
+        try :
+            with profiler.phase("plan"):
+                plan = self.planner.plan_select(query)
+        except QueryError as error:
+            return error.message
+        
+        return self._stream_query(plan)
+        
+    def insert(self, table_name: str, row: List[Union[str, Value]], column_list: Optional[List[str]]):
+        success, message = self._insert_rows(table_name, [row], column_list)
+        if not success:
+            return message
+        return Message.InsertResult.get_message()
+    
+    def insert_many(self, table_name: str, rows: List[List[Union[str, Value]]], column_list: Optional[List[str]]):
+        """
+        Insert several rows of one statement. The batch is validated as a whole
+        and nothing is inserted if any of the rows is invalid.
+        """
+        success, message = self._insert_rows(table_name, rows, column_list)
+        if not success:
+            return message
+        return Message.InsertManyResult.get_message(len(rows))
+        
+        
+    def load_data(self, file_path: str, table_name: str):
+        """
+        Stream the rows of a csv/tsv file into the table batch by batch.
+        Each batch is checked against the column definitions before it is written.
+        An empty field is an empty text in a char column, and null in the other columns, which have no empty value.
+        When a line does not match or can not be read, the statement is aborted, so the batches before it
+        are not loaded either (unless the db has no transactions, see abort_statement).
+        """
         if table_name not in self.tables:
             return Message.NoSuchTable.get_message()
         
-        success, message = self.tables[table_name].insert_row(row, column_list)
-        if success:
-            self._save_table(self.tables[table_name])
+        table = self.tables[table_name]
+        column_definitions = table.schema.column_definitions
+        count = 0
+        try :
+            for batch in BulkLoader.read_batches(file_path, table.schema.columns):
+                new_rows = []
+                for line_num, row in batch:
+                    if len(row) != len(column_definitions):
+                        return self._abort_load(Message.LoadDataTypeMismatchError.get_message(line_num))
+                    row = [None if value == "" and column.data_type != ColumnDefinition.CHAR else value for column, value in zip(column_definitions, row)]
+                    for column, value in zip(column_definitions, row):
+                        if not column.is_valid_value(value):
+                            return self._abort_load(Message.LoadDataTypeMismatchError.get_message(line_num))
+                    new_rows.append([column.to_value(value) for column, value in zip(column_definitions, row)])
+                duplicate = self._find_duplicate(table, new_rows)
+                if duplicate is not None:
+                    return self._abort_load(Message.LoadDataDuplicatePrimaryKeyError.get_message(batch[duplicate][0]))
+                missing = self._find_missing_parent(table, new_rows)
+                if missing is not None:
+                    return self._abort_load(Message.LoadDataReferentialIntegrityError.get_message(batch[missing][0]))
+                self._save_rows(table, new_rows)
+                count += len(new_rows)
+        except FileFormatError as error:
+            return self._abort_load(error.message)
+        except OSError:
+            return self._abort_load(Message.FileOpenError.get_message(file_path))
         
+        return Message.LoadDataResult.get_message(count)
+    
+    def _abort_load(self, message: str) -> str:
+        """
+        Undo the batches which are loaded, and returns the message of the failure.
+        """
+        self.abort_statement()
         return message
+    
+    def copy_table(self, table_name: str, file_path: str):
+        if table_name not in self.tables:
+            return Message.NoSuchTable.get_message()
+        
+        table = self.tables[table_name]
+        try :
+            count = BulkLoader.write_rows(file_path, table.schema.columns, (table.to_text_row(row) for _, row in self.scan_rows(table)))
+        except OSError:
+            return Message.FileOpenError.get_message(file_path)
+        
+        return Message.CopyResult.get_message(count)
         
+    def create_index(self, index_name: str, table_name: str, column_list: List[str]):
+        """
+        Create an index over the columns and fill it from the rows already in the table.
+        Index names are unique over the whole database.
+        """
+        if table_name not in self.tables:
+            return Message.NoSuchTable.get_message()
+        index = Index(index_name=index_name, column_list=column_list)
+        if self._find_index_table(index_name) is not None or index.is_internal():
+            return Message.IndexExistenceError.get_message()
+        
+        table = self.tables[table_name]
+        for column_name in column_list:
+            if column_name not in table.schema.columns:
+                return Message.IndexColumnExistenceError.get_message(column_name)
+        if len(column_list) != len(set(column_list)):
+            return Message.IndexDuplicateColumnError.get_message()
+        
+        table = self._edit_table(table_name)
+        self._build_index(table, index)
+        self._save_table(table)
+        return Message.CreateIndexSuccess.get_message(index_name)
+    
+    def drop_index(self, index_name: str):
+        table = self._find_index_table(index_name)
+        if table is None or table.indexes[index_name].is_internal():
+            return Message.NoSuchIndex.get_message()
+        
+        table = self._edit_table(table.table_name)
+        table.indexes.pop(index_name)
+        self.dbInstance.drop_index(table.table_name, index_name)
+        self._save_table(table)
+        return Message.DropIndexSuccess.get_message(index_name)
         
     def explain(self, table_name):
         if table_name not in self.tables:
@@ -340,6 +805,42 @@ class DatabaseRepository:
         else :
             return self._show_table(table_name)
         
+    def explain_select(self, query: Query):
+        """
+        Run the select query and show its plan, with the rows each node was estimated to produce,
+        the rows it produced and the time spent in it (with the nodes below it).
+        """
+        for table_ref in query.from_clause:
+            if table_ref.table_name not in self.tables :
+                return Message.NoSuchTable.get_message()
+        
+        try :
+            with profiler.phase("plan"):
+                plan = self.planner.plan_select(query)
+        except QueryError as error:
+            return error.message
+        
+        instrument(plan)
+        for _ in plan.rows():
+            pass
+        return self._show_plan(plan)
+        
+    def analyze(self, table_name: str):
+        """
+        Build the statistics of the table again from all its rows, the row count is counted again as well.
+        """
+        if table_name not in self.tables:
+            return Message.NoSuchTable.get_message()
+        
+        table = self._edit_table(table_name)
+        statistics, row_count = TableStatistics.analyze(table.schema.columns, (row for _, row in self.scan_rows(table)))
+        table.statistics = statistics
+        table.statistics_loaded = True
+        table.row_count = row_count
+        self._write_counters(table)
+        self.dbInstance.sync()
+        return Message.AnalyzeSuccess.get_message(table_name)
+        
     def show_tables(self):
         line = "\n"
         line += BORDER_LINE + "\n"
@@ -348,11 +849,87 @@ class DatabaseRepository:
         line += BORDER_LINE
         return line
         
-    def delete(self):
-        pass
+    def delete(self, table_name: str, where_clause):
+        """
+        Delete the rows matching the where clause record by record, with their index entries.
+        The rows are found through an index when the where clause allows it,
+        so the cost follows the number of deleted rows rather than the size of the table.
+        A matching row which is referenced by a foreign key of a row that is not deleted is kept, and the others
+        are deleted: the statement does not fail as a whole, it reports how many rows are deleted and how many are kept.
+        """
+        if table_name not in self.tables:
+            return Message.NoSuchTable.get_message()
+        
+        table = self.tables[table_name]
+        try :
+            with profiler.phase("plan"):
+                plan = self.planner.plan_modification(table, where_clause)
+        except QueryError as error:
+            return error.message
+        
+        # The rows are collected before deleting, so the cursors of the plan never see a deleted record
+        targets = list(plan.rowid_rows())
+        kept = self._find_kept_rows(table, targets)
+        targets = [(rowid, row) for rowid, row in targets if rowid not in kept]
+        for rowid, row in targets:
+            self._delete_row(table, rowid, row)
+        self._add_row_count(table, -len(targets))
+        self._update_statistics(table, [], [row for _, row in targets])
+        self._count_changes(table, len(targets))
+        self.dbInstance.sync()
+        
+        message = Message.DeleteResult.get_message(len(targets))
+        if kept:
+            message += "\n" + Message.DeleteReferentialIntegrityPassed.get_message(len(kept))
+        return message
+        
+    def update_tables(self, table_name: str, column_name: str, value: Optional[Value], where_clause):
+        """
+        Set the column of the rows matching the where clause, rewriting only their records.
+        The new value is checked once for the statement, and only the index entries
+        of the indexes over the column are replaced.
+        """
+        if table_name not in self.tables:
+            return Message.NoSuchTable.get_message()
+        
+        table = self.tables[table_name]
+        column = table.schema.get_column(column_name)
+        if column is None:
+            return Message.UpdateColumnExistenceError.get_message(column_name)
+        if value is None and column.not_null:
+            return Message.UpdateColumnNonNullableError.get_message(column_name)
+        if value is not None and not column.is_valid_literal(value):
+            return Message.UpdateTypeMismatchError.get_message()
+        new_value = None if value is None else column.to_value(value.value)
+        position = table.schema.columns.index(column_name)
+        
+        try :
+            with profiler.phase("plan"):
+                plan = self.planner.plan_modification(table, where_clause)
+        except QueryError as error:
+            return error.message
         
-    def update_tables(self):
-        pass
+        # The rows are collected before updating, so the cursors of the plan never see an updated record
+        targets = []
+        for rowid, row in plan.rowid_rows():
+            new_row = list(row)
+            new_row[position] = new_value
+            targets.append((rowid, row, new_row))
+        
+        success, message = self._check_unique_update(table, targets)
+        if not success:
+            return message
+        success, message = self._check_update_references(table, position, targets)
+        if not success:
+            return message
+        
+        indexes = [index for index in table.indexes.values() if position in index.positions]
+        for rowid, row, new_row in targets:
+            self._update_row(table, rowid, row, new_row, indexes)
+        self._update_statistics(table, [new_row for _, _, new_row in targets], [row for _, row, _ in targets])
+        self._count_changes(table, len(targets))
+        self.dbInstance.sync()
+        return Message.UpdateResult.get_message(len(targets))
     
     def get_table_instance(self, table_name):
         if table_name not in self.tables :
@@ -360,50 +937,481 @@ class DatabaseRepository:
         
         return self.tables[table_name]
     
-    def _parse_query(self, query:Query):
-        column_list = []
-        rows = []
-        widths = []
-        for table_ref in query.from_clause: # Currently only one table
-            table = self.tables[table_ref.table_name]
-            for column in table.schema.columns:
-                column_list.append(column)
-                widths.append(len(column))
-            
-            for row in table.rows:
-                rows.append(row)
-                for index in range(len(row)):
-                    widths[index] = max(widths[index], len(row[index]))
-                
-        return column_list, rows, widths
+    def _stream_query(self, plan: Plan):
+        """
+        Yields the result table in chunks of text while the rows are produced by the plan.
+        The widths are measured on the first SAMPLE_SIZE rows, so a small result is aligned exactly.
+        For a larger one the declared lengths of the columns are taken into account as well,
+        and a longer value after the sample only widens its own cell.
+        """
+        column_list = [column.column_name.upper() for column in plan.columns]
+        definitions = [column.definition for column in plan.columns]
+        format_row = profiler.wrap("format", self._format_row)
+        format_line = profiler.wrap("format", self._format_line)
+        rows = plan.rows()
+        sample = [format_row(row, definitions) for row in islice(rows, SAMPLE_SIZE)]
+        
+        widths = [len(column) for column in column_list]
+        for row in sample:
+            for index in range(len(row)):
+                widths[index] = max(widths[index], len(row[index]))
+        if len(sample) == SAMPLE_SIZE:
+            for index, column in enumerate(plan.columns):
+                widths[index] = max(widths[index], self._get_declared_width(column.definition))
+        
+        border = "".join("+" + "-" * (width + 2) for width in widths) + "+\n"
+        yield "\n" + border + format_line(column_list, widths) + border
+        
+        chunk = []
+        for row in chain(sample, (format_row(row, definitions) for row in rows)):
+            chunk.append(format_line(row, widths))
+            if len(chunk) == CHUNK_SIZE:
+                yield "".join(chunk)
+                chunk = []
+        yield "".join(chunk) + border
     
-    def _show_query(self, column_list, rows, widths):
-        line = "\n"
-        col_list = [c.upper() for c in column_list]
-        for vars in [None, col_list, None, *rows, None]:
-            for index in range(len(widths)):
-                if vars is None:
-                    line += "+" + "-" * (widths[index]+2)
-                else:
-                    line += "| " + vars[index] + " " * (widths[index] - len(vars[index]) + 1)
-            
-            if vars is None:
-                line += "+\n"
-            else:
-                line += "|\n"
-                
-        return line
+    def _format_row(self, row, columns: List[ColumnDefinition]) -> List[str]:
+        return [self._format_value(value, column) for value, column in zip(row, columns)]
+    
+    def _format_value(self, value, column: ColumnDefinition) -> str:
+        return "null" if value is None else column.to_text(value)
+    
+    def _format_line(self, values: List[str], widths: List[int]) -> str:
+        line = ""
+        for value, width in zip(values, widths):
+            line += "| " + value + " " * (max(width - len(value), 0) + 1)
+        return line + "|\n"
+    
+    def _get_declared_width(self, column: ColumnDefinition) -> int:
+        """
+        The width which the values of the column can take, as far as the schema tells.
+        """
+        width = 0
+        if column.data_type == ColumnDefinition.CHAR:
+            width = column.data_len
+        elif column.data_type == ColumnDefinition.DATE:
+            width = DATE_WIDTH
+        if not column.not_null:
+            width = max(width, len(self._format_value(None, column)))
+        return width
     
     def _save_table(self, table: Table):
         self.dbInstance.add_table(table.table_name, table.to_dict())
-        self.tables[table.table_name] = table
+        if self.tables.get(table.table_name) is not table:
+            self.tables = {**self.tables, table.table_name : table}
+        return
+    
+    def scan_rows(self, table: Table, positions: Optional[List[int]] = None):
+        """
+        Iterates the (rowid, row) pairs of the table straight from the db cursor.
+        Only the columns at the given positions are decoded, every column if positions is None.
+        """
+        decode = profiler.wrap("decode", table.codec.decoder(positions))
+        for rowid, record in self.dbInstance.iter_rows(table.table_name):
+            yield rowid, decode(record)
+    
+    def parallel_scan_rows(self, table: Table, positions: List[int], conjuncts, resolved: dict, with_rowid: bool):
+        """
+        Yields the rows of the table which pass the conjuncts, filtered by the worker processes over rowid ranges.
+        The workers read the file, so the planner only chooses it when the statement sees the committed records (sees_only_file).
+        """
+        last_rowid = self.dbInstance.last_rowid(table.table_name)
+        self.dbInstance.write_cache()
+        tasks = [
+            ScanTask(
+                os.path.abspath(DB_FILE), self.dbInstance.row_prefix(table.table_name),
+                table.schema.column_definitions, positions, conjuncts, resolved, first_rowid, end_rowid, with_rowid
+            )
+            for first_rowid, end_rowid in partition(1, last_rowid)
+        ]
+        for rows in run_partitions(tasks):
+            yield from rows
+    
+    def find_rows(self, table: Table, index: Index, values: list, positions: Optional[List[int]] = None):
+        """
+        Iterates the (rowid, row) pairs whose indexed columns are equal to the values,
+        by seeking the key in the index instead of scanning the table.
+        The values may cover only the leading columns of the index.
+        """
+        decode = profiler.wrap("decode", table.codec.decoder(positions))
+        for rowid in self.dbInstance.find_index_rowids(table.table_name, index.index_name, index.encode(values)):
+            yield rowid, decode(self.dbInstance.get_row(table.table_name, rowid))
+    
+    def _insert_rows(self, table_name: str, rows: List[List[Union[str, Value]]], column_list: Optional[List[str]]) -> Tuple[bool, Optional[str]]:
+        if table_name not in self.tables:
+            return False, Message.NoSuchTable.get_message()
+        
+        table = self.tables[table_name]
+        success, positions = table.get_value_positions(column_list)
+        if not success:
+            return False, positions
+        
+        value_count = len(column_list) if column_list is not None else len(table.schema.columns)
+        new_rows = []
+        for row in rows:
+            success, new_row = table.build_row(row, positions, value_count)
+            if not success:
+                return False, new_row
+            new_rows.append(new_row)
+        
+        success, message = self._check_unique(table, new_rows)
+        if not success:
+            return False, message
+        if self._find_missing_parent(table, new_rows) is not None:
+            return False, Message.InsertReferentialIntegrityError.get_message()
+        
+        self._save_rows(table, new_rows)
+        return True, None
+    
+    def _check_unique(self, table: Table, rows: List[list]) -> Tuple[bool, Optional[str]]:
+        """
+        Check that the rows duplicate neither each other nor the stored rows on the primary key.
+        Each stored key is checked by a single seek in the index.
+        """
+        if self._find_duplicate(table, rows) is not None:
+            return False, Message.InsertDuplicatePrimaryKeyError.get_message()
+        return True, None
+    
+    def _find_duplicate(self, table: Table, rows: List[list]) -> Optional[int]:
+        """
+        Returns the number of the first row whose primary key is in a row before it or in a stored row, None if there is none.
+        """
+        index = table.get_primary_index()
+        if index is None:
+            return None
+        
+        keys = set()
+        for number, row in enumerate(rows):
+            key = index.encode_row(row)
+            if key in keys or self._index_contains(table, index, key):
+                return number
+            keys.add(key)
+        return None
+    
+    def _check_unique_update(self, table: Table, targets: List[Tuple[int, list, list]]) -> Tuple[bool, Optional[str]]:
+        """
+        Check that the updated rows duplicate neither each other nor the other stored rows on the primary key.
+        targets are the (rowid, old row, new row) of the update.
+        """
+        index = table.get_primary_index()
+        if index is None:
+            return True, None
+        
+        # A stored row with the new key of a target is fine only if it is a target itself,
+        # then its own new key is checked against the others
+        rowids = set(rowid for rowid, _, _ in targets)
+        keys = set()
+        for _, old_row, new_row in targets:
+            key = index.encode_row(new_row)
+            if key in keys:
+                return False, Message.UpdateDuplicatePrimaryKeyError.get_message()
+            keys.add(key)
+            if key == index.encode_row(old_row):
+                continue
+            for rowid in self.dbInstance.find_index_rowids(table.table_name, index.index_name, key):
+                if rowid not in rowids:
+                    return False, Message.UpdateDuplicatePrimaryKeyError.get_message()
+        return True, None
+    
+    def _check_update_references(self, table: Table, position: int, targets: List[Tuple[int, list, list]]) -> Tuple[bool, Optional[str]]:
+        """
+        Check the foreign keys which the updated column is part of: the new values must reference a row,
+        and a row whose referenced values change must not be referenced.
+        """
+        if any(position in positions for _, _, positions in self._get_parent_checks(table)):
+            if self._find_missing_parent(table, [new_row for _, _, new_row in targets]) is not None:
+                return False, Message.UpdateReferentialIntegrityError.get_message()
+        
+        checks = [check for check in self._get_child_checks(table) if position in check[2]]
+        for _, old_row, new_row in targets:
+            if old_row[position] != new_row[position] and self._is_referenced(checks, old_row):
+                return False, Message.UpdateReferentialIntegrityError.get_message()
+        return True, None
+    
+    def range_rows(self, table: Table, index: Index, low: Tuple[list, bool] = None, high: Tuple[list, bool] = None, positions: Optional[List[int]] = None, reverse: bool = False):
+        """
+        Iterates the (rowid, row) pairs in the order of the index (or the reverse order), between the bounds.
+        A bound is (values of the leading columns of the index, inclusive).
+        """
+        decode = profiler.wrap("decode", table.codec.decoder(positions))
+        low_key = None if low is None else (index.encode(low[0]), low[1])
+        high_key = None if high is None else (index.encode(high[0]), high[1])
+        for rowid in self.dbInstance.iter_index(table.table_name, index.index_name, low_key, high_key, reverse):
+            yield rowid, decode(self.dbInstance.get_row(table.table_name, rowid))
+    
+    def _find_index_table(self, index_name: str) -> Optional[Table]:
+        for table in self.tables.values():
+            if index_name in table.indexes:
+                return table
+        return None
+    
+    def _index_contains(self, table: Table, index: Index, key: bytes) -> bool:
+        for _ in self.dbInstance.find_index_rowids(table.table_name, index.index_name, key):
+            return True
+        return False
+    
+    def _save_rows(self, table: Table, rows: List[list]):
+        table = self._edit_table(table.table_name)
+        if table.next_rowid is None:
+            table.next_rowid = self.dbInstance.last_rowid(table.table_name) + 1
+        encode = profiler.wrap("encode", table.codec.encode)
+        self.dbInstance.add_rows(table.table_name, table.next_rowid, [encode(row) for row in rows])
+        for index in table.indexes.values():
+            self.dbInstance.add_index_entries(
+                table.table_name,
+                index.index_name,
+                [(index.encode_row(row), rowid) for rowid, row in enumerate(rows, start=table.next_rowid)]
+            )
+        self._add_row_count(table, len(rows))
+        self._update_statistics(table, rows, [])
+        self._count_changes(table, len(rows))
+        self.dbInstance.sync()
+        table.next_rowid += len(rows)
+        return
+    
+    def get_row_count(self, table: Table) -> int:
+        """
+        The exact number of rows of the table. A table saved before the counts were kept is counted once,
+        and the count is only kept in memory: it is written with the other changes of the count (see _count_changes),
+        since a statement which reads may hold only the read lock.
+        A snapshot takes the count of its version, and reads it from the db if it is not loaded, since only a writer loads it.
+        """
+        if self.reads_snapshot():
+            if table.row_count is not None:
+                return table.row_count
+            row_count = self.dbInstance.get_row_count(table.table_name)
+            return row_count if row_count is not None else sum(1 for _ in self.dbInstance.iter_rows(table.table_name))
+        if table.row_count is None:
+            table.row_count = self.dbInstance.get_row_count(table.table_name)
+        if table.row_count is None:
+            table.row_count = sum(1 for _ in self.dbInstance.iter_rows(table.table_name))
+        return table.row_count
+    
+    def _add_row_count(self, table: Table, count: int):
+        table = self._edit_table(table.table_name)
+        table.row_count = self.get_row_count(table) + count
+    
+    def get_statistics(self, table: Table) -> Optional[TableStatistics]:
+        if not table.statistics_loaded and self.reads_snapshot():
+            # Only a writer loads them into the table, which it keeps up to date from then on
+            item = self.dbInstance.get_statistics(table.table_name)
+            return None if item is None else TableStatistics(table.schema.columns, item)
+        if not table.statistics_loaded:
+            item = self.dbInstance.get_statistics(table.table_name)
+            table.statistics = None if item is None else TableStatistics(table.schema.columns, item)
+            table.statistics_loaded = True
+        return table.statistics
+    
+    def _update_statistics(self, table: Table, added: List[list], removed: List[list]):
+        """
+        Keep the statistics of the table up to date with the rows which a statement adds and removes.
+        A table without statistics is left so until it is analyzed.
+        """
+        table = self._edit_table(table.table_name)
+        statistics = self.get_statistics(table)
+        if statistics is None or not (added or removed):
+            return
+        statistics.remove_rows(removed)
+        statistics.add_rows(added)
+    
+    def _count_changes(self, table: Table, count: int):
+        """
+        Count the rows which a statement changed, the row count and the statistics kept in memory are written
+        once WRITE_COUNTERS_ROWS rows are, so that a statement writes only its rows and their index entries.
+        The row count in the db is deleted with the first change after it is written,
+        so that a db which is not closed counts the rows of the table again instead of taking a stale count.
+        """
+        if count == 0:
+            return
+        table = self._edit_table(table.table_name)
+        if table.changed_rows == 0:
+            self.dbInstance.delete_row_count(table.table_name)
+        table.changed_rows += count
+        if table.changed_rows >= WRITE_COUNTERS_ROWS:
+            self._write_counters(table)
+    
+    def _write_counters(self, table: Table):
+        """
+        Write the row count and the statistics of the table of the draft.
+        """
+        self.dbInstance.set_row_count(table.table_name, self.get_row_count(table))
+        statistics = self.get_statistics(table)
+        if statistics is not None:
+            self.dbInstance.set_statistics(table.table_name, statistics.to_dict())
+        table.changed_rows = 0
+    
+    def _write_changed_counters(self):
+        for table_name in [table_name for table_name, table in self.tables.items() if table.changed_rows > 0]:
+            self._write_counters(self._edit_table(table_name))
+    
+    def _delete_row(self, table: Table, rowid: int, row: list):
+        for index in table.indexes.values():
+            self.dbInstance.delete_index_entry(table.table_name, index.index_name, index.encode_row(row), rowid)
+        self.dbInstance.delete_row(table.table_name, rowid)
+        return
+    
+    def _update_row(self, table: Table, rowid: int, old_row: list, new_row: list, indexes: List[Index]):
+        """
+        Rewrite the row under its rowid, only the entries of the given indexes whose key changed are replaced.
+        """
+        for index in indexes:
+            old_key = index.encode_row(old_row)
+            new_key = index.encode_row(new_row)
+            if old_key != new_key:
+                self.dbInstance.delete_index_entry(table.table_name, index.index_name, old_key, rowid)
+                self.dbInstance.add_index_entries(table.table_name, index.index_name, [(new_key, rowid)])
+        self.dbInstance.put_row(table.table_name, rowid, profiler.wrap("encode", table.codec.encode)(new_row))
+        return
+    
+    def _build_index(self, table: Table, index: Index):
+        """
+        Fill a new index from the rows which are already in the table.
+        """
+        table.add_index(index)
+        batch = []
+        for rowid, row in self.scan_rows(table):
+            batch.append((index.encode_row(row), rowid))
+            if len(batch) == BATCH_SIZE:
+                self.dbInstance.add_index_entries(table.table_name, index.index_name, batch)
+                batch = []
+        self.dbInstance.add_index_entries(table.table_name, index.index_name, batch)
+        self.dbInstance.sync()
+        return
+    
+    def _upgrade_rows(self, table: Table):
+        """
+        Convert the rows saved as json lists of texts into packed typed records.
+        A value which does not fit its column, which could be inserted before the values were checked, becomes null.
+        The indexes are built again, since the keys of the dates are now encoded from the typed values.
+        """
+        columns = table.schema.column_definitions
+        def convert(record: bytes) -> bytes:
+            row = self.dbInstance.bytes_to_dict(record)
+            return table.codec.encode([
+                column.to_value(value) if value is not None and column.is_valid_value(value) else None
+                for column, value in zip(columns, row)
+            ])
+        self.dbInstance.rewrite_rows(table.table_name, convert)
+        
+        for index in list(table.indexes.values()):
+            self.dbInstance.drop_index(table.table_name, index.index_name)
+            self._build_index(table, index)
         return
     
     def _drop_table(self, table_name: str):
         self.dbInstance.drop_table(table_name)
-        self.tables.pop(table_name)
+        table = self.tables[table_name]
+        self.tables = {name : other for name, other in self.tables.items() if name != table_name}
+        for reference_table in set(tc.reference_table for _, tc in table.get_foreign_keys()):
+            if reference_table == table_name:
+                continue
+            parent = self._edit_table(reference_table)
+            parent.referenced_by.remove(table_name)
+            self._save_table(parent)
+        return
+    
+    def _rebuild_references(self):
+        """
+        Find the referencing tables of every table from the foreign keys, for the tables saved before they were kept.
+        """
+        for table in self.tables.values():
+            table.referenced_by = []
+        for table in self.tables.values():
+            for reference_table in set(tc.reference_table for _, tc in table.get_foreign_keys()):
+                self.tables[reference_table].referenced_by.append(table.table_name)
+        for table in self.tables.values():
+            self._save_table(table)
         return
     
+    def _get_parent_checks(self, table: Table) -> List[Tuple[Table, Index, List[int]]]:
+        """
+        For each foreign key of the table, returns the referenced table, its primary key index,
+        and the positions in the rows of this table of the values of the index columns.
+        """
+        checks = []
+        for _, table_constraint in table.get_foreign_keys():
+            parent = self.tables[table_constraint.reference_table]
+            parent_index = parent.get_primary_index()
+            positions = [
+                table.schema.columns.index(table_constraint.column_list[table_constraint.reference_column_list.index(column_name)])
+                for column_name in parent_index.column_list
+            ]
+            checks.append((parent, parent_index, positions))
+        return checks
+    
+    def _find_missing_parent(self, table: Table, rows: List[list]) -> Optional[int]:
+        """
+        Returns the number of the first row whose foreign key references no row, or None if every row is valid.
+        A foreign key with a null is not checked. Each key costs a seek in the primary key index of the referenced table.
+        A foreign key to the table itself may also reference one of the rows.
+        """
+        for parent, parent_index, positions in self._get_parent_checks(table):
+            found = set(parent_index.encode_row(row) for row in rows) if parent.table_name == table.table_name else set()
+            for number, row in enumerate(rows):
+                values = [row[position] for position in positions]
+                if None in values:
+                    continue
+                key = parent_index.encode(values)
+                if key in found:
+                    continue
+                if not self._index_contains(parent, parent_index, key):
+                    return number
+                found.add(key)
+        return None
+    
+    def _get_child_checks(self, table: Table) -> List[Tuple[Table, Index, List[int]]]:
+        """
+        For each foreign key referencing the table, returns the referencing table, the index over the foreign key,
+        and the positions in the rows of this table of the values of the index columns.
+        """
+        checks = []
+        for child_name in table.referenced_by:
+            child = self.tables[child_name]
+            for index, table_constraint in child.get_foreign_keys():
+                if table_constraint.reference_table != table.table_name:
+                    continue
+                positions = [
+                    table.schema.columns.index(table_constraint.reference_column_list[number])
+                    for number in range(len(table_constraint.column_list))
+                ]
+                checks.append((child, index, positions))
+        return checks
+    
+    def _find_kept_rows(self, table: Table, targets: List[Tuple[int, list]]) -> Set[int]:
+        """
+        Returns the rowids of the rows to delete which are kept, since a row which is not deleted references them.
+        A row of another table is never deleted by the statement, so a seek in the index of its foreign key tells.
+        The rows of the same table which reference a row may be deleted with it, unless they are kept themselves,
+        so the kept rows are looked for again until no more are found.
+        """
+        checks = self._get_child_checks(table)
+        kept = set()
+        referencing_rowids = {}
+        for rowid, row in targets:
+            for child, index, positions in checks:
+                key = index.encode([row[position] for position in positions])
+                if child.table_name != table.table_name:
+                    if self._index_contains(child, index, key):
+                        kept.add(rowid)
+                else :
+                    referencing_rowids.setdefault(rowid, set()).update(
+                        self.dbInstance.find_index_rowids(child.table_name, index.index_name, key)
+                    )
+        
+        deleted = set(rowid for rowid, _ in targets) - kept
+        while True:
+            referenced = [rowid for rowid, referencing in referencing_rowids.items() if rowid in deleted and not referencing <= deleted]
+            if not referenced:
+                return kept
+            deleted.difference_update(referenced)
+            kept.update(referenced)
+    
+    def _is_referenced(self, checks: List[Tuple[Table, Index, List[int]]], row: list) -> bool:
+        for child, index, positions in checks:
+            if self._index_contains(child, index, index.encode([row[position] for position in positions])):
+                return True
+        return False
+    
     def _show_table(self, table_name):
 
         contents = [("column_name", "type", "null", "key")]
@@ -434,8 +1442,47 @@ class DatabaseRepository:
             for index in range (4) :
                 line += f"{content[index]}" + (content_widths[index] - len(content[index]) + 3)*" "
             line += "\n"
+        
+        # The primary and foreign key indexes are already shown by the key column, so only the created indexes are listed
+        index_contents = [("index_name", "columns")]
+        index_widths = [10, 7]
+        for index_name, index in self.tables[table_name].indexes.items():
+            if index.is_internal():
+                continue
+            index_contents.append((index_name, ", ".join(index.column_list)))
+            index_widths = [max(index_widths[index], len(index_contents[-1][index])) for index in range(2)]
+        
+        if len(index_contents) > 1:
+            line += "\n"
+            for content in index_contents:
+                for index in range (2) :
+                    line += f"{content[index]}" + (index_widths[index] - len(content[index]) + 3)*" "
+                line += "\n"
 
         line += BORDER_LINE
         return line
+    
+    def _show_plan(self, plan: Plan):
+        contents = [("plan", "estimated rows", "actual rows", "time (ms)")]
+        def add_node(node: Plan, depth: int):
+            contents.append((
+                "  " * depth + node.describe(),
+                str(round(node.estimate)),
+                str(node.actual_rows),
+                f"{node.actual_time * 1000:.3f}"
+            ))
+            for child in node.children():
+                add_node(child, depth + 1)
+        add_node(plan, 0)
+        content_widths = [max(len(content[index]) for content in contents) for index in range(4)]
+        
+        line = "\n"
+        line += BORDER_LINE + "\n"
+        for content in contents:
+            for index in range (4) :
+                line += f"{content[index]}" + (content_widths[index] - len(content[index]) + 3)*" "
+            line += "\n"
+        line += BORDER_LINE
+        return line
 
 dbrepo = DatabaseRepository()
\ No newline at end of file
@@ -0,0 +1,109 @@
+"""
+Client of dbServer, for applications which run queries on the database without a process per query.
+
+    pool = ConnectionPool(("127.0.0.1", 5433), size=4)
+    print(pool.execute("select * from account;"))
+"""
+import queue
+import socket
+from contextlib import contextmanager
+from typing import Iterator, Tuple, Union
+from wireProtocol import DEFAULT_HOST, DEFAULT_PORT, STATUS_IN_TRANSACTION, ProtocolError, encode_frame, recv_frame
+
+# A tcp address (host, port) or the path of a unix socket
+Address = Union[Tuple[str, int], str]
+
+class Connection:
+    """
+    A connection to the server, which runs the statements of one session:
+    the prepared statements and the transaction begun on a connection belong to it.
+    """
+    def __init__(self, address: Address = (DEFAULT_HOST, DEFAULT_PORT)) -> None:
+        if isinstance(address, str):
+            self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        else :
+            self.sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+            self.sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        self.sock.connect(address)
+        # Whether the session is in a transaction of BEGIN, as the server reported at the end of the last response
+        self.in_transaction = False
+        # Whether a response is being read, so the connection is in the middle of it
+        self.reading = False
+
+    def execute_stream(self, statements: str) -> Iterator[str]:
+        """
+        Yields the output of the statements as the server sends it. It must be read to the end before the next call.
+        """
+        self.reading = True
+        self.sock.sendall(encode_frame(statements.encode('utf-8')))
+        while True:
+            payload = recv_frame(self.sock)
+            if not payload:
+                break
+            yield payload.decode('utf-8')
+        self.in_transaction = recv_frame(self.sock) == STATUS_IN_TRANSACTION
+        self.reading = False
+
+    def execute(self, statements: str) -> str:
+        """
+        Returns the output of the statements, which the shell would print after its prompts.
+        """
+        return "".join(self.execute_stream(statements))
+
+    def close(self):
+        self.sock.close()
+
+class ConnectionPool:
+    """
+    Keeps up to size open connections, which are lent to one thread at a time.
+    A connection is opened when none is free, and is closed instead of returned when the pool is full.
+    A transaction which the borrower left is rolled back before the connection is returned, since the next borrower
+    would run in it and hold the write lock of the server.
+    """
+    def __init__(self, address: Address = (DEFAULT_HOST, DEFAULT_PORT), size: int = 8) -> None:
+        self.address = address
+        self.free: "queue.LifoQueue[Connection]" = queue.LifoQueue(maxsize=size)
+
+    @contextmanager
+    def connection(self) -> Iterator[Connection]:
+        try :
+            connection = self.free.get_nowait()
+        except queue.Empty:
+            connection = Connection(self.address)
+        try :
+            yield connection
+        except BaseException:
+            # The connection may be in the middle of a response, so it is not reused
+            connection.close()
+            raise
+        self.release(connection)
+
+    def release(self, connection: Connection):
+        """
+        Returns the connection out of any transaction, or closes it if it can not be, such as when its response
+        was not read to the end. The server rolls back the transaction of a closed connection.
+        """
+        if connection.in_transaction and not connection.reading:
+            try :
+                connection.execute("rollback;")
+            except (OSError, ProtocolError):
+                connection.close()
+                return
+        if connection.in_transaction or connection.reading:
+            connection.close()
+            return
+        try :
+            self.free.put_nowait(connection)
+        except queue.Full:
+            connection.close()
+
+    def execute(self, statements: str) -> str:
+        with self.connection() as connection:
+            return connection.execute(statements)
+
+    def close(self):
+        while True:
+            try :
+                self.free.get_nowait().close()
+            except queue.Empty:
+                return
@@ -0,0 +1,262 @@
+"""
+Serves the database to many clients over TCP or a unix socket, speaking the frames of wireProtocol.
+
+usage: python dbServer.py [--host HOST] [--port PORT] [--unix PATH]
+"""
+import argparse
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Optional
+from lark import Lark, Tree
+from database import myDatabase
+from message import Message
+from profiler import profiler
+from run import MyTransformer, DatabaseManagementSystem
+from sqlParser import load_parser
+from wireProtocol import DEFAULT_HOST, DEFAULT_PORT, ProtocolError, encode_end, encode_frame, read_frame
+from writeBuffer import WRITE_BEHIND, WRITE_BEHIND_MS
+
+# Statements which only read the database, any number of them run at once
+READ_STATEMENTS = ("select_query", "explain_query", "explain_select_query", "describe_query", "desc_query", "show_tables_query", "copy_query",
+                   "set_profiling_query", "show_profile_query")
+
+class ReadWriteLock:
+    """
+    Many readers or one writer. A waiting writer keeps new readers out, so that writes are not starved.
+    """
+    def __init__(self) -> None:
+        self.condition = threading.Condition()
+        self.readers = 0
+        self.writing = False
+        self.waiting_writers = 0
+
+    def acquire_read(self):
+        with self.condition:
+            while self.writing or self.waiting_writers > 0:
+                self.condition.wait()
+            self.readers += 1
+
+    def release_read(self):
+        with self.condition:
+            self.readers -= 1
+            if self.readers == 0:
+                self.condition.notify_all()
+
+    def acquire_write(self):
+        with self.condition:
+            self.waiting_writers += 1
+            while self.writing or self.readers > 0:
+                self.condition.wait()
+            self.waiting_writers -= 1
+            self.writing = True
+
+    def release_write(self):
+        with self.condition:
+            self.writing = False
+            self.condition.notify_all()
+
+class WriteLock:
+    """
+    Holds the write lock in a with block.
+    """
+    def __init__(self, lock: ReadWriteLock) -> None:
+        self.lock = lock
+
+    def __enter__(self):
+        with profiler.phase("lock wait"):
+            self.lock.acquire_write()
+        return self
+
+    def __exit__(self, *args):
+        self.lock.release_write()
+        return False
+
+class SessionTransformer(MyTransformer):
+    """
+    Sends the output of the statements to the client, instead of printing it.
+    """
+    def __init__(self, emit: Callable[[str], None]) -> None:
+        super().__init__()
+        self.emit = emit
+
+    def print_request(self, request):
+        if request is None or request == "" :
+            return
+        if isinstance(request, str) :
+            with profiler.phase("output"):
+                self.emit(request + "\n")
+            return
+        for chunk in request:
+            with profiler.phase("output"):
+                self.emit(chunk)
+        self.emit("\n")
+
+class Session(DatabaseManagementSystem):
+    """
+    The statements of a client, which have their own prepared statements and transaction.
+    All of them run in the one thread of the session, since the transaction of the db instance is kept per thread,
+    so the sessions parse, plan and read at the same time while the writes are serialized by the lock.
+    A session in a transaction holds the write lock from BEGIN until COMMIT or ROLLBACK.
+    A read statement runs in a snapshot without the lock, so it neither waits for the writers nor makes them wait.
+    When it can not have one, it takes the read lock, or the write lock if write behind keeps records,
+    since its cursors may write them.
+    """
+    def __init__(self, sql_parser: Lark, lock: ReadWriteLock) -> None:
+        super().__init__(sql_parser)
+        self.lock = lock
+        self.executor = ThreadPoolExecutor(max_workers=1)
+        self.emit: Callable[[str], None] = lambda text: None
+        self.in_transaction = False
+
+    def run(self, text: str, emit: Callable[[str], None]) -> bool:
+        """
+        Run the statements of the text, each ends with a semicolon. Returns True if one is EXIT.
+        """
+        self.emit = emit
+        queries = text.split(";")
+        if queries[-1].strip() == "" :
+            queries.pop()
+        return self.transform_query(self.parse_queries(queries))
+
+    def print_to_prompt(self, statement):
+        self.emit(statement + "\n")
+
+    def execute_statement(self, output: Tree) -> Tree:
+        if self.in_transaction:
+            return self.run_statement(output)
+
+        statement = self.get_statement(output)
+        if statement is None:
+            return self.run_statement(output)
+        if statement.data in READ_STATEMENTS:
+            if myDatabase.begin_read():
+                return self.run_statement(output)
+            with profiler.phase("lock wait"):
+                self.lock.acquire_read()
+            if not myDatabase.has_pending_writes():
+                try :
+                    return self.run_statement(output)
+                finally :
+                    self.lock.release_read()
+            self.lock.release_read()
+
+        with profiler.phase("lock wait"):
+            self.lock.acquire_write()
+        try :
+            return self.run_statement(output)
+        finally :
+            if not self.in_transaction:
+                self.lock.release_write()
+
+    def run_statement(self, output: Tree) -> Tree:
+        was_in_transaction = self.in_transaction
+        try :
+            ans = self.transform_statement(SessionTransformer(self.emit), output)
+        finally :
+            self.in_transaction = myDatabase.in_transaction()
+        if was_in_transaction and not self.in_transaction:
+            self.lock.release_write()
+        return ans
+
+    def end_batch(self):
+        if self.in_transaction or not myDatabase.has_pending_writes():
+            return
+        with WriteLock(self.lock):
+            myDatabase.end_batch()
+
+    def close(self):
+        """
+        Roll back the transaction which the client left, in the thread of the session.
+        """
+        def rollback():
+            if self.in_transaction:
+                myDatabase.rollback(None)
+                self.in_transaction = False
+                self.lock.release_write()
+        self.executor.submit(rollback).result()
+        self.executor.shutdown()
+
+class DatabaseServer:
+    def __init__(self) -> None:
+        self.sql_parser = load_parser()
+        self.lock = ReadWriteLock()
+
+    async def handle_client(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        loop = asyncio.get_running_loop()
+        session = Session(self.sql_parser, self.lock)
+
+        # The output is written from the thread of the session, which waits for the client to take it
+        async def send(text: str):
+            writer.write(encode_frame(text.encode('utf-8')))
+            await writer.drain()
+        def emit(text: str):
+            asyncio.run_coroutine_threadsafe(send(text), loop).result()
+
+        try :
+            while True:
+                request = await read_frame(reader)
+                if request is None:
+                    break
+                try :
+                    text = request.decode('utf-8')
+                except UnicodeDecodeError:
+                    writer.write(encode_frame((Message.RequestEncodingError.get_message() + "\n").encode('utf-8')))
+                    writer.write(encode_end(session.in_transaction))
+                    await writer.drain()
+                    continue
+                exit = await loop.run_in_executor(session.executor, session.run, text, emit)
+                writer.write(encode_end(session.in_transaction))
+                await writer.drain()
+                if exit:
+                    break
+        except (ConnectionError, ProtocolError):
+            pass
+        finally :
+            await loop.run_in_executor(None, session.close)
+            writer.close()
+
+    def write_pending(self):
+        """
+        Write the records kept by write behind which are due, out of any session.
+        """
+        if not myDatabase.has_pending_writes():
+            return
+        with WriteLock(self.lock):
+            myDatabase.end_statement()
+
+    async def write_periodically(self):
+        """
+        For the deferred level, the kept records are written once they are old enough, even if no statement comes.
+        """
+        loop = asyncio.get_running_loop()
+        while True:
+            await asyncio.sleep(WRITE_BEHIND_MS / 1000)
+            await loop.run_in_executor(None, self.write_pending)
+
+    async def serve(self, host: str, port: int, unix_path: Optional[str] = None):
+        # The task is kept, since the loop only keeps a weak reference to it
+        writing = asyncio.get_running_loop().create_task(self.write_periodically()) if WRITE_BEHIND == "deferred" else None
+        if unix_path is not None:
+            server = await asyncio.start_unix_server(self.handle_client, path=unix_path)
+        else :
+            server = await asyncio.start_server(self.handle_client, host, port)
+        async with server:
+            await server.serve_forever()
+
+def main():
+    argument_parser = argparse.ArgumentParser(description="Serve the database over the network")
+    argument_parser.add_argument("--host", default=DEFAULT_HOST)
+    argument_parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    argument_parser.add_argument("--unix", default=None, help="path of a unix socket to listen on instead of tcp")
+    arguments = argument_parser.parse_args()
+
+    try :
+        asyncio.run(DatabaseServer().serve(arguments.host, arguments.port, arguments.unix))
+    except KeyboardInterrupt:
+        pass
+    finally :
+        myDatabase.close()
+
+if __name__ == "__main__":
+    main()
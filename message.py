@@ -19,6 +19,59 @@ class Message(Enum):
     DropReferencedTableError = 14
     InsertResult = 15
     SelectTableExistenceError = 16
+    InsertManyResult = 17
+    InsertTypeMismatchError = 18
+    InsertColumnExistenceError = 19
+    InsertColumnNonNullableError = 20
+    LoadDataResult = 21
+    FileOpenError = 22
+    LoadDataTypeMismatchError = 23
+    CopyResult = 24
+    InsertDuplicatePrimaryKeyError = 25
+    CreateIndexSuccess = 26
+    IndexExistenceError = 27
+    IndexColumnExistenceError = 28
+    IndexDuplicateColumnError = 29
+    DropIndexSuccess = 30
+    NoSuchIndex = 31
+    WhereIncomparableError = 32
+    WhereTableNotSpecified = 33
+    WhereColumnNotExist = 34
+    WhereAmbiguousReference = 35
+    SelectColumnResolveError = 36
+    PrepareSuccess = 37
+    NoSuchPreparedStatement = 38
+    ExecuteParameterCountError = 39
+    DeleteResult = 40
+    UpdateResult = 41
+    UpdateColumnExistenceError = 42
+    UpdateTypeMismatchError = 43
+    UpdateColumnNonNullableError = 44
+    UpdateDuplicatePrimaryKeyError = 45
+    InsertReferentialIntegrityError = 46
+    DeleteReferentialIntegrityPassed = 47
+    UpdateReferentialIntegrityError = 48
+    LoadDataReferentialIntegrityError = 49
+    TransactionBegin = 50
+    TransactionCommit = 51
+    TransactionRollback = 52
+    TransactionInProgressError = 53
+    NoTransactionError = 54
+    TransactionDisabledError = 55
+    SelectGroupByError = 56
+    SelectAggregateTypeError = 57
+    SelectLimitError = 58
+    AnalyzeSuccess = 59
+    ProfilingEnabled = 60
+    ProfilingDisabled = 61
+    NoProfileError = 62
+    StatementError = 63
+    RequestEncodingError = 64
+    LoadDataEncodingError = 65
+    LoadDataFormatError = 66
+    LoadDataDuplicatePrimaryKeyError = 67
+    PrepareParameterNumberError = 68
+    ParameterOutOfPrepareError = 69
     
     def get_message(self, arg = "") -> str :
         message: str
@@ -55,6 +108,137 @@ class Message(Enum):
             message = f"Drop table has failed: '{arg}' is referenced by other table"
         elif self == Message.InsertResult:
             message = "The row is inserted"
+        elif self == Message.InsertManyResult:
+            need_args = True
+            message = f"{arg} rows are inserted"
+        elif self == Message.InsertTypeMismatchError:
+            message = "Insertion has failed: Types are not matched"
+        elif self == Message.InsertColumnExistenceError:
+            need_args = True
+            message = f"Insertion has failed: '{arg}' does not exist"
+        elif self == Message.InsertColumnNonNullableError:
+            need_args = True
+            message = f"Insertion has failed: '{arg}' is not nullable"
+        elif self == Message.LoadDataResult:
+            need_args = True
+            message = f"{arg} rows are loaded"
+        elif self == Message.FileOpenError:
+            # The path may be empty, and is shown as it is
+            message = f"Cannot open '{arg}'"
+        elif self == Message.LoadDataTypeMismatchError:
+            need_args = True
+            message = f"Load has failed: line {arg} does not match the table"
+        elif self == Message.CopyResult:
+            need_args = True
+            message = f"{arg} rows are copied"
+        elif self == Message.InsertDuplicatePrimaryKeyError:
+            message = "Insertion has failed: Primary key duplication"
+        elif self == Message.CreateIndexSuccess:
+            need_args = True
+            message = f"'{arg}' index is created"
+        elif self == Message.IndexExistenceError:
+            message = "Create index has failed: index with the same name already exists"
+        elif self == Message.IndexColumnExistenceError:
+            need_args = True
+            message = f"Create index has failed: '{arg}' does not exist"
+        elif self == Message.IndexDuplicateColumnError:
+            message = "Create index has failed: column is duplicated"
+        elif self == Message.DropIndexSuccess:
+            need_args = True
+            message = f"'{arg}' index is dropped"
+        elif self == Message.NoSuchIndex:
+            message = "No such index"
+        elif self == Message.WhereIncomparableError:
+            message = "Where clause trying to compare incomparable values"
+        elif self == Message.WhereTableNotSpecified:
+            message = "Where clause trying to reference tables which are not specified"
+        elif self == Message.WhereColumnNotExist:
+            message = "Where clause trying to reference non existing column"
+        elif self == Message.WhereAmbiguousReference:
+            message = "Where clause contains ambiguous reference"
+        elif self == Message.SelectColumnResolveError:
+            need_args = True
+            message = f"Selection has failed: fail to resolve '{arg}'"
+        elif self == Message.PrepareSuccess:
+            need_args = True
+            message = f"'{arg}' statement is prepared"
+        elif self == Message.NoSuchPreparedStatement:
+            message = "No such prepared statement"
+        elif self == Message.ExecuteParameterCountError:
+            message = "Execution has failed: the number of values does not match the parameters"
+        elif self == Message.PrepareParameterNumberError:
+            message = "Prepare has failed: parameters must be numbered from $1 without gaps"
+        elif self == Message.ParameterOutOfPrepareError:
+            message = "Parameters are only allowed in a prepared statement"
+        elif self == Message.DeleteResult:
+            need_args = True
+            message = f"'{arg}' row(s) are deleted"
+        elif self == Message.UpdateResult:
+            need_args = True
+            message = f"'{arg}' row(s) are updated"
+        elif self == Message.UpdateColumnExistenceError:
+            need_args = True
+            message = f"Update has failed: '{arg}' does not exist"
+        elif self == Message.UpdateTypeMismatchError:
+            message = "Update has failed: Types are not matched"
+        elif self == Message.UpdateColumnNonNullableError:
+            need_args = True
+            message = f"Update has failed: '{arg}' is not nullable"
+        elif self == Message.UpdateDuplicatePrimaryKeyError:
+            message = "Update has failed: Primary key duplication"
+        elif self == Message.InsertReferentialIntegrityError:
+            message = "Insertion has failed: Referential integrity violation"
+        elif self == Message.DeleteReferentialIntegrityPassed:
+            need_args = True
+            message = f"'{arg}' row(s) are not deleted due to referential integrity"
+        elif self == Message.UpdateReferentialIntegrityError:
+            message = "Update has failed: Referential integrity violation"
+        elif self == Message.LoadDataReferentialIntegrityError:
+            need_args = True
+            message = f"Load has failed: line {arg} violates referential integrity"
+        elif self == Message.TransactionBegin:
+            message = "Transaction is started"
+        elif self == Message.TransactionCommit:
+            message = "Transaction is committed"
+        elif self == Message.TransactionRollback:
+            message = "Transaction is rolled back"
+        elif self == Message.TransactionInProgressError:
+            message = "Begin has failed: a transaction is already in progress"
+        elif self == Message.NoTransactionError:
+            message = "There is no transaction in progress"
+        elif self == Message.TransactionDisabledError:
+            message = "Begin has failed: transactions are turned off"
+        elif self == Message.SelectGroupByError:
+            need_args = True
+            message = f"Selection has failed: '{arg}' is neither grouped nor aggregated"
+        elif self == Message.SelectAggregateTypeError:
+            need_args = True
+            message = f"Selection has failed: '{arg}' can not be computed for the type of the column"
+        elif self == Message.SelectLimitError:
+            message = "Selection has failed: limit must be a non negative integer"
+        elif self == Message.AnalyzeSuccess:
+            need_args = True
+            message = f"'{arg}' table is analyzed"
+        elif self == Message.ProfilingEnabled:
+            message = "Profiling is turned on"
+        elif self == Message.ProfilingDisabled:
+            message = "Profiling is turned off"
+        elif self == Message.NoProfileError:
+            message = "There is no profiled statement"
+        elif self == Message.StatementError:
+            need_args = True
+            message = f"Statement has failed and is rolled back: {arg}"
+        elif self == Message.RequestEncodingError:
+            message = "Request has failed: it is not utf-8 text"
+        elif self == Message.LoadDataEncodingError:
+            need_args = True
+            message = f"Load has failed: line {arg} is not utf-8 text"
+        elif self == Message.LoadDataFormatError:
+            need_args = True
+            message = f"Load has failed: line {arg} is not valid csv"
+        elif self == Message.LoadDataDuplicatePrimaryKeyError:
+            need_args = True
+            message = f"Load has failed: line {arg} duplicates a primary key"
         elif self == Message.SelectTableExistenceError:
             need_args = True
             message = f"Selection has failed: '{arg}' does not exist"
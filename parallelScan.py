@@ -0,0 +1,90 @@
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+from typing import Iterator, List, Optional
+from berkeleydb import db
+from databaseInstance import ROWID_SIZE
+from predicate import And, compile_filter
+from rowCodec import RowCodec
+
+# A filtered full scan of a table with at least this many rows is split over the worker processes,
+# a smaller one is run in this process, where it does not pay for starting the workers and sending the rows back.
+PARALLEL_THRESHOLD = int(os.environ.get("MYDB_PARALLEL_THRESHOLD", "200000"))
+PARALLEL_WORKERS = int(os.environ.get("MYDB_PARALLEL_WORKERS", str(os.cpu_count() or 1)))
+# More partitions than workers, so that a worker which is done early takes another one
+PARTITIONS_PER_WORKER = 4
+
+_executor: Optional[ProcessPoolExecutor] = None
+
+def is_parallel(row_count: int) -> bool:
+    return PARALLEL_WORKERS > 1 and row_count >= PARALLEL_THRESHOLD
+
+def get_executor() -> ProcessPoolExecutor:
+    """
+    The pool is made on the first parallel scan and kept for the next ones.
+    The workers are forked, since a spawned one would import the main module again, which opens the db.
+    """
+    global _executor
+    if _executor is None:
+        _executor = ProcessPoolExecutor(max_workers=PARALLEL_WORKERS, mp_context=multiprocessing.get_context("fork"))
+    return _executor
+
+class ScanTask:
+    """
+    A range of rowids [first_rowid, end_rowid) of a table to scan in a worker.
+    The where clause is sent as the predicates with the resolved (position, column definition)
+    of each column they refer to, since the compiled filter can not be sent to another process.
+    """
+    def __init__(self, file_name: str, row_prefix: bytes, column_definitions, positions: List[int],
+                 conjuncts, resolved: dict, first_rowid: int, end_rowid: int, with_rowid: bool) -> None:
+        self.file_name = file_name
+        self.row_prefix = row_prefix
+        self.column_definitions = column_definitions
+        self.positions = positions
+        self.conjuncts = conjuncts
+        self.resolved = resolved
+        self.first_rowid = first_rowid
+        self.end_rowid = end_rowid
+        self.with_rowid = with_rowid
+
+def scan_partition(task: ScanTask) -> list:
+    """
+    Runs in a worker: reads the rows of the range through its own read only handle of the db file,
+    and returns the decoded rows which pass the filter, in rowid order.
+    The handle is out of the environment of the db, so it sees the records which are committed and written to the file,
+    not those of a transaction or of a snapshot, nor the records kept by write behind.
+    """
+    decode = RowCodec(task.column_definitions).decoder(task.positions)
+    selected = compile_filter(And(task.conjuncts), lambda column: task.resolved[(column.table_name, column.column_name)])
+    start = task.row_prefix + task.first_rowid.to_bytes(ROWID_SIZE, 'big')
+    stop = task.row_prefix + task.end_rowid.to_bytes(ROWID_SIZE, 'big')
+
+    rows = []
+    handle = db.DB()
+    handle.open(task.file_name, dbtype=db.DB_BTREE, flags=db.DB_RDONLY)
+    cursor = handle.cursor()
+    try :
+        item = cursor.set_range(start)
+        while item and item[0] < stop:
+            row = decode(item[1])
+            if selected(row):
+                rows.append((int.from_bytes(item[0][-ROWID_SIZE:], 'big'), row) if task.with_rowid else row)
+            item = cursor.next()
+    finally :
+        cursor.close()
+        handle.close()
+    return rows
+
+def partition(first_rowid: int, last_rowid: int) -> List[tuple]:
+    """
+    Split the rowids into ranges [first, end) of about the same size.
+    """
+    count = PARALLEL_WORKERS * PARTITIONS_PER_WORKER
+    size = max(1, -(-(last_rowid - first_rowid + 1) // count))
+    return [(start, min(start + size, last_rowid + 1)) for start in range(first_rowid, last_rowid + 1, size)]
+
+def run_partitions(tasks: List[ScanTask]) -> Iterator[list]:
+    """
+    Yields the rows of each task in the order of the tasks, while the later ones are still running.
+    """
+    return get_executor().map(scan_partition, tasks)
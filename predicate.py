@@ -0,0 +1,215 @@
+import operator
+from typing import Callable, List, Optional, Tuple
+from message import Message
+from rowCodec import PARSERS
+
+OPERATORS = {
+    "<" : operator.lt,
+    ">" : operator.gt,
+    "=" : operator.eq,
+    ">=" : operator.ge,
+    "<=" : operator.le,
+    "!=" : operator.ne,
+}
+
+# The operator to use when the two operands of a comparison are swapped
+SWAPPED_OPERATORS = {
+    "<" : ">",
+    ">" : "<",
+    "=" : "=",
+    ">=" : "<=",
+    "<=" : ">=",
+    "!=" : "!=",
+}
+
+class QueryError(Exception):
+    """
+    Raised when a query can not be compiled, such as a where clause referencing a wrong column.
+    message is the one to show to the user.
+    """
+    def __init__(self, message: str) -> None:
+        super().__init__(message)
+        self.message = message
+
+class Predicate:
+    """
+    Node of the where clause in an easier form than the tree.
+
+    compile() turns the node into a function of a row, once per query.
+    The column references are resolved to positions of the row by the given resolve function,
+    which returns the (position, column definition) of a Column.
+    The function follows the three valued logic of sql: it returns True, False or None (unknown).
+    """
+    def compile(self, resolve) -> Callable[[list], Optional[bool]]:
+        raise NotImplementedError
+
+    def conjuncts(self) -> List["Predicate"]:
+        """
+        Returns the predicates which are and-ed at the top of this one.
+        """
+        return [self]
+
+    def columns(self) -> List["Column"]:
+        return []
+
+class Column:
+    def __init__(self, table_name: Optional[str], column_name: str) -> None:
+        self.table_name = table_name
+        self.column_name = column_name
+
+    def __str__(self) -> str:
+        return self.column_name if self.table_name is None else f"{self.table_name}.{self.column_name}"
+
+class Value:
+    def __init__(self, data_type: str, value: str) -> None:
+        self.data_type = data_type
+        self.value = value
+
+    def typed_value(self):
+        """
+        The value in the same type as in the rows, a literal which is not a valid value can not be compared.
+        """
+        try :
+            return PARSERS[self.data_type](self.value)
+        except ValueError:
+            raise QueryError(Message.WhereIncomparableError.get_message())
+
+class Comparison(Predicate):
+    def __init__(self, left, op: str, right) -> None:
+        self.left = left
+        self.op = op
+        self.right = right
+
+    def columns(self) -> List[Column]:
+        return [operand for operand in (self.left, self.right) if isinstance(operand, Column)]
+
+    def column_and_value(self) -> Optional[Tuple[Column, str, Value]]:
+        """
+        Returns (column, operator, value) when the comparison is between a column and a literal,
+        with the operator turned so that the column is on the left.
+        """
+        if isinstance(self.left, Column) and isinstance(self.right, Value):
+            return self.left, self.op, self.right
+        if isinstance(self.left, Value) and isinstance(self.right, Column):
+            return self.right, SWAPPED_OPERATORS[self.op], self.left
+        return None
+
+    def compile(self, resolve):
+        compare = OPERATORS[self.op]
+        left_type, left = self._compile_operand(self.left, resolve)
+        right_type, right = self._compile_operand(self.right, resolve)
+        if left_type != right_type:
+            raise QueryError(Message.WhereIncomparableError.get_message())
+
+        if isinstance(self.left, Column) and isinstance(self.right, Value):
+            position = left
+            value = right
+            def evaluate(row):
+                item = row[position]
+                return None if item is None else compare(item, value)
+            return evaluate
+
+        if isinstance(self.left, Value) and isinstance(self.right, Column):
+            return Comparison(self.right, SWAPPED_OPERATORS[self.op], self.left).compile(resolve)
+
+        if isinstance(self.left, Column):
+            left_position, right_position = left, right
+            def evaluate(row):
+                left_item = row[left_position]
+                right_item = row[right_position]
+                if left_item is None or right_item is None:
+                    return None
+                return compare(left_item, right_item)
+            return evaluate
+
+        result = compare(left, right)
+        return lambda row: result
+
+    def _compile_operand(self, operand, resolve):
+        """
+        Returns the type of the operand with its position in the row if it is a column,
+        or with its converted value if it is a literal.
+        """
+        if isinstance(operand, Column):
+            position, column = resolve(operand)
+            return column.data_type, position
+        return operand.data_type, operand.typed_value()
+
+class NullTest(Predicate):
+    def __init__(self, column: Column, is_null: bool) -> None:
+        self.column = column
+        self.is_null = is_null
+
+    def columns(self) -> List[Column]:
+        return [self.column]
+
+    def compile(self, resolve):
+        position, _ = resolve(self.column)
+        if self.is_null:
+            return lambda row: row[position] is None
+        return lambda row: row[position] is not None
+
+class And(Predicate):
+    def __init__(self, items: List[Predicate]) -> None:
+        self.items = items
+
+    def conjuncts(self) -> List[Predicate]:
+        return [conjunct for item in self.items for conjunct in item.conjuncts()]
+
+    def columns(self) -> List[Column]:
+        return [column for item in self.items for column in item.columns()]
+
+    def compile(self, resolve):
+        items = [item.compile(resolve) for item in self.items]
+        def evaluate(row):
+            result = True
+            for item in items:
+                value = item(row)
+                if value is False:
+                    return False
+                if value is None:
+                    result = None
+            return result
+        return evaluate
+
+class Or(Predicate):
+    def __init__(self, items: List[Predicate]) -> None:
+        self.items = items
+
+    def columns(self) -> List[Column]:
+        return [column for item in self.items for column in item.columns()]
+
+    def compile(self, resolve):
+        items = [item.compile(resolve) for item in self.items]
+        def evaluate(row):
+            result = False
+            for item in items:
+                value = item(row)
+                if value is True:
+                    return True
+                if value is None:
+                    result = None
+            return result
+        return evaluate
+
+class Not(Predicate):
+    def __init__(self, item: Predicate) -> None:
+        self.item = item
+
+    def columns(self) -> List[Column]:
+        return self.item.columns()
+
+    def compile(self, resolve):
+        item = self.item.compile(resolve)
+        def evaluate(row):
+            value = item(row)
+            return None if value is None else not value
+        return evaluate
+
+def compile_filter(predicate: Predicate, resolve) -> Callable[[list], bool]:
+    """
+    Compile the where clause into a function which tells whether a row is selected.
+    Only the rows for which the predicate is True are selected, not the unknown ones.
+    """
+    evaluate = predicate.compile(resolve)
+    return lambda row: evaluate(row) is True
@@ -0,0 +1,250 @@
+"""
+Profiling of the statements, turned on by SET PROFILING ON or by MYDB_PROFILING=on.
+
+The time of a statement is split into phases, each of them counting only the time which is not spent
+in a phase entered inside it, so the phases of a statement add up to its total:
+    parse          parsing the text into a tree
+    transform      the rest of running the statement: the transformer, the checks, and the plan nodes
+    plan           choosing the plan of a query
+    storage read   the cursors and lookups of the db
+    storage write  the puts and deletes of the db
+    commit         committing the transaction of the statement
+    decode, encode the records of the rows
+    json           the schemas and statistics, which are json
+    format         formatting the values and lines of a result
+    output         writing the result to the prompt or to the client
+    lock wait      waiting for the lock of the server
+Counters tell how many rows, index entries and bytes were read, and how many bytes were written.
+
+SHOW PROFILE shows the last profiled statement of the session. When MYDB_PROFILE_FILE is set,
+the profile of each statement is appended to it as a json line.
+"""
+import json
+import os
+import threading
+import time
+from functools import wraps
+from typing import Callable, Dict, Optional
+from message import BORDER_LINE
+
+PROFILING = os.environ.get("MYDB_PROFILING", "off").lower() == "on"
+PROFILE_FILE = os.environ.get("MYDB_PROFILE_FILE")
+
+# The phases in the order SHOW PROFILE lists them
+PHASES = ("parse", "transform", "plan", "storage read", "storage write", "commit", "decode", "encode", "json", "format", "output", "lock wait")
+BASE_PHASE = "transform"
+
+class StatementProfile:
+    def __init__(self, text: str, parse_time: float) -> None:
+        self.text = text
+        self.kind: Optional[str] = None
+        self.started = time.time()
+        self.phases: Dict[str, float] = {"parse" : parse_time}
+        self.counters: Dict[str, int] = {}
+
+    def total(self) -> float:
+        return sum(self.phases.values())
+
+    def to_dict(self) -> dict:
+        return {
+            "started" : self.started,
+            "statement" : self.text.strip(),
+            "kind" : self.kind,
+            "total_ms" : round(self.total() * 1000, 3),
+            "phases_ms" : {phase : round(seconds * 1000, 3) for phase, seconds in self.phases.items()},
+            "counters" : self.counters,
+        }
+
+class _NoPhase:
+    """
+    The phase of a statement which is not profiled, which costs nothing to enter.
+    """
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        return False
+
+NO_PHASE = _NoPhase()
+
+class _Phase:
+    def __init__(self, profiler: "Profiler", phase: str) -> None:
+        self.profiler = profiler
+        self.phase = phase
+
+    def __enter__(self):
+        self.profiler.enter(self.phase)
+        return self
+
+    def __exit__(self, *args):
+        self.profiler.leave()
+        return False
+
+class Profiler:
+    """
+    The profiling state is kept per thread, like the transaction, so each session of the server
+    turns profiling on for itself and profiles its own statements.
+    """
+    def __init__(self) -> None:
+        self.local = threading.local()
+        self.file_lock = threading.Lock()
+
+    def is_enabled(self) -> bool:
+        return getattr(self.local, "enabled", PROFILING)
+
+    def set_enabled(self, enabled: bool):
+        self.local.enabled = enabled
+
+    @property
+    def current(self) -> Optional[StatementProfile]:
+        return getattr(self.local, "current", None)
+
+    def is_active(self) -> bool:
+        return getattr(self.local, "current", None) is not None
+
+    def start(self, text: str, parse_time: float, kind: Optional[str]):
+        """
+        Start profiling a statement which has been parsed, if profiling is on.
+        """
+        if not self.is_enabled():
+            return
+        profile = StatementProfile(text, parse_time)
+        profile.kind = kind
+        self.local.current = profile
+        self.local.stack = [BASE_PHASE]
+        self.local.mark = time.perf_counter()
+
+    def finish(self):
+        """
+        End the statement, which becomes the one SHOW PROFILE shows, and append it to PROFILE_FILE.
+        """
+        profile = self.current
+        if profile is None:
+            return
+        self.leave()
+        self.local.current = None
+        self.local.last = profile
+        if PROFILE_FILE is not None:
+            line = json.dumps(profile.to_dict()) + "\n"
+            with self.file_lock:
+                with open(PROFILE_FILE, "a") as file:
+                    file.write(line)
+
+    def last(self) -> Optional[StatementProfile]:
+        return getattr(self.local, "last", None)
+
+    def enter(self, phase: str):
+        profile = self.current
+        if profile is None:
+            return
+        now = time.perf_counter()
+        stack = self.local.stack
+        profile.phases[stack[-1]] = profile.phases.get(stack[-1], 0.0) + now - self.local.mark
+        stack.append(phase)
+        self.local.mark = now
+
+    def leave(self):
+        profile = self.current
+        if profile is None:
+            return
+        now = time.perf_counter()
+        phase = self.local.stack.pop()
+        profile.phases[phase] = profile.phases.get(phase, 0.0) + now - self.local.mark
+        self.local.mark = now
+
+    def phase(self, phase: str):
+        """
+        A context in which the time is counted to the phase.
+        """
+        return _Phase(self, phase) if self.is_active() else NO_PHASE
+
+    def count(self, counter: str, amount: int):
+        profile = self.current
+        if profile is not None:
+            profile.counters[counter] = profile.counters.get(counter, 0) + amount
+
+    def wrap(self, phase: str, function: Callable) -> Callable:
+        """
+        Returns the function counting its time to the phase, or the function itself if the statement is not profiled,
+        for the functions which are called for every row.
+        """
+        if not self.is_active():
+            return function
+
+        @wraps(function)
+        def profiled_function(*args, **kwargs):
+            self.enter(phase)
+            try :
+                return function(*args, **kwargs)
+            finally :
+                self.leave()
+        return profiled_function
+
+    def read_items(self, items, counter: str):
+        """
+        Yields the (key, value) items of a cursor, counting the time to get them as a storage read,
+        and the items and their bytes.
+        """
+        iterator = iter(items)
+        while True:
+            self.enter("storage read")
+            try :
+                item = next(iterator, None)
+            finally :
+                self.leave()
+            if item is None:
+                return
+            self.count(counter, 1)
+            self.count("bytes read", len(item[0]) + len(item[1]))
+            yield item
+
+    def show_profile(self) -> Optional[str]:
+        """
+        The phases and counters of the last profiled statement, None if there is none.
+        """
+        profile = self.last()
+        if profile is None:
+            return None
+        total = profile.total()
+        contents = [("phase", "time (ms)", "percent")]
+        for phase in PHASES:
+            if phase in profile.phases:
+                seconds = profile.phases[phase]
+                contents.append((phase, f"{seconds * 1000:.3f}", f"{seconds / total * 100:.1f}%" if total > 0 else ""))
+        contents.append(("total", f"{total * 1000:.3f}", ""))
+        counter_contents = [("counter", "value")] + [(counter, str(value)) for counter, value in profile.counters.items()]
+
+        line = "\n"
+        line += BORDER_LINE + "\n"
+        line += f"statement [{profile.text.strip()}]\n"
+        for rows in (contents, counter_contents):
+            if len(rows) == 1:
+                continue
+            widths = [max(len(row[index]) for row in rows) for index in range(len(rows[0]))]
+            for row in rows:
+                for index in range(len(row)):
+                    line += row[index] + (widths[index] - len(row[index]) + 3)*" "
+                line += "\n"
+            if rows is contents and len(counter_contents) > 1:
+                line += "\n"
+        line += BORDER_LINE
+        return line
+
+def profiled(phase: str):
+    """
+    Decorates a method whose time is counted to the phase.
+    """
+    def decorate(function: Callable) -> Callable:
+        @wraps(function)
+        def profiled_function(*args, **kwargs):
+            if not profiler.is_active():
+                return function(*args, **kwargs)
+            profiler.enter(phase)
+            try :
+                return function(*args, **kwargs)
+            finally :
+                profiler.leave()
+        return profiled_function
+    return decorate
+
+profiler = Profiler()
@@ -0,0 +1,587 @@
+import heapq
+import os
+import pickle
+import tempfile
+import time
+from itertools import islice
+from typing import Callable, List, Optional, Tuple
+from rowCodec import FORMATTERS
+
+# Number of rows which ORDER BY sorts in memory, more rows are sorted in runs which are spilled to temp files
+SORT_BUFFER_ROWS = int(os.environ.get("MYDB_SORT_BUFFER_ROWS", "100000"))
+# Number of rows which are pickled at once into a run
+RUN_CHUNK_SIZE = 1000
+
+class PlanColumn:
+    """
+    Column of the rows which are produced by a plan.
+    ref_name is the name by which the query refers to the table (its alias if it has one),
+    and position is the position of the column in the stored rows of the table.
+    """
+    def __init__(self, ref_name: str, table_name: str, column_name: str, definition, position: int) -> None:
+        self.ref_name = ref_name
+        self.table_name = table_name
+        self.column_name = column_name
+        self.definition = definition
+        self.position = position
+
+class AggregateDefinition:
+    """
+    Column definition of the result of an aggregate, which is formatted like the values of its type.
+    The average is a float, shown with 4 decimals.
+    """
+    def __init__(self, column_name: str, data_type: str, data_len: Optional[int] = None) -> None:
+        self.column_name = column_name
+        self.data_type = data_type
+        self.data_len = data_len
+        self.not_null = False
+
+    def to_text(self, value) -> Optional[str]:
+        if value is None:
+            return None
+        if self.data_type == "float":
+            return f"{value:.4f}"
+        return FORMATTERS[self.data_type](value)
+
+def get_index_ordering(index, columns: List[PlanColumn]) -> List[int]:
+    """
+    Returns the positions in the projected rows of the index columns, as far as they are kept.
+    """
+    positions = [column.position for column in columns]
+    ordering = []
+    for position in index.positions:
+        if position not in positions:
+            break
+        ordering.append(positions.index(position))
+    return ordering
+
+class Plan:
+    """
+    Node of the execution plan of a select query.
+    Each node produces its rows lazily from rows(), pulling them from its children,
+    so the rows of a table are streamed from the db cursor to the output.
+    estimate is the number of rows the planner expects from the node,
+    and ordering is the positions of the columns by which the rows come out sorted,
+    reverse_ordering the positions by which they come out sorted in the reverse order.
+    The plans over a single table also give the rowids of their rows from rowid_rows(),
+    which a delete or an update needs to change the rows.
+    actual_rows and actual_time are measured by EXPLAIN, once the plan is instrumented.
+    """
+    columns: List[PlanColumn]
+    estimate: float = 0
+    ordering: List[int] = []
+    reverse_ordering: List[int] = []
+    actual_rows: int = 0
+    actual_time: float = 0.0
+
+    def rows(self):
+        for _, row in self.rowid_rows():
+            yield row
+
+    def rowid_rows(self):
+        raise NotImplementedError
+
+    def children(self) -> List["Plan"]:
+        """
+        The plans whose rows this node reads, a node has a child, or the left and right sides of a join.
+        """
+        return [plan for plan in (getattr(self, "child", None), getattr(self, "left", None), getattr(self, "right", None)) if plan is not None]
+
+    def describe(self) -> str:
+        return type(self).__name__
+
+def instrument(plan: Plan):
+    """
+    Make every node of the plan count the rows it produces and the time spent producing them,
+    which includes the time of the nodes below it.
+    """
+    for child in plan.children():
+        instrument(child)
+    rows = plan.rows
+
+    def measured_rows():
+        start = time.perf_counter()
+        iterator = iter(rows())
+        plan.actual_time += time.perf_counter() - start
+        while True:
+            start = time.perf_counter()
+            row = next(iterator, None)
+            plan.actual_time += time.perf_counter() - start
+            if row is None:
+                return
+            plan.actual_rows += 1
+            yield row
+
+    plan.rows = measured_rows
+
+class TableScan(Plan):
+    """
+    Reads every row of the table through the db cursor.
+    The scans of a table only decode its columns which are used by the query.
+    """
+    def __init__(self, repo, table, columns: List[PlanColumn], estimate: float) -> None:
+        self.repo = repo
+        self.table = table
+        self.columns = columns
+        self.estimate = estimate
+        self.positions = [column.position for column in columns]
+
+    def rowid_rows(self):
+        return self.repo.scan_rows(self.table, self.positions)
+
+    def describe(self) -> str:
+        return f"TableScan on {self.table.table_name}"
+
+class IndexLookup(Plan):
+    """
+    Reads the rows whose leading index columns are equal to the values, by seeking the index.
+    """
+    def __init__(self, repo, table, columns: List[PlanColumn], index, values: list, estimate: float) -> None:
+        self.repo = repo
+        self.table = table
+        self.columns = columns
+        self.index = index
+        self.values = values
+        self.estimate = estimate
+        self.ordering = get_index_ordering(index, columns)
+        self.positions = [column.position for column in columns]
+
+    def rowid_rows(self):
+        return self.repo.find_rows(self.table, self.index, self.values, self.positions)
+
+    def describe(self) -> str:
+        return f"IndexLookup on {self.table.table_name} using {self.index.index_name}"
+
+class IndexRangeScan(Plan):
+    """
+    Reads the rows whose leading index column is between the bounds, in the order of the index,
+    or backwards from the high bound with reverse.
+    A bound is ([value], inclusive) or None.
+    """
+    def __init__(self, repo, table, columns: List[PlanColumn], index, low: Optional[Tuple[list, bool]], high: Optional[Tuple[list, bool]], estimate: float, reverse: bool = False) -> None:
+        self.repo = repo
+        self.table = table
+        self.columns = columns
+        self.index = index
+        self.low = low
+        self.high = high
+        self.estimate = estimate
+        self.reverse = reverse
+        if reverse:
+            self.reverse_ordering = get_index_ordering(index, columns)
+        else :
+            self.ordering = get_index_ordering(index, columns)
+        self.positions = [column.position for column in columns]
+
+    def rowid_rows(self):
+        return self.repo.range_rows(self.table, self.index, self.low, self.high, self.positions, self.reverse)
+
+    def describe(self) -> str:
+        backward = " backward" if self.reverse else ""
+        return f"IndexRangeScan on {self.table.table_name} using {self.index.index_name}{backward}"
+
+class Filter(Plan):
+    """
+    Passes only the rows for which the compiled where clause is true.
+    """
+    def __init__(self, child: Plan, predicate: Callable[[list], bool], estimate: float) -> None:
+        self.child = child
+        self.columns = child.columns
+        self.predicate = predicate
+        self.estimate = estimate
+        self.ordering = child.ordering
+        self.reverse_ordering = child.reverse_ordering
+
+    def rows(self):
+        predicate = self.predicate
+        for row in self.child.rows():
+            if predicate(row):
+                yield row
+
+    def rowid_rows(self):
+        predicate = self.predicate
+        for rowid, row in self.child.rowid_rows():
+            if predicate(row):
+                yield rowid, row
+
+class ParallelScan(Plan):
+    """
+    A filtered full scan which is split into rowid ranges, filtered by the worker processes of parallelScan.
+    The rows come back in rowid order, as from a TableScan.
+    predicate is the compiled filter, for a join which checks the rows of the table itself.
+    """
+    def __init__(self, repo, table, columns: List[PlanColumn], conjuncts, resolved: dict, predicate: Callable[[list], bool], estimate: float) -> None:
+        self.repo = repo
+        self.table = table
+        self.columns = columns
+        self.conjuncts = conjuncts
+        self.resolved = resolved
+        self.predicate = predicate
+        self.estimate = estimate
+        self.positions = [column.position for column in columns]
+
+    def rows(self):
+        return self.repo.parallel_scan_rows(self.table, self.positions, self.conjuncts, self.resolved, with_rowid=False)
+
+    def rowid_rows(self):
+        return self.repo.parallel_scan_rows(self.table, self.positions, self.conjuncts, self.resolved, with_rowid=True)
+
+    def describe(self) -> str:
+        return f"ParallelScan on {self.table.table_name}"
+
+class NestedLoopJoin(Plan):
+    """
+    Pairs every row of the left plan with every row of the right plan.
+    The right rows are read once and kept in memory.
+    """
+    def __init__(self, left: Plan, right: Plan, estimate: float) -> None:
+        self.left = left
+        self.right = right
+        self.columns = left.columns + right.columns
+        self.estimate = estimate
+        self.ordering = left.ordering
+
+    def rows(self):
+        right_rows = None
+        for left_row in self.left.rows():
+            if right_rows is None:
+                right_rows = list(self.right.rows())
+            for right_row in right_rows:
+                yield left_row + right_row
+
+def key_function(positions: List[int]):
+    """
+    Returns the function which gives the join key of a row, or None if a key column is null.
+    """
+    def key(row):
+        values = tuple(row[position] for position in positions)
+        return None if None in values else values
+    return key
+
+class IndexNestedLoopJoin(Plan):
+    """
+    For each left row, finds the matching rows of the right table by seeking its index
+    with the values of the join key, like a foreign key looking up the primary key it references.
+    index_keys are the positions of the left columns compared to the leading columns of the index,
+    the keys which are not in the index are checked on the found rows with left_key and right_key.
+    right_filter is the compiled condition on the right table alone, if there is one.
+    """
+    def __init__(self, left: Plan, repo, table, columns: List[PlanColumn], index, index_keys: List[int], left_key, right_key, right_filter: Optional[Callable[[list], bool]], estimate: float) -> None:
+        self.left = left
+        self.repo = repo
+        self.table = table
+        self.index = index
+        self.index_keys = index_keys
+        self.left_key = left_key
+        self.right_key = right_key
+        self.right_filter = right_filter
+        self.columns = left.columns + columns
+        self.estimate = estimate
+        self.ordering = left.ordering
+        self.positions = [column.position for column in columns]
+
+    def rows(self):
+        right_filter = self.right_filter
+        for left_row in self.left.rows():
+            key = self.left_key(left_row)
+            if key is None:
+                continue
+            values = [left_row[position] for position in self.index_keys]
+            for _, right_row in self.repo.find_rows(self.table, self.index, values, self.positions):
+                if self.right_key(right_row) != key:
+                    continue
+                if right_filter is None or right_filter(right_row):
+                    yield left_row + right_row
+
+    def describe(self) -> str:
+        return f"IndexNestedLoopJoin on {self.table.table_name} using {self.index.index_name}"
+
+class HashJoin(Plan):
+    """
+    Joins on equal keys by building a hash table of one side and probing it with the rows of the other.
+    The smaller side is built, the rows of the other side are streamed.
+    """
+    def __init__(self, left: Plan, right: Plan, left_key, right_key, build_left: bool, estimate: float) -> None:
+        self.left = left
+        self.right = right
+        self.left_key = left_key
+        self.right_key = right_key
+        self.build_left = build_left
+        self.columns = left.columns + right.columns
+        self.estimate = estimate
+        self.ordering = [len(left.columns) + position for position in right.ordering] if build_left else left.ordering
+
+    def rows(self):
+        if self.build_left:
+            build, build_key, probe, probe_key = self.left, self.left_key, self.right, self.right_key
+        else :
+            build, build_key, probe, probe_key = self.right, self.right_key, self.left, self.left_key
+
+        table = {}
+        for row in build.rows():
+            key = build_key(row)
+            if key is not None:
+                table.setdefault(key, []).append(row)
+
+        for probe_row in probe.rows():
+            matches = table.get(probe_key(probe_row))
+            if matches is None:
+                continue
+            for build_row in matches:
+                yield (build_row + probe_row) if self.build_left else (probe_row + build_row)
+
+class MergeJoin(Plan):
+    """
+    Joins on equal keys by walking both sides in key order.
+    A side which does not already come sorted by its key is sorted first.
+    """
+    def __init__(self, left: Plan, right: Plan, left_key, right_key, left_sorted: bool, right_sorted: bool, estimate: float) -> None:
+        self.left = left
+        self.right = right
+        self.left_key = left_key
+        self.right_key = right_key
+        self.left_sorted = left_sorted
+        self.right_sorted = right_sorted
+        self.columns = left.columns + right.columns
+        self.estimate = estimate
+
+    def keyed_rows(self, plan: Plan, key, is_sorted: bool):
+        rows = ((key(row), row) for row in plan.rows())
+        rows = ((row_key, row) for row_key, row in rows if row_key is not None)
+        if not is_sorted:
+            rows = iter(sorted(rows, key=lambda item: item[0]))
+        return rows
+
+    def rows(self):
+        left_rows = self.keyed_rows(self.left, self.left_key, self.left_sorted)
+        right_rows = self.keyed_rows(self.right, self.right_key, self.right_sorted)
+        left = next(left_rows, None)
+        right = next(right_rows, None)
+        while left is not None and right is not None:
+            if left[0] < right[0]:
+                left = next(left_rows, None)
+            elif left[0] > right[0]:
+                right = next(right_rows, None)
+            else :
+                key = left[0]
+                group = []
+                while right is not None and right[0] == key:
+                    group.append(right[1])
+                    right = next(right_rows, None)
+                while left is not None and left[0] == key:
+                    for right_row in group:
+                        yield left[1] + right_row
+                    left = next(left_rows, None)
+
+class Project(Plan):
+    """
+    Produces the selected columns, in the order of the select list, under their output names.
+    """
+    def __init__(self, child: Plan, positions: List[int], columns: List[PlanColumn]) -> None:
+        self.child = child
+        self.positions = positions
+        self.columns = columns
+        self.estimate = child.estimate
+
+    def rows(self):
+        positions = self.positions
+        for row in self.child.rows():
+            yield [row[position] for position in positions]
+
+class RowCount(Plan):
+    """
+    Produces the one row of COUNT(*) over a whole table from the row count which is kept for the table,
+    without reading its rows.
+    """
+    def __init__(self, repo, table, columns: List[PlanColumn]) -> None:
+        self.repo = repo
+        self.table = table
+        self.columns = columns
+        self.estimate = 1
+
+    def rows(self):
+        count = self.repo.get_row_count(self.table)
+        yield [count for _ in self.columns]
+
+    def describe(self) -> str:
+        return f"RowCount of {self.table.table_name}"
+
+class HashAggregate(Plan):
+    """
+    Groups the rows by the values at group_positions in a hash table, and computes the aggregates of each group
+    while the rows stream through, so only the state of each group is kept in memory.
+    aggregates are the (function, position) of each aggregate, position is None for COUNT(*).
+    outputs tell for each output column whether it is the n-th group column or the n-th aggregate, as ("group", n) or ("aggregate", n).
+    Without a group by, the whole input is one group, which exists even if there is no row.
+    """
+    def __init__(self, child: Plan, group_positions: List[int], aggregates: List[Tuple[str, Optional[int]]], outputs: List[Tuple[str, int]], columns: List[PlanColumn], estimate: float) -> None:
+        self.child = child
+        self.group_positions = group_positions
+        self.aggregates = aggregates
+        self.outputs = outputs
+        self.columns = columns
+        self.estimate = estimate
+
+    def rows(self):
+        group_positions = self.group_positions
+        steps = [(AGGREGATE_STEPS[function], position) for function, position in self.aggregates]
+        groups = {}
+        if not group_positions:
+            groups[()] = [AGGREGATE_INITIAL[function]() for function, _ in self.aggregates]
+
+        for row in self.child.rows():
+            key = tuple(row[position] for position in group_positions)
+            states = groups.get(key)
+            if states is None:
+                states = groups[key] = [AGGREGATE_INITIAL[function]() for function, _ in self.aggregates]
+            for number, (step, position) in enumerate(steps):
+                value = True if position is None else row[position]
+                if value is not None:
+                    states[number] = step(states[number], value)
+
+        finals = [AGGREGATE_FINALS[function] for function, _ in self.aggregates]
+        for key, states in groups.items():
+            results = [final(state) for final, state in zip(finals, states)]
+            yield [key[number] if kind == "group" else results[number] for kind, number in self.outputs]
+
+# The state of an aggregate starts from its initial value, takes each value which is not null by its step,
+# and gives the result by its final function. SUM, MIN, MAX and AVG of no value are null.
+AGGREGATE_INITIAL = {
+    "count" : lambda: 0,
+    "sum" : lambda: None,
+    "min" : lambda: None,
+    "max" : lambda: None,
+    "avg" : lambda: (0, 0),
+}
+AGGREGATE_STEPS = {
+    "count" : lambda state, value: state + 1,
+    "sum" : lambda state, value: value if state is None else state + value,
+    "min" : lambda state, value: value if state is None or value < state else state,
+    "max" : lambda state, value: value if state is None or value > state else state,
+    "avg" : lambda state, value: (state[0] + value, state[1] + 1),
+}
+AGGREGATE_FINALS = {
+    "count" : lambda state: state,
+    "sum" : lambda state: state,
+    "min" : lambda state: state,
+    "max" : lambda state: state,
+    "avg" : lambda state: None if state[1] == 0 else state[0] / state[1],
+}
+
+class Descending:
+    """
+    Wraps a sort key so that it sorts in the reverse order.
+    """
+    __slots__ = ("key",)
+
+    def __init__(self, key) -> None:
+        self.key = key
+
+    def __lt__(self, other: "Descending") -> bool:
+        return other.key < self.key
+
+    def __eq__(self, other: "Descending") -> bool:
+        return self.key == other.key
+
+def sort_key_function(keys: List[Tuple[int, bool]]):
+    """
+    Returns the function which gives the sort key of a row, from the (position, descending) of the sort columns.
+    A null sorts before every value, as in the indexes.
+    """
+    def value_key(value):
+        return (0,) if value is None else (1, value)
+
+    if not any(descending for _, descending in keys):
+        positions = [position for position, _ in keys]
+        return lambda row: tuple(value_key(row[position]) for position in positions)
+    return lambda row: tuple(
+        Descending(value_key(row[position])) if descending else value_key(row[position])
+        for position, descending in keys
+    )
+
+class Sort(Plan):
+    """
+    Sorts the rows by the keys, which are (position, descending).
+    Up to SORT_BUFFER_ROWS rows are sorted in memory. A larger input is cut into sorted runs of that size,
+    which are written to temp files and merged, so the rows in memory are one buffer and a chunk of each run.
+    """
+    def __init__(self, child: Plan, keys: List[Tuple[int, bool]], buffer_rows: int = SORT_BUFFER_ROWS) -> None:
+        self.child = child
+        self.keys = keys
+        self.buffer_rows = max(1, buffer_rows)
+        self.columns = child.columns
+        self.estimate = child.estimate
+        self.ordering = [position for position, _ in keys] if not any(descending for _, descending in keys) else []
+        self.reverse_ordering = [position for position, _ in keys] if all(descending for _, descending in keys) else []
+
+    def rows(self):
+        key = sort_key_function(self.keys)
+        rows = iter(self.child.rows())
+        runs = []
+        try :
+            while True:
+                buffer = list(islice(rows, self.buffer_rows))
+                buffer.sort(key=key)
+                if not runs and len(buffer) < self.buffer_rows:
+                    yield from buffer
+                    return
+                if buffer:
+                    runs.append(self.write_run(buffer))
+                if len(buffer) < self.buffer_rows:
+                    break
+            yield from heapq.merge(*(self.read_run(run) for run in runs), key=key)
+        finally :
+            for run in runs:
+                run.close()
+
+    def write_run(self, rows: list):
+        run = tempfile.TemporaryFile()
+        for start in range(0, len(rows), RUN_CHUNK_SIZE):
+            pickle.dump(rows[start:start + RUN_CHUNK_SIZE], run, pickle.HIGHEST_PROTOCOL)
+        run.seek(0)
+        return run
+
+    def read_run(self, run):
+        while True:
+            try :
+                chunk = pickle.load(run)
+            except EOFError:
+                return
+            yield from chunk
+
+class TopN(Plan):
+    """
+    The first limit rows in the order of the keys, kept in a heap of limit rows while the input streams through.
+    """
+    def __init__(self, child: Plan, keys: List[Tuple[int, bool]], limit: int) -> None:
+        self.child = child
+        self.keys = keys
+        self.limit = limit
+        self.columns = child.columns
+        self.estimate = min(child.estimate, limit)
+        self.ordering = [position for position, _ in keys] if not any(descending for _, descending in keys) else []
+        self.reverse_ordering = [position for position, _ in keys] if all(descending for _, descending in keys) else []
+
+    def rows(self):
+        return iter(heapq.nsmallest(self.limit, self.child.rows(), key=sort_key_function(self.keys)))
+
+    def describe(self) -> str:
+        return f"TopN {self.limit}"
+
+class Limit(Plan):
+    """
+    Stops after the first limit rows, so the plan below is not read any further.
+    """
+    def __init__(self, child: Plan, limit: int) -> None:
+        self.child = child
+        self.limit = limit
+        self.columns = child.columns
+        self.estimate = min(child.estimate, limit)
+        self.ordering = child.ordering
+        self.reverse_ordering = child.reverse_ordering
+
+    def rows(self):
+        return islice(self.child.rows(), self.limit)
+
+    def describe(self) -> str:
+        return f"Limit {self.limit}"
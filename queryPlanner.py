@@ -0,0 +1,645 @@
+import math
+from typing import Dict, List, Optional, Tuple
+from databaseIndex import Index
+from message import Message
+from predicate import Column, Comparison, NullTest, QueryError, And, compile_filter
+from parallelScan import is_parallel
+from queryPlan import Plan, PlanColumn, TableScan, IndexLookup, IndexRangeScan, Filter, ParallelScan, NestedLoopJoin, \
+    IndexNestedLoopJoin, HashJoin, MergeJoin, Project, RowCount, HashAggregate, Sort, TopN, Limit, AggregateDefinition, key_function
+
+# Guessed fraction of the rows which pass a condition, when nothing better is known
+EQUAL_SELECTIVITY = 0.1
+RANGE_SELECTIVITY = 0.3
+FILTER_SELECTIVITY = 0.5
+# Guessed number of groups per row of the input of a group by
+GROUP_SELECTIVITY = 0.1
+# Costs of reading the next row of a scan, and of fetching a row by the rowid of an index entry
+SCAN_COST = 1.0
+FETCH_COST = 2.0
+
+# Aggregates which only apply to numbers
+NUMERIC_AGGREGATES = ("sum", "avg")
+
+class QueryPlanner:
+    """
+    Builds the execution plan of a select query.
+    Column references are resolved once here, and the number of rows which pass each condition is estimated
+    from the statistics of the tables, or guessed from the kind of the condition for a table without them.
+    The access path of each table is the cheapest of a full scan, which is run by the worker processes
+    for a large table when the statement sees only the committed records,
+    an index lookup when the leading columns of an index are compared by equality,
+    and an index range scan when the leading column is bounded.
+    The conditions on a single table are checked right above its scan. The tables are joined greedily,
+    from the one with the fewest rows, each time adding the table which gives the fewest joined rows,
+    and for each join the cheapest of nested loop, index nested loop, hash join and merge join is chosen
+    from the equalities between columns of the two sides.
+    Aggregates are computed by a hash aggregation over the joined rows, and then the rows are ordered and limited:
+    by a top-n heap when there is a limit, by an external sort otherwise, or not at all when they already come
+    in the order, such as from an index whose leading columns are the ones of the order by.
+    """
+
+    def __init__(self, repo) -> None:
+        self.repo = repo
+
+    def plan_select(self, query) -> Plan:
+        full_columns = [
+            self.get_table_columns(self.repo.tables[table_ref.table_name], table_ref.ref_name)
+            for table_ref in query.from_clause
+        ]
+        if query.limit is not None and query.limit < 0:
+            raise QueryError(Message.SelectLimitError.get_message())
+
+        aggregation = None
+        order_columns = []
+        if query.group_by or any(select.aggregate is not None for select in query.select_list):
+            aggregation = self.get_aggregation(query, full_columns)
+            group_columns, aggregates, outputs, output_columns = aggregation
+            row_count = self.plan_row_count(query, aggregates, output_columns)
+            if row_count is not None:
+                return self.plan_order(row_count, self.get_output_order(query, output_columns), query.limit)
+            select_positions = group_columns + [column for _, column in aggregates if column is not None]
+        else :
+            select_positions, output_columns = self.get_selection(query, full_columns)
+            order_columns = self.get_order_columns(query, full_columns, select_positions)
+
+        # Only the columns which are selected, grouped, ordered or used by the where clause are read from the tables
+        table_columns = self.prune_columns(query, full_columns, select_positions + [column for column, _ in order_columns])
+        plan_columns = [column for columns in table_columns for column in columns]
+        resolve = self.get_resolver(plan_columns)
+
+        offsets = []
+        offset = 0
+        for columns in table_columns:
+            offsets.append(offset)
+            offset += len(columns)
+
+        def table_of(position: int) -> int:
+            return max(index for index, offset in enumerate(offsets) if offset <= position)
+
+        # Split the and-ed conditions into the ones on a single table, the equalities between two tables,
+        # and the rest which can only be checked on the joined rows
+        local_conjuncts = [[] for _ in query.from_clause]
+        join_conjuncts = []
+        other_conjuncts = []
+        conjuncts = query.where_clause.conjuncts() if query.where_clause is not None else []
+        for conjunct in conjuncts:
+            tables = set(table_of(resolve(column)[0]) for column in conjunct.columns())
+            if len(tables) == 1:
+                local_conjuncts[tables.pop()].append(conjunct)
+            elif len(tables) == 2 and self.is_equi_join(conjunct):
+                conjunct.compile(resolve)
+                join_conjuncts.append(conjunct)
+            else :
+                other_conjuncts.append(conjunct)
+
+        # A single table may be read in the order of the order by from an index, forwards when it is ascending
+        # and backwards when it is descending
+        index_order = None
+        index_reverse = order_columns[0][1] if order_columns else False
+        if len(query.from_clause) == 1 and order_columns and all(descending == index_reverse for _, descending in order_columns):
+            index_order = [column.position for column, _ in order_columns]
+
+        scans = [
+            self.plan_table(
+                self.repo.tables[table_ref.table_name], table_columns[table_number], local_conjuncts[table_number],
+                self.get_local_resolver(resolve, offsets[table_number]), index_order, index_reverse
+            )
+            for table_number, table_ref in enumerate(query.from_clause)
+        ]
+        join_columns = [(plan_columns[resolve(conjunct.left)[0]], plan_columns[resolve(conjunct.right)[0]]) for conjunct in join_conjuncts]
+        plan = self.plan_joins(scans, join_columns)
+
+        # The joined rows have the columns of the tables in the order they were joined
+        from_columns = plan_columns
+        plan_columns = plan.columns
+        resolve = self.get_resolver(plan_columns)
+
+        if other_conjuncts:
+            plan = Filter(plan, compile_filter(And(other_conjuncts), resolve), plan.estimate * FILTER_SELECTIVITY)
+
+        if aggregation is not None:
+            plan = HashAggregate(
+                plan,
+                [plan_columns.index(column) for column in group_columns],
+                [(function, None if column is None else plan_columns.index(column)) for function, column in aggregates],
+                outputs, output_columns,
+                self.estimate_groups(group_columns, plan.estimate)
+            )
+            return self.plan_order(plan, self.get_output_order(query, output_columns), query.limit)
+
+        plan = self.plan_order(plan, [(plan_columns.index(column), descending) for column, descending in order_columns], query.limit)
+        if output_columns is None:
+            if plan_columns == from_columns:
+                return plan
+            return Project(plan, [plan_columns.index(column) for column in from_columns], from_columns)
+        positions = [plan_columns.index(column) for column in select_positions]
+        return Project(plan, positions, output_columns)
+
+    def plan_joins(self, scans: List[Plan], join_columns: List[Tuple[PlanColumn, PlanColumn]]) -> Plan:
+        """
+        Join the scans of the tables, starting from the one with the fewest rows and adding each time
+        the table which gives the fewest joined rows. A table which no equality connects to the joined ones
+        is only taken when no other is left, since it makes a cross product.
+        join_columns are the two columns of each equality between tables.
+        """
+        remaining = list(scans)
+        plan = min(remaining, key=lambda scan: scan.estimate)
+        remaining.remove(plan)
+        while remaining:
+            candidates = []
+            for scan in remaining:
+                left_keys, right_keys = self.get_join_keys(plan, scan, join_columns)
+                candidates.append(((not left_keys, self.estimate_join(plan, scan, left_keys, right_keys)), scan, left_keys, right_keys))
+            _, scan, left_keys, right_keys = min(candidates, key=lambda candidate: candidate[0])
+            remaining.remove(scan)
+            plan = self.plan_join(plan, scan, left_keys, right_keys)
+        return plan
+
+    def get_join_keys(self, left: Plan, right: Plan, join_columns: List[Tuple[PlanColumn, PlanColumn]]) -> Tuple[List[int], List[int]]:
+        """
+        Returns the positions in the rows of each side of the columns which are compared by the equalities between them.
+        """
+        left_keys = []
+        right_keys = []
+        for left_column, right_column in join_columns:
+            if left_column in right.columns and right_column in left.columns:
+                left_column, right_column = right_column, left_column
+            if left_column in left.columns and right_column in right.columns:
+                left_keys.append(left.columns.index(left_column))
+                right_keys.append(right.columns.index(right_column))
+        return left_keys, right_keys
+
+    def estimate_join(self, left: Plan, right: Plan, left_keys: List[int], right_keys: List[int]) -> float:
+        """
+        A row of the side with fewer distinct values of a key matches the rows of the other side with its value,
+        so the join gives l * r / max(distinct values of the two sides), from the most selective key.
+        Without statistics, the distinct values of a key are taken to be as many as the rows of the smaller side.
+        """
+        l, r = max(left.estimate, 1), max(right.estimate, 1)
+        if not left_keys:
+            return l * r
+        distinct = 1
+        for left_key, right_key in zip(left_keys, right_keys):
+            known = [
+                count for count in (
+                    self.get_distinct_count(left.columns[left_key], l),
+                    self.get_distinct_count(right.columns[right_key], r)
+                )
+                if count is not None
+            ]
+            distinct = max(distinct, max(known) if known else min(l, r))
+        return max(1, l * r / distinct)
+
+    def get_distinct_count(self, column: PlanColumn, row_count: float) -> Optional[float]:
+        """
+        The number of distinct values of a column of a table among row_count of its rows, if the table has statistics.
+        """
+        table = self.repo.tables.get(column.table_name)
+        statistics = None if table is None else self.repo.get_statistics(table)
+        column_statistics = None if statistics is None else statistics.get_column(column.column_name)
+        if column_statistics is None:
+            return None
+        return min(max(column_statistics.distinct_count(), 1), row_count)
+
+    def estimate_groups(self, group_columns: List[PlanColumn], row_count: float) -> float:
+        """
+        The number of groups is the product of the distinct values of the group columns, up to the number of rows.
+        """
+        if not group_columns:
+            return 1
+        groups = 1
+        for column in group_columns:
+            distinct = self.get_distinct_count(column, row_count)
+            if distinct is None:
+                return max(1, row_count * GROUP_SELECTIVITY)
+            groups *= distinct
+        return max(1, min(groups, row_count))
+
+    def plan_order(self, plan: Plan, keys: List[Tuple[int, bool]], limit: Optional[int]) -> Plan:
+        """
+        Order the rows by the keys, which are (position, descending), and keep the first limit rows.
+        """
+        positions = [position for position, _ in keys]
+        if all(descending for _, descending in keys):
+            in_order = plan.reverse_ordering[:len(positions)] == positions
+        else :
+            in_order = not any(descending for _, descending in keys) and plan.ordering[:len(positions)] == positions
+        if keys and not in_order:
+            if limit is not None:
+                return TopN(plan, keys, limit)
+            plan = Sort(plan, keys)
+        if limit is not None:
+            plan = Limit(plan, limit)
+        return plan
+
+    def find_column(self, columns: List[PlanColumn], table_name: Optional[str], column_name: str) -> PlanColumn:
+        found = [
+            column for column in columns
+            if column.column_name == column_name
+            and (table_name is None or column.ref_name == table_name)
+        ]
+        if len(found) != 1:
+            name = column_name if table_name is None else f"{table_name}.{column_name}"
+            raise QueryError(Message.SelectColumnResolveError.get_message(name))
+        return found[0]
+
+    def get_order_columns(self, query, full_columns: List[List[PlanColumn]], selected: List[PlanColumn]) -> List[Tuple[PlanColumn, bool]]:
+        """
+        Resolve the columns of the order by against the columns of the tables, or else against the aliases of the select list.
+        Returns the (column, descending) of each.
+        """
+        columns = [column for columns in full_columns for column in columns]
+        order_columns = []
+        for reference, descending in query.order_by:
+            aliased = [
+                column for select, column in zip(query.select_list, selected)
+                if reference.table_name is None and select.alias == reference.column_name
+            ]
+            if len(aliased) == 1:
+                order_columns.append((aliased[0], descending))
+            else :
+                order_columns.append((self.find_column(columns, reference.table_name, reference.column_name), descending))
+        return order_columns
+
+    def get_output_order(self, query, output_columns: List[PlanColumn]) -> List[Tuple[int, bool]]:
+        """
+        Resolve the columns of the order by of an aggregation against its output columns.
+        Returns the (position, descending) of each.
+        """
+        keys = []
+        for reference, descending in query.order_by:
+            column = self.find_column(output_columns, reference.table_name, reference.column_name)
+            keys.append((output_columns.index(column), descending))
+        return keys
+
+    def get_aggregation(self, query, full_columns: List[List[PlanColumn]]):
+        """
+        Resolve the group by and the select list of an aggregation.
+        Returns the group columns, the (function, column) of the aggregates with None as the column of COUNT(*),
+        the source of each output column as ("group", n) or ("aggregate", n), and the output columns.
+        """
+        columns = [column for columns in full_columns for column in columns]
+        group_columns = []
+        for reference in query.group_by:
+            column = self.find_column(columns, reference.table_name, reference.column_name)
+            if column not in group_columns:
+                group_columns.append(column)
+
+        aggregates = []
+        outputs = []
+        output_columns = []
+        # '*' selects every column, which must all be grouped
+        select_list = [
+            (select.table_name, select.column_name, select.alias, select.aggregate) for select in query.select_list
+        ] if query.select_list else [
+            (column.ref_name, column.column_name, None, None) for column in columns
+        ]
+        for table_name, column_name, alias, function in select_list:
+            name = column_name if table_name is None else f"{table_name}.{column_name}"
+            if function is None:
+                column = self.find_column(columns, table_name, column_name)
+                if column not in group_columns:
+                    raise QueryError(Message.SelectGroupByError.get_message(name))
+                outputs.append(("group", group_columns.index(column)))
+                output_columns.append(PlanColumn(
+                    column.ref_name, column.table_name,
+                    alias if alias is not None else column.column_name,
+                    column.definition, column.position
+                ))
+                continue
+
+            label = f"{function}({'*' if column_name is None else name})"
+            if column_name is None:
+                if function != "count":
+                    raise QueryError(Message.SelectAggregateTypeError.get_message(label))
+                column = None
+                definition = AggregateDefinition(label, "int")
+            else :
+                column = self.find_column(columns, table_name, column_name)
+                data_type = column.definition.data_type
+                if function in NUMERIC_AGGREGATES and data_type != "int":
+                    raise QueryError(Message.SelectAggregateTypeError.get_message(label))
+                if function == "count" or function == "sum":
+                    definition = AggregateDefinition(label, "int")
+                elif function == "avg":
+                    definition = AggregateDefinition(label, "float")
+                else :
+                    definition = AggregateDefinition(label, data_type, column.definition.data_len)
+            outputs.append(("aggregate", len(aggregates)))
+            aggregates.append((function, column))
+            output_columns.append(PlanColumn(None, None, alias if alias is not None else label, definition, None))
+        return group_columns, aggregates, outputs, output_columns
+
+    def plan_row_count(self, query, aggregates, output_columns: List[PlanColumn]) -> Optional[Plan]:
+        """
+        COUNT(*) over a whole table is answered from the row count of the table, without a scan.
+        """
+        if len(query.from_clause) != 1 or query.where_clause is not None or query.group_by:
+            return None
+        if not all(function == "count" and column is None for function, column in aggregates):
+            return None
+        if len(aggregates) != len(output_columns):
+            return None
+        return RowCount(self.repo, self.repo.tables[query.from_clause[0].table_name], output_columns)
+
+    def plan_modification(self, table, where_clause) -> Plan:
+        """
+        Plan the rows of a table which a delete or an update changes, with every column in the order of the schema.
+        The access path is chosen from the where clause as for a select, and rowid_rows() of the plan
+        gives the (rowid, row) pairs, so only the matching rows are read.
+        """
+        columns = self.get_table_columns(table, None)
+        resolve = self.get_resolver(columns)
+        conjuncts = where_clause.conjuncts() if where_clause is not None else []
+        return self.plan_table(table, columns, conjuncts, resolve)
+
+    def get_table_columns(self, table, ref_name: Optional[str]) -> List[PlanColumn]:
+        ref_name = ref_name if ref_name is not None else table.table_name
+        return [
+            PlanColumn(ref_name, table.table_name, column.column_name, column, position)
+            for position, column in enumerate(table.schema.column_definitions)
+        ]
+
+    def get_selection(self, query, full_columns: List[List[PlanColumn]]):
+        """
+        Resolve the select list against the columns of the tables.
+        Returns the selected columns, and the output columns named by their aliases,
+        which are None when every column is selected by '*'.
+        """
+        columns = [column for columns in full_columns for column in columns]
+        if not query.select_list:
+            return columns, None
+
+        selected = []
+        output_columns = []
+        for select in query.select_list:
+            column = self.find_column(columns, select.table_name, select.column_name)
+            selected.append(column)
+            output_columns.append(PlanColumn(
+                column.ref_name, column.table_name,
+                select.alias if select.alias is not None else column.column_name,
+                column.definition, column.position
+            ))
+        return selected, output_columns
+
+    def prune_columns(self, query, full_columns: List[List[PlanColumn]], selected: List[PlanColumn]) -> List[List[PlanColumn]]:
+        """
+        Keep only the columns of each table which are selected or referenced by the where clause.
+        """
+        needed = set(id(column) for column in selected)
+        if query.where_clause is not None:
+            columns = [column for columns in full_columns for column in columns]
+            resolve = self.get_resolver(columns)
+            for column in query.where_clause.columns():
+                needed.add(id(columns[resolve(column)[0]]))
+        return [[column for column in columns if id(column) in needed] for columns in full_columns]
+
+    def get_resolver(self, columns: List[PlanColumn]):
+        """
+        Returns the function which finds the (position, column definition) of a column reference in the rows.
+        """
+        ref_names = set(column.ref_name for column in columns)
+
+        def resolve(column: Column):
+            if column.table_name is not None and column.table_name not in ref_names:
+                raise QueryError(Message.WhereTableNotSpecified.get_message())
+            found = [
+                (position, plan_column.definition) for position, plan_column in enumerate(columns)
+                if plan_column.column_name == column.column_name
+                and (column.table_name is None or plan_column.ref_name == column.table_name)
+            ]
+            if len(found) == 0:
+                raise QueryError(Message.WhereColumnNotExist.get_message())
+            if len(found) > 1:
+                raise QueryError(Message.WhereAmbiguousReference.get_message())
+            return found[0]
+
+        return resolve
+
+    def get_local_resolver(self, resolve, offset: int):
+        """
+        Returns the resolver of the columns of one table, whose columns start at offset in the joined rows.
+        """
+        def local_resolve(column: Column):
+            position, definition = resolve(column)
+            return position - offset, definition
+        return local_resolve
+
+    def is_equi_join(self, conjunct) -> bool:
+        return isinstance(conjunct, Comparison) and conjunct.op == "=" \
+            and isinstance(conjunct.left, Column) and isinstance(conjunct.right, Column)
+
+    def plan_table(self, table, columns: List[PlanColumn], conjuncts, resolve, index_order: Optional[List[int]] = None, index_reverse: bool = False) -> Plan:
+        """
+        Choose the access path of a table and check the conditions on the table right above it.
+        resolve gives the positions of the columns in the rows of this table.
+        A scan costs a read of every row, and an index a seek to the depth of the b-tree and a fetch of each row it finds.
+        A large scan is split over the worker processes, unless the statement sees records which are not in the file.
+        index_order is the positions in the table of the columns by which the rows are wanted in order,
+        a table which would be fully scanned is then read through an index whose leading columns they are,
+        and a range of such an index is read in that order. With index_reverse they are wanted in the reverse order,
+        and the index is read backwards.
+        """
+        row_count = self.repo.get_row_count(table)
+        statistics = self.repo.get_statistics(table)
+        bounds = self.get_bounds(conjuncts, resolve)
+        estimate = max(1, row_count * self.get_selectivity(statistics, row_count, conjuncts, resolve))
+        seek = math.log2(row_count + 2)
+
+        best = None
+        best_cost = row_count * SCAN_COST
+        for index in sorted(table.indexes.values(), key=lambda index: index.index_name != Index.PRIMARY):
+            equal_values = []
+            for column_name in index.column_list:
+                if "=" not in bounds.get(column_name, {}):
+                    break
+                equal_values.append(bounds[column_name]["="])
+
+            if equal_values:
+                if index.unique and len(equal_values) == len(index.column_list):
+                    matched = 1
+                else :
+                    matched = row_count
+                    for column_name, value in zip(index.column_list, equal_values):
+                        matched *= self.get_column_selectivity(statistics, row_count, column_name, "=", value)
+                plan = IndexLookup(self.repo, table, columns, index, equal_values, max(1, matched))
+            elif index.column_list[0] in bounds:
+                column_bounds = bounds[index.column_list[0]]
+                low = ([column_bounds[">="]], True) if ">=" in column_bounds else ([column_bounds[">"]], False) if ">" in column_bounds else None
+                high = ([column_bounds["<="]], True) if "<=" in column_bounds else ([column_bounds["<"]], False) if "<" in column_bounds else None
+                if low is None and high is None:
+                    continue
+                matched = row_count * self.get_range_selectivity(
+                    statistics, row_count, index.column_list[0],
+                    None if low is None else low[0][0], None if high is None else high[0][0]
+                )
+                reverse = index_reverse and index_order is not None and index.positions[:len(index_order)] == index_order
+                plan = IndexRangeScan(self.repo, table, columns, index, low, high, max(1, matched), reverse)
+            else :
+                continue
+
+            cost = seek + matched * FETCH_COST
+            if cost < best_cost:
+                best, best_cost = plan, cost
+
+        if best is None and index_order is not None:
+            for index in table.indexes.values():
+                if index.positions[:len(index_order)] == index_order:
+                    best = IndexRangeScan(self.repo, table, columns, index, None, None, row_count, index_reverse)
+                    break
+
+        # The workers read the committed records from the file, so the scan is run by them only when the statement
+        # sees nothing else: not in a snapshot, which may be older, nor in a transaction of BEGIN or with records
+        # kept by write behind, which are newer
+        if best is None and conjuncts and is_parallel(row_count) and self.repo.sees_only_file():
+            resolved = {(column.table_name, column.column_name) : resolve(column) for conjunct in conjuncts for column in conjunct.columns()}
+            return ParallelScan(self.repo, table, columns, conjuncts, resolved, compile_filter(And(conjuncts), resolve), estimate)
+
+        plan = best if best is not None else TableScan(self.repo, table, columns, row_count)
+        if conjuncts:
+            plan = Filter(plan, compile_filter(And(conjuncts), resolve), min(plan.estimate, estimate))
+        return plan
+
+    def get_selectivity(self, statistics, row_count: int, conjuncts, resolve) -> float:
+        """
+        The fraction of the rows of a table which pass all the conditions, which are taken to be independent.
+        """
+        fraction = 1.0
+        for conjunct in conjuncts:
+            if isinstance(conjunct, NullTest):
+                column_statistics = None if statistics is None else statistics.get_column(resolve(conjunct.column)[1].column_name)
+                if column_statistics is None or row_count == 0:
+                    fraction *= FILTER_SELECTIVITY
+                else :
+                    null_fraction = column_statistics.null_fraction(row_count)
+                    fraction *= null_fraction if conjunct.is_null else 1 - null_fraction
+                continue
+
+            column_and_value = conjunct.column_and_value() if isinstance(conjunct, Comparison) else None
+            if column_and_value is None:
+                fraction *= FILTER_SELECTIVITY
+                continue
+            column, op, value = column_and_value
+            _, definition = resolve(column)
+            if definition.data_type != value.data_type:
+                fraction *= FILTER_SELECTIVITY
+                continue
+            typed_value = value.typed_value()
+            if op == "=" or op == "!=":
+                fraction *= self.get_column_selectivity(statistics, row_count, definition.column_name, op, typed_value)
+            elif op == ">" or op == ">=":
+                fraction *= self.get_range_selectivity(statistics, row_count, definition.column_name, typed_value, None)
+            else :
+                fraction *= self.get_range_selectivity(statistics, row_count, definition.column_name, None, typed_value)
+        return fraction
+
+    def get_column_selectivity(self, statistics, row_count: int, column_name: str, op: str, value) -> float:
+        """
+        The fraction of the rows whose column is equal ("=") or not equal ("!=") to the value.
+        """
+        column_statistics = None if statistics is None else statistics.get_column(column_name)
+        if column_statistics is None or row_count == 0:
+            return EQUAL_SELECTIVITY if op == "=" else 1 - EQUAL_SELECTIVITY
+        equal = column_statistics.equal_fraction(value, row_count)
+        if op == "=":
+            return equal
+        return max(0.0, 1 - column_statistics.null_fraction(row_count) - equal)
+
+    def get_range_selectivity(self, statistics, row_count: int, column_name: str, low, high) -> float:
+        """
+        The fraction of the rows whose column is between low and high, either of which may be None for no bound.
+        """
+        column_statistics = None if statistics is None else statistics.get_column(column_name)
+        fraction = None
+        if column_statistics is not None and row_count > 0:
+            fraction = column_statistics.range_fraction(low, high, row_count)
+        return RANGE_SELECTIVITY if fraction is None else fraction
+
+    def get_bounds(self, conjuncts, resolve) -> Dict[str, Dict[str, object]]:
+        """
+        Collects the comparisons between a column and a literal from the and-ed conditions,
+        as {column name: {operator: value}}. When a column has several bounds of the same kind,
+        only one of them is kept, the filter on top of the scan checks all of them anyway.
+        """
+        bounds = {}
+        for conjunct in conjuncts:
+            if not isinstance(conjunct, Comparison):
+                continue
+            column_and_value = conjunct.column_and_value()
+            if column_and_value is None:
+                continue
+            column, op, value = column_and_value
+            _, definition = resolve(column)
+            if op == "!=" or definition.data_type != value.data_type:
+                continue
+            bounds.setdefault(definition.column_name, {})[op] = value.typed_value()
+        return bounds
+
+    def plan_join(self, left: Plan, right: Plan, left_keys: List[int], right_keys: List[int]) -> Plan:
+        """
+        Join the right table to the left plan with the cheapest method.
+        The keys are the positions of the columns compared by equality, in the rows of each side.
+        Costs count the rows which are touched, seeks in an index cost the depth of the b-tree.
+        """
+        l, r = max(left.estimate, 1), max(right.estimate, 1)
+        if not left_keys:
+            return NestedLoopJoin(left, right, l * r)
+
+        estimate = self.estimate_join(left, right, left_keys, right_keys)
+        left_key = key_function(left_keys)
+        right_key = key_function(right_keys)
+
+        width = len(left.columns)
+        def matches(row):
+            key = left_key(row)
+            return key is not None and key == right_key(row[width:])
+
+        left_sorted = left.ordering[:len(left_keys)] == left_keys
+        right_sorted = right.ordering[:len(right_keys)] == right_keys
+        candidates = [
+            (l * r, lambda: Filter(NestedLoopJoin(left, right, l * r), matches, estimate)),
+            (l + r + min(l, r), lambda: HashJoin(left, right, left_key, right_key, l < r, estimate)),
+            (
+                (l if left_sorted else l * math.log2(l + 1)) + (r if right_sorted else r * math.log2(r + 1)),
+                lambda: MergeJoin(left, right, left_key, right_key, left_sorted, right_sorted, estimate)
+            ),
+        ]
+
+        index_join = self.get_join_index(right, right_keys)
+        if index_join is not None:
+            index, left_index_keys = index_join
+            table = self.get_scanned_table(right)
+            seek = math.log2(self.repo.get_row_count(table) + 2)
+            right_filter = right.predicate if isinstance(right, (Filter, ParallelScan)) else None
+            candidates.append((
+                l * seek,
+                lambda: IndexNestedLoopJoin(
+                    left, self.repo, table, right.columns, index,
+                    [left_keys[number] for number in left_index_keys], left_key, right_key, right_filter, estimate
+                )
+            ))
+
+        _, build = min(candidates, key=lambda candidate: candidate[0])
+        return build()
+
+    def get_scanned_table(self, plan: Plan):
+        return plan.child.table if isinstance(plan, Filter) else plan.table
+
+    def get_join_index(self, right: Plan, right_keys: List[int]) -> Optional[Tuple[Index, List[int]]]:
+        """
+        Find an index of the right table whose leading columns are all join keys,
+        returns it with the numbers of the keys in the order of the index columns.
+        """
+        table = self.get_scanned_table(right)
+        # The keys are positions in the pruned rows, the index has positions in the stored rows
+        key_positions = [right.columns[position].position for position in right_keys]
+        best = None
+        for index in table.indexes.values():
+            key_numbers = []
+            for position in index.positions:
+                if position not in key_positions:
+                    break
+                key_numbers.append(key_positions.index(position))
+            if key_numbers and (best is None or len(key_numbers) > len(best[1])):
+                best = (index, key_numbers)
+        return best
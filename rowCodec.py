@@ -0,0 +1,96 @@
+import struct
+from datetime import date
+from typing import Callable, List, Optional
+
+# Rows hold typed values: an int as int, a date as its ordinal (days since 0001-01-01) and a char as str.
+# These turn the literal text of a value into its typed value and back.
+PARSERS = {
+    "int" : int,
+    "char" : str,
+    "date" : lambda text: date.fromisoformat(text).toordinal(),
+}
+
+FORMATTERS = {
+    "int" : str,
+    "char" : str,
+    "date" : lambda value: date.fromordinal(value).isoformat(),
+}
+
+# Packed field of each type, a char field is the byte length of its text
+FIELD_FORMATS = {
+    "int" : "q",
+    "char" : "I",
+    "date" : "i",
+}
+
+INT_MIN = -(1 << 63)
+INT_MAX = (1 << 63) - 1
+
+class RowCodec:
+    """
+    Packs the rows of a table into bytes with struct, following its column definitions.
+
+    A record is a null bitmap, a fixed size field for every column (0 for a null),
+    and then the utf-8 texts of the char columns whose lengths are in their fields.
+    As the fields have fixed offsets, a column is decoded without decoding the ones before it,
+    so the scans only decode the columns which the query uses.
+    """
+
+    def __init__(self, column_definitions) -> None:
+        self.data_types = [column.data_type for column in column_definitions]
+        self.column_count = len(self.data_types)
+        self.bitmap_size = (self.column_count + 7) // 8
+        self.struct = struct.Struct("<" + f"{self.bitmap_size}s" + "".join(FIELD_FORMATS[data_type] for data_type in self.data_types))
+        self.char_positions = [position for position, data_type in enumerate(self.data_types) if data_type == "char"]
+
+    def encode(self, row: List) -> bytes:
+        bitmap = bytearray(self.bitmap_size)
+        fields = []
+        texts = []
+        for position, (data_type, value) in enumerate(zip(self.data_types, row)):
+            if value is None:
+                bitmap[position >> 3] |= 1 << (position & 7)
+                fields.append(0)
+            elif data_type == "char":
+                text = value.encode('utf-8')
+                texts.append(text)
+                fields.append(len(text))
+            else :
+                fields.append(value)
+        return self.struct.pack(bytes(bitmap), *fields) + b"".join(texts)
+
+    def decoder(self, positions: Optional[List[int]] = None) -> Callable[[bytes], list]:
+        """
+        Returns the function which decodes the columns at the given positions of a record,
+        every column if positions is None.
+        """
+        if positions is None:
+            positions = list(range(self.column_count))
+
+        # For each wanted column: its field, whether it is a char, and the fields of the chars before it
+        plan = [
+            (
+                position,
+                self.data_types[position] == "char",
+                [char + 1 for char in self.char_positions if char < position]
+            )
+            for position in positions
+        ]
+        unpack = self.struct.unpack_from
+        size = self.struct.size
+
+        def decode(data: bytes) -> list:
+            fields = unpack(data)
+            bitmap = fields[0]
+            row = []
+            for position, is_char, chars_before in plan:
+                if bitmap[position >> 3] & (1 << (position & 7)):
+                    row.append(None)
+                elif is_char:
+                    start = size + sum(fields[char] for char in chars_before)
+                    row.append(data[start:start + fields[position + 1]].decode('utf-8'))
+                else :
+                    row.append(fields[position + 1])
+            return row
+
+        return decode
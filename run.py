@@ -1,10 +1,20 @@
-from lark import Transformer, Lark, Tree, Token
+import sys
+import time
+from lark import Lark, Transformer, Tree, Token
+from lark.exceptions import LarkError, VisitError
 from database import myDatabase
-from typing import List, Union
+from sqlParser import load_parser
+from statementCache import StatementCache, ParameterError
+from message import Message
+from profiler import profiler
+from typing import List, Optional, Union
 
 # Declare const for printing the DBMS prompt
 PROMPT_CONST = "DB_2018-10371> "
 
+# Statements about the profiles, which are not profiled themselves so that SHOW PROFILE shows the statement before
+UNPROFILED_STATEMENTS = ("set_profiling_query", "show_profile_query")
+
 # Execute the actual query
 class MyTransformer(Transformer):
     """
@@ -16,9 +26,20 @@ class MyTransformer(Transformer):
     
     
     # Print function for DBMS
+    # A select result comes as chunks of text, which are written as soon as they are produced
     def print_request(self, request):
-        if request is not None and request != "" :
-            print(PROMPT_CONST + request)
+        if request is None or request == "" :
+            return
+        if isinstance(request, str) :
+            with profiler.phase("output"):
+                print(PROMPT_CONST + request)
+            return
+        sys.stdout.write(PROMPT_CONST)
+        for chunk in request:
+            with profiler.phase("output"):
+                sys.stdout.write(chunk)
+                sys.stdout.flush()
+        sys.stdout.write("\n")
     
     def create_table_query(self, items: List[Union[Tree, Token]]):
         message = myDatabase.create_table(items)
@@ -40,6 +61,10 @@ class MyTransformer(Transformer):
         message = myDatabase.explain(items)
         self.print_request(message)
         
+    def explain_select_query(self, items):
+        message = myDatabase.explain_select(items)
+        self.print_request(message)
+        
     def describe_query(self, items):
         message = myDatabase.explain(items)
         self.print_request(message)
@@ -48,6 +73,10 @@ class MyTransformer(Transformer):
         message = myDatabase.explain(items)
         self.print_request(message)
         
+    def analyze_query(self, items):
+        message = myDatabase.analyze(items)
+        self.print_request(message)
+        
     def show_tables_query(self, items):
         message = myDatabase.show_tables(items)
         self.print_request(message)
@@ -59,6 +88,42 @@ class MyTransformer(Transformer):
     def update_tables_query(self, items):
         message = myDatabase.update_tables(items)
         self.print_request(message)
+        
+    def load_data_query(self, items):
+        message = myDatabase.load_data(items)
+        self.print_request(message)
+        
+    def copy_query(self, items):
+        message = myDatabase.copy_table(items)
+        self.print_request(message)
+        
+    def create_index_query(self, items):
+        message = myDatabase.create_index(items)
+        self.print_request(message)
+        
+    def drop_index_query(self, items):
+        message = myDatabase.drop_index(items)
+        self.print_request(message)
+        
+    def begin_query(self, items):
+        message = myDatabase.begin(items)
+        self.print_request(message)
+        
+    def commit_query(self, items):
+        message = myDatabase.commit(items)
+        self.print_request(message)
+        
+    def rollback_query(self, items):
+        message = myDatabase.rollback(items)
+        self.print_request(message)
+        
+    def set_profiling_query(self, items):
+        message = myDatabase.set_profiling(items)
+        self.print_request(message)
+        
+    def show_profile_query(self, items):
+        message = myDatabase.show_profile(items)
+        self.print_request(message)
     
     # This will return True to terminate
     def EXIT(self, items):
@@ -66,10 +131,11 @@ class MyTransformer(Transformer):
 
 
 # DBMS class
+# The server runs a DatabaseManagementSystem for each client, which share the parser
 class DatabaseManagementSystem :
-    def __init__(self) -> None:
-        with open('grammar.lark') as file:
-            self.sql_parser = Lark(file.read(), start="command", lexer="basic")
+    def __init__(self, sql_parser: Optional[Lark] = None) -> None:
+        self.sql_parser = load_parser() if sql_parser is None else sql_parser
+        self.statement_cache = StatementCache(self.sql_parser)
     
     # get input with prompt const
     def get_input_from_prompt(self):
@@ -93,35 +159,126 @@ class DatabaseManagementSystem :
         
     # parsing the queries and return the list of them
     # if it fails to parse query, it will apend None and stop parsing.
+    # a query which has a parameter out of PREPARE is not run either, its error message is appended instead
+    # the text and the parse time of each query are kept for its profile
     def parse_queries(self, queries: List[str]):
         outputs = []
+        self.parsed = []
         for query in queries:
             query = query.replace('\n', ' ')
+            start = time.perf_counter()
             try :
                 outputs.append(self.parse_query(query + ";"))
-            except :
+            except ParameterError as error:
+                outputs.append(error.message)
+            except (LarkError, ValueError):
                 outputs.append(None)
+            self.parsed.append((query, time.perf_counter() - start))
+            if not isinstance(outputs[-1], Tree):
                 break
             
         return outputs
     
     def parse_query(self, query: str):
-        return self.sql_parser.parse(query)
+        return self.statement_cache.parse(query)
     
     # transforms the query based on the given outputs
-    # if the output is None, then print the syntax error and return
+    # if the output is None, then print the syntax error and return, and if it is an error message, print it and return
     # if the given output is EXIT command, then it will return True
+    # prepare and execute are handled here, since the transformer would run the prepared statement
+    # the queries are one batch, at whose end the writes kept by write behind may be written
     def transform_query(self, outputs):
-        for output in outputs:
+        try :
+            return self.run_batch(outputs)
+        finally :
+            self.end_batch()
+    
+    def run_batch(self, outputs):
+        for output, (query, parse_time) in zip(outputs, self.parsed):
             if output is None :
                 self.print_to_prompt("Syntax error")
                 return False
-            ans: Tree = MyTransformer().transform(output)
-            if ans.children[0] == True:
-                return True
+            if isinstance(output, str):
+                self.print_to_prompt(output)
+                return False
+            statement = self.get_statement(output)
+            kind = None if statement is None else statement.data
+            if kind not in UNPROFILED_STATEMENTS:
+                profiler.start(query, parse_time, kind)
+            try :
+                if self.run_command(output, statement):
+                    return True
+            finally :
+                profiler.finish()
         
         return False
     
+    def end_batch(self):
+        myDatabase.end_batch()
+    
+    # runs a parsed command, and returns True if it is the EXIT command
+    def run_command(self, output: Tree, statement: Optional[Tree]) -> bool:
+        if statement is not None and statement.data == "prepare_query":
+            self.print_to_prompt(self.prepare(statement))
+            return False
+        if statement is not None and statement.data == "execute_query":
+            output = self.bind_prepared(statement)
+            if isinstance(output, str):
+                self.print_to_prompt(output)
+                return False
+        ans = self.execute_statement(output)
+        return ans.children[0] == True
+    
+    # runs a parsed command, and commits the writes of its statement
+    def execute_statement(self, output: Tree) -> Tree:
+        return self.transform_statement(MyTransformer(), output)
+    
+    # a statement which fails is rolled back and its error is printed, then the next statements run
+    # the output which is lost is not an error of the statement, so it stops the batch
+    def transform_statement(self, transformer: MyTransformer, output: Tree) -> Tree:
+        try :
+            ans: Tree = transformer.transform(output)
+        except VisitError as error:
+            myDatabase.abort_statement()
+            if isinstance(error.orig_exc, ConnectionError):
+                raise error.orig_exc
+            self.print_to_prompt(Message.StatementError.get_message(repr(error.orig_exc)))
+            return Tree("command", [False])
+        myDatabase.end_statement()
+        return ans
+    
+    # returns the tree of the statement in the command, or None for the EXIT command
+    def get_statement(self, output: Tree) -> Optional[Tree]:
+        query_list = output.children[0]
+        if not isinstance(query_list, Tree):
+            return None
+        return query_list.children[0].children[0]
+    
+    def prepare(self, statement: Tree) -> str:
+        statement_name = statement.children[1].children[0].lower()
+        try :
+            self.statement_cache.prepare(statement_name, statement.children[3].children[0])
+        except ParameterError as error:
+            return error.message
+        return Message.PrepareSuccess.get_message(statement_name)
+    
+    # returns the command of the prepared statement with the given values bound to its parameters, or the error message
+    def bind_prepared(self, statement: Tree) -> Union[Tree, str]:
+        statement_name = statement.children[1].children[0].lower()
+        prepared = self.statement_cache.get_prepared(statement_name)
+        if prepared is None:
+            return Message.NoSuchPreparedStatement.get_message()
+        
+        tree, param_count = prepared
+        value_list = statement.children[2]
+        values = [] if value_list is None else [child.children[0] for child in value_list.children if isinstance(child, Tree)]
+        if len(values) != param_count:
+            return Message.ExecuteParameterCountError.get_message()
+        try :
+            return Tree("command", [Tree("query_list", [Tree("query", [StatementCache.bind(tree, values)])])])
+        except ParameterError as error:
+            return error.message
+    
     def run_dbms():
         dbms = DatabaseManagementSystem()
         queries = dbms.get_queries()
@@ -129,6 +286,8 @@ class DatabaseManagementSystem :
         # It will process the query until meeting the EXIT command
         while not dbms.transform_query(dbms.parse_queries(queries)):
             queries = dbms.get_queries()
+        myDatabase.close()
 
 # Run the DBMS system
-DatabaseManagementSystem.run_dbms()
\ No newline at end of file
+if __name__ == "__main__":
+    DatabaseManagementSystem.run_dbms()
\ No newline at end of file
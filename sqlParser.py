@@ -0,0 +1,23 @@
+import os
+from lark import Lark
+
+# The grammar is found next to the source, whatever the working directory is
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+GRAMMAR_FILE = os.path.join(BASE_DIR, 'grammar.lark')
+PARSER_CACHE_FILE = os.path.join(BASE_DIR, 'grammar.lark.cache')
+
+def load_parser(cache: bool = True) -> Lark:
+    """
+    Build the LALR parser of the sql grammar.
+    The parse tables are cached to PARSER_CACHE_FILE, and lark stores the hash of the grammar
+    and of the options in that file, so the cache is rebuilt whenever grammar.lark changes.
+    If the cache can not be written, the parser is still returned.
+    """
+    with open(GRAMMAR_FILE) as file:
+        grammar = file.read()
+    return Lark(
+        grammar,
+        start="command",
+        parser="lalr",
+        cache=PARSER_CACHE_FILE if cache else False
+    )
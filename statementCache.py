@@ -0,0 +1,131 @@
+import re
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+from lark import Lark, Tree, Token
+from message import Message
+
+# Number of statement shapes whose parse trees are kept
+CACHE_SIZE = 256
+
+# Only these statements are cached, their literals are always values which can be parameterized
+CACHED_STATEMENTS = ("select", "insert", "delete", "update")
+# A statement longer than this after normalizing, or with more literals, is parsed without keeping its tree,
+# such as an insert of many rows, whose tree is large and whose shape is seldom repeated
+MAX_CACHED_LENGTH = 2000
+MAX_CACHED_LITERALS = 100
+
+# Literals in the order the lexer tries them, a date before an int
+LITERAL_PATTERN = re.compile(
+    r"(?P<STR>\"(?:[^\"\\]|\\.)*\"|'(?:[^'\\]|\\.)*')"
+    r"|(?P<DATE>\b\d{4}-\d{2}-\d{2}\b)"
+    r"|(?P<INT>[+-]?\b\d+\b)"
+)
+FIRST_WORD_PATTERN = re.compile(r"\s*([A-Za-z]+)")
+
+class ParameterError(Exception):
+    """
+    Raised when the parameters of a statement can not be bound, such as a parameter out of a prepared statement.
+    message is the one to show to the user.
+    """
+    def __init__(self, message: str) -> None:
+        super().__init__(message)
+        self.message = message
+
+class StatementCache:
+    """
+    Keeps the parse trees of the statements, so that a statement which is repeated
+    with different values is parsed only once.
+
+    A statement is normalized by replacing its literals with the parameters $1, $2, ...
+    and the tree of the normalized text is kept in a LRU cache, unless the statement is too large.
+    The same trees are used for the prepared statements, and a tree is run by binding
+    the values to its parameters.
+    """
+
+    def __init__(self, parser: Lark, size: int = CACHE_SIZE) -> None:
+        self.parser = parser
+        self.size = size
+        self.trees: "OrderedDict[str, Tree]" = OrderedDict()
+        self.prepared: Dict[str, Tuple[Tree, int]] = {}
+
+    def parse(self, statement: str) -> Tree:
+        normalized = self.normalize(statement)
+        if normalized is None:
+            tree = self.parser.parse(statement)
+            StatementCache.check_parameters(tree)
+            return tree
+
+        text, values = normalized
+        if len(text) > MAX_CACHED_LENGTH or len(values) > MAX_CACHED_LITERALS:
+            return StatementCache.bind(self.parser.parse(text), values)
+        tree = self.trees.get(text)
+        if tree is None:
+            tree = self.parser.parse(text)
+            self.trees[text] = tree
+            if len(self.trees) > self.size:
+                self.trees.popitem(last=False)
+        else :
+            self.trees.move_to_end(text)
+        return StatementCache.bind(tree, values)
+
+    def normalize(self, statement: str) -> Optional[Tuple[str, List[Token]]]:
+        """
+        Returns the statement with its literals replaced by parameters, and the literals as tokens,
+        or None if the statement is not cached.
+        """
+        first_word = FIRST_WORD_PATTERN.match(statement)
+        if first_word is None or first_word.group(1).lower() not in CACHED_STATEMENTS:
+            return None
+
+        values = []
+        def replace(match):
+            values.append(Token(match.lastgroup, match.group()))
+            return f" ${len(values)} "
+        text = LITERAL_PATTERN.sub(replace, statement)
+
+        # A parameter written by the user is only allowed in a prepared statement
+        if text.count("$") != len(values):
+            raise ParameterError(Message.ParameterOutOfPrepareError.get_message())
+        return " ".join(text.split()), values
+
+    def check_parameters(tree: Tree):
+        """
+        Raises ParameterError if the tree has a parameter out of the statement of a PREPARE.
+        """
+        if tree.data == "prepare_query":
+            return
+        for child in tree.children:
+            if isinstance(child, Tree):
+                StatementCache.check_parameters(child)
+            elif isinstance(child, Token) and child.type == "PARAM":
+                raise ParameterError(Message.ParameterOutOfPrepareError.get_message())
+
+    def prepare(self, statement_name: str, tree: Tree):
+        """
+        Keeps the tree of the statement, whose parameters must be $1 to $n, each used at least once.
+        """
+        params = tree.scan_values(lambda value: isinstance(value, Token) and value.type == "PARAM")
+        numbers = set(int(param[1:]) for param in params)
+        if numbers != set(range(1, len(numbers) + 1)):
+            raise ParameterError(Message.PrepareParameterNumberError.get_message())
+        self.prepared[statement_name] = (tree, len(numbers))
+
+    def get_prepared(self, statement_name: str) -> Optional[Tuple[Tree, int]]:
+        return self.prepared.get(statement_name)
+
+    def bind(tree: Tree, values: List[Token]) -> Tree:
+        """
+        Returns a copy of the tree whose parameter $n is replaced with the n-th value.
+        Raises ParameterError if there is no n-th value.
+        """
+        children = []
+        for child in tree.children:
+            if isinstance(child, Tree):
+                child = StatementCache.bind(child, values)
+            elif isinstance(child, Token) and child.type == "PARAM":
+                number = int(child[1:])
+                if not 1 <= number <= len(values):
+                    raise ParameterError(Message.ExecuteParameterCountError.get_message())
+                child = values[number - 1]
+            children.append(child)
+        return Tree(tree.data, children)
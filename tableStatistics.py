@@ -0,0 +1,238 @@
+import copy
+import math
+import random
+import zlib
+from bisect import bisect_left
+from typing import Dict, Iterable, List, Optional, Tuple
+
+# The distinct values of a column are counted by a HyperLogLog sketch of REGISTER_COUNT registers,
+# whose estimate is within about 1.04 / sqrt(REGISTER_COUNT) of the true count (6.5%)
+REGISTER_BITS = 8
+REGISTER_COUNT = 1 << REGISTER_BITS
+HASH_BITS = 64
+HASH_MASK = (1 << HASH_BITS) - 1
+# Buckets of the histogram of a column, each holds about the same number of rows when ANALYZE builds it
+HISTOGRAM_BUCKETS = 8
+# Values of each column which ANALYZE samples to find the bounds of the buckets
+HISTOGRAM_SAMPLE = 10000
+
+def hash_value(value) -> int:
+    """
+    A 64 bit hash of a value which is the same in every process, unlike hash() of a str.
+    The bits are mixed by the finalizer of murmur3, since the registers take the low bits.
+    """
+    h = zlib.crc32(value.encode('utf-8')) if isinstance(value, str) else value & HASH_MASK
+    h = ((h ^ (h >> 33)) * 0xff51afd7ed558ccd) & HASH_MASK
+    h = ((h ^ (h >> 33)) * 0xc4ceb9fe1a85ec53) & HASH_MASK
+    return h ^ (h >> 33)
+
+def to_number(value) -> Optional[float]:
+    """
+    The position of a value on a line, for the values which are spread evenly between two bounds.
+    An int and a date (its ordinal) are numbers, a char is not.
+    """
+    return None if isinstance(value, str) else float(value)
+
+class ColumnStatistics:
+    """
+    What the planner knows of the values of a column: the number of nulls, the smallest and largest value,
+    a sketch of the distinct values, and a histogram with the number of rows between each pair of bounds.
+    The values are added as they are inserted. A removed value is taken out of the null count and the histogram,
+    but the bounds and the sketch can only grow, so they are kept as they are until the next ANALYZE.
+    The histogram exists only after ANALYZE, which finds its bounds.
+    """
+    def __init__(self, item: Optional[dict] = None) -> None:
+        item = item if item is not None else {}
+        self.null_count: int = item.get("nulls", 0)
+        self.minimum = item.get("min")
+        self.maximum = item.get("max")
+        self.registers = bytearray.fromhex(item["registers"]) if "registers" in item else bytearray(REGISTER_COUNT)
+        self.bounds: list = item.get("bounds", [])
+        self.counts: List[float] = item.get("counts", [])
+
+    def to_dict(self) -> dict:
+        item = {
+            "nulls" : self.null_count,
+            "min" : self.minimum,
+            "max" : self.maximum,
+            "registers" : self.registers.hex(),
+        }
+        if self.bounds:
+            item["bounds"] = self.bounds
+            item["counts"] = self.counts
+        return item
+
+    def copy(self) -> "ColumnStatistics":
+        column = copy.copy(self)
+        column.registers = bytearray(self.registers)
+        column.bounds = list(self.bounds)
+        column.counts = list(self.counts)
+        return column
+
+    def add_values(self, values: list):
+        registers = self.registers
+        for value in values:
+            if value is None:
+                self.null_count += 1
+                continue
+            if self.minimum is None or value < self.minimum:
+                self.minimum = value
+            if self.maximum is None or value > self.maximum:
+                self.maximum = value
+            h = hash_value(value)
+            rank = HASH_BITS - REGISTER_BITS - (h >> REGISTER_BITS).bit_length() + 1
+            if rank > registers[h & (REGISTER_COUNT - 1)]:
+                registers[h & (REGISTER_COUNT - 1)] = rank
+            if self.bounds:
+                self.counts[self.find_bucket(value, widen=True)] += 1
+
+    def remove_values(self, values: list):
+        for value in values:
+            if value is None:
+                self.null_count = max(0, self.null_count - 1)
+            elif self.bounds:
+                bucket = self.find_bucket(value)
+                self.counts[bucket] = max(0, self.counts[bucket] - 1)
+
+    def find_bucket(self, value, widen: bool = False) -> int:
+        """
+        The bucket i holds the values in (bounds[i], bounds[i + 1]], the first one also holds bounds[0].
+        A value out of the bounds widens the first or last bucket when widen is set.
+        """
+        if widen and value < self.bounds[0]:
+            self.bounds[0] = value
+        if widen and value > self.bounds[-1]:
+            self.bounds[-1] = value
+        return min(max(0, bisect_left(self.bounds, value) - 1), len(self.counts) - 1)
+
+    def distinct_count(self) -> float:
+        """
+        The HyperLogLog estimate, counted exactly from the empty registers while few of them are set.
+        """
+        m = REGISTER_COUNT
+        zeros = self.registers.count(0)
+        if zeros == m:
+            return 0
+        estimate = 0.7213 / (1 + 1.079 / m) * m * m / sum(2.0 ** -register for register in self.registers)
+        if estimate <= 2.5 * m and zeros > 0:
+            return m * math.log(m / zeros)
+        return estimate
+
+    def equal_fraction(self, value, row_count: int) -> float:
+        """
+        The fraction of the rows which are equal to the value, each distinct value is taken to be as frequent.
+        """
+        non_null = max(row_count - self.null_count, 0)
+        if non_null == 0 or self.minimum is None or value < self.minimum or value > self.maximum:
+            return 0.0
+        distinct = min(max(self.distinct_count(), 1), non_null)
+        return non_null / distinct / row_count
+
+    def range_fraction(self, low, high, row_count: int) -> Optional[float]:
+        """
+        The fraction of the rows between low and high, either of which may be None for no bound.
+        It is found from the histogram, or from the smallest and largest value for the numbers,
+        None when neither tells it.
+        """
+        non_null = max(row_count - self.null_count, 0)
+        if non_null == 0 or self.minimum is None:
+            return 0.0
+        if self.bounds and sum(self.counts) > 0:
+            covered = sum(
+                count * self.overlap(self.bounds[bucket], self.bounds[bucket + 1], low, high)
+                for bucket, count in enumerate(self.counts)
+            )
+            return covered / sum(self.counts) * non_null / row_count
+        if to_number(self.minimum) is None:
+            return None
+        return self.overlap(self.minimum, self.maximum, low, high) * non_null / row_count
+
+    def overlap(self, start, end, low, high) -> float:
+        """
+        The part of the values between start and end which are between low and high, taken to be spread evenly.
+        Only half of the values are taken for a partial overlap of chars, whose spread is unknown.
+        """
+        if (low is not None and end < low) or (high is not None and start > high):
+            return 0.0
+        if (low is None or start >= low) and (high is None or end <= high):
+            return 1.0
+        if to_number(start) is None or start == end:
+            return 0.5
+        first = start if low is None else max(start, low)
+        last = end if high is None else min(end, high)
+        return min(max(to_number(last) - to_number(first), 1) / (to_number(end) - to_number(start)), 1.0)
+
+    def null_fraction(self, row_count: int) -> float:
+        return min(self.null_count / row_count, 1.0) if row_count > 0 else 0.0
+
+class TableStatistics:
+    """
+    Statistics of each column of a table, by column name, which the planner uses to estimate how many rows
+    pass the conditions of a query. The row count of the table is the one kept by the repository.
+    """
+    def __init__(self, column_names: List[str], item: Optional[dict] = None) -> None:
+        self.column_names = column_names
+        columns = item.get("columns", {}) if item is not None else {}
+        self.columns: Dict[str, ColumnStatistics] = {
+            column_name : ColumnStatistics(columns.get(column_name)) for column_name in column_names
+        }
+
+    def to_dict(self) -> dict:
+        return {"columns" : {column_name : column.to_dict() for column_name, column in self.columns.items()}}
+
+    def copy(self) -> "TableStatistics":
+        statistics = copy.copy(self)
+        statistics.columns = {column_name : column.copy() for column_name, column in self.columns.items()}
+        return statistics
+
+    def get_column(self, column_name: str) -> Optional[ColumnStatistics]:
+        return self.columns.get(column_name)
+
+    def add_rows(self, rows: List[list]):
+        for position, column_name in enumerate(self.column_names):
+            self.columns[column_name].add_values([row[position] for row in rows])
+
+    def remove_rows(self, rows: List[list]):
+        for position, column_name in enumerate(self.column_names):
+            self.columns[column_name].remove_values([row[position] for row in rows])
+
+    @staticmethod
+    def analyze(column_names: List[str], rows: Iterable[list]) -> Tuple["TableStatistics", int]:
+        """
+        Build the statistics from all the rows of a table, and count them.
+        The bounds of the histogram of each column are the quantiles of a sample of the rows,
+        and the rows of each bucket are counted in the sample and scaled up to the table.
+        """
+        statistics = TableStatistics(column_names)
+        sample = []
+        batch = []
+        row_count = 0
+        chooser = random.Random(0)
+        for row in rows:
+            row_count += 1
+            if len(sample) < HISTOGRAM_SAMPLE:
+                sample.append(row)
+            else :
+                slot = chooser.randrange(row_count)
+                if slot < HISTOGRAM_SAMPLE:
+                    sample[slot] = row
+            batch.append(row)
+            if len(batch) == HISTOGRAM_SAMPLE:
+                statistics.add_rows(batch)
+                batch = []
+        statistics.add_rows(batch)
+
+        for position, column_name in enumerate(column_names):
+            values = sorted(row[position] for row in sample if row[position] is not None)
+            if not values:
+                continue
+            column = statistics.columns[column_name]
+            column.bounds = [values[len(values) * number // HISTOGRAM_BUCKETS] for number in range(HISTOGRAM_BUCKETS)]
+            column.bounds[0] = column.minimum
+            column.bounds.append(column.maximum)
+            column.counts = [0] * HISTOGRAM_BUCKETS
+            for value in values:
+                column.counts[column.find_bucket(value)] += 1
+            scale = (row_count - column.null_count) / len(values)
+            column.counts = [count * scale for count in column.counts]
+        return statistics, row_count
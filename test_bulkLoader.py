@@ -0,0 +1,73 @@
+import csv
+import pytest
+from bulkLoader import BulkLoader
+from message import Message
+from test_select import result_rows
+
+@pytest.fixture
+def people(run_sql, monkeypatch):
+    """
+    A table to load, with batches of two rows so that a file of a few lines is loaded in several batches.
+    """
+    monkeypatch.setattr(BulkLoader.read_batches, "__defaults__", (2,))
+    run_sql("create table people (id int, name char(10), primary key (id));")
+    return run_sql
+
+def load(run_sql, tmp_path, content: bytes):
+    path = tmp_path / "people.csv"
+    path.write_bytes(content)
+    return run_sql(f"load data '{path}' into people;")
+
+def count(run_sql):
+    return result_rows(run_sql("select count(*) from people;"))[0][0]
+
+def test_load(people, tmp_path):
+    assert load(people, tmp_path, b"id,name\n1,ann\n2,bob\n3,\\N\n") == [Message.LoadDataResult.get_message(3)]
+    assert result_rows(people("select name from people where id = 3;")) == [["null"]]
+
+def test_empty_field(people, tmp_path):
+    # Empty in a char column is an empty text, in an int column it is null
+    people("create table pets (id int, owner int, name char(10), primary key (id));")
+    path = tmp_path / "pets.csv"
+    path.write_bytes(b"1,,\n2,\\N,\\N\n")
+    assert people(f"load data '{path}' into pets;") == [Message.LoadDataResult.get_message(2)]
+    assert result_rows(people("select id from pets where name = '';")) == [["1"]]
+    assert result_rows(people("select id from pets where owner is null;")) == [["1"], ["2"]]
+
+def test_copy_and_load_round_trip(people, tmp_path):
+    people("insert into people values (1, 'ann'), (2, ''), (3, '\\N'), (4, '\\\\N');")
+    people("insert into people (id) values (5);")
+    path = tmp_path / "copy.csv"
+    assert people(f"copy people to '{path}';") == [Message.CopyResult.get_message(5)]
+    rows = result_rows(people("select id, name from people;"))
+    people("delete from people;")
+    assert people(f"load data '{path}' into people;") == [Message.LoadDataResult.get_message(5)]
+    assert result_rows(people("select id, name from people;")) == rows
+    assert result_rows(people("select id from people where name is null;")) == [["5"]]
+
+def test_line_which_is_not_utf8(people, tmp_path):
+    output = load(people, tmp_path, b"1,ann\n2,bob\n3,caf\xe9\n4,dan\n")
+    assert output == [Message.LoadDataEncodingError.get_message(3)]
+    # The first batch was written, and is rolled back with the statement
+    assert count(people) == "0"
+
+def test_line_which_is_not_csv(people, tmp_path):
+    content = b"1,ann\n2,bob\n3," + b"x" * (csv.field_size_limit() + 1) + b"\n"
+    assert load(people, tmp_path, content) == [Message.LoadDataFormatError.get_message(3)]
+    assert count(people) == "0"
+
+def test_duplicate_primary_key_in_the_file(people, tmp_path):
+    output = load(people, tmp_path, b"1,ann\n2,bob\n3,cy\n1,dan\n")
+    assert output == [Message.LoadDataDuplicatePrimaryKeyError.get_message(4)]
+    assert count(people) == "0"
+
+def test_failed_load_in_transaction_keeps_the_others(people, tmp_path):
+    people("begin; insert into people values (10, 'eve');")
+    assert load(people, tmp_path, b"1,ann\n2,bob\nx,cy\n") == [Message.LoadDataTypeMismatchError.get_message(3)]
+    people("commit;")
+    assert result_rows(people("select id from people;")) == [["10"]]
+
+def test_missing_file(people, tmp_path):
+    path = tmp_path / "missing.csv"
+    assert people(f"load data '{path}' into people;") == [Message.FileOpenError.get_message(str(path))]
+    assert people("load data '' into people;") == ["Cannot open ''"]
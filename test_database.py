@@ -0,0 +1,39 @@
+import pytest
+from message import Message
+from test_select import result_rows
+
+INSERT_MISMATCH = Message.InsertTypeMismatchError.get_message()
+UPDATE_MISMATCH = Message.UpdateTypeMismatchError.get_message()
+
+@pytest.fixture
+def things(run_sql):
+    run_sql("create table things (a int, b char(5), c date, primary key (a));")
+    return run_sql
+
+@pytest.mark.parametrize("values", ["('5', 'w', 2020-01-01)", "(6, 7, 2020-01-01)", "(6, 'w', '2020-01-01')",
+                                    "(6, 2020-01-01, 2020-01-01)", "(6, 'w', 7)"])
+def test_insert_literal_of_another_type(things, values):
+    assert things(f"insert into things values {values};") == [INSERT_MISMATCH]
+    assert result_rows(things("select count(*) from things;")) == [["0"]]
+
+def test_insert_literals(things):
+    assert things("insert into things values (5, 'w', 2020-01-01), (-6, '7', 2020-02-29);") == [Message.InsertManyResult.get_message(2)]
+    assert result_rows(things("select a, b, c from things where a < 0;")) == [["-6", "7", "2020-02-29"]]
+
+@pytest.mark.parametrize("assignment", ["b = 5", "a = '5'", "c = '2020-01-01'", "b = 2020-01-01"])
+def test_update_literal_of_another_type(things, assignment):
+    things("insert into things values (5, 'w', 2020-01-01);")
+    assert things(f"update things set {assignment};") == [UPDATE_MISMATCH]
+    assert result_rows(things("select a, b, c from things;")) == [["5", "w", "2020-01-01"]]
+
+def test_update_literals(things):
+    things("insert into things values (5, 'w', 2020-01-01);")
+    things("update things set b = '5'; update things set c = 2021-03-04; update things set a = 6;")
+    assert result_rows(things("select a, b, c from things;")) == [["6", "5", "2021-03-04"]]
+    things("update things set b = null;")
+    assert result_rows(things("select b from things;")) == [["null"]]
+
+def test_prepared_insert_checks_the_types_of_the_values(things):
+    things("prepare add as insert into things values ($1, $2, $3);")
+    assert things("execute add ('5', 'w', 2020-01-01);") == [INSERT_MISMATCH]
+    assert things("execute add (5, 'w', 2020-01-01);") == [Message.InsertResult.get_message()]
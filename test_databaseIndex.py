@@ -0,0 +1,57 @@
+import itertools
+from databaseIndex import Index
+from databaseRepository import ColumnDefinition, Schema
+from rowCodec import PARSERS, INT_MIN, INT_MAX
+
+def make_index(*column_list) -> Index:
+    schema = Schema(
+        column_definitions=[
+            ColumnDefinition("a", "int", None, False),
+            ColumnDefinition("b", "char", 10, False),
+            ColumnDefinition("c", "date", None, False),
+        ],
+        table_constraints=[]
+    )
+    schema.setup()
+    index = Index("test", list(column_list))
+    index.setup(schema)
+    return index
+
+def null_first(value):
+    return (value is not None, value)
+
+def test_int_keys_are_ordered_as_the_values():
+    index = make_index("a")
+    values = [None, INT_MIN, -1000, -1, 0, 1, 255, 256, 1 << 40, INT_MAX]
+    assert sorted(values, key=lambda value: index.encode([value])) == values
+
+def test_date_keys_are_ordered_as_the_values():
+    index = make_index("c")
+    values = [PARSERS["date"](text) for text in ["0001-01-01", "1999-12-31", "2000-01-01", "2000-02-29", "9999-12-31"]]
+    assert sorted(values, key=lambda value: index.encode([value])) == values
+
+def test_text_keys_are_ordered_as_the_values():
+    index = make_index("b")
+    values = [None, "", "\x00", "\x00\x00", "\x00a", "a", "a\x00", "a\x00b", "ab", "b", "한"]
+    assert sorted(values, key=lambda value: index.encode([value]), reverse=True) == sorted(values, key=null_first, reverse=True)
+
+def test_keys_of_two_columns_are_ordered_column_by_column():
+    index = make_index("b", "a")
+    pairs = list(itertools.product([None, "", "a", "a\x00", "ab"], [None, -1, 0, 1]))
+    expected = sorted(pairs, key=lambda pair: (null_first(pair[0]), null_first(pair[1])))
+    assert sorted(pairs, key=lambda pair: index.encode(list(pair))) == expected
+
+def test_no_key_is_a_prefix_of_another():
+    index = make_index("b", "a")
+    keys = [index.encode([text, number]) for text in [None, "", "a", "a\x00", "ab"] for number in [None, 0, 1]]
+    for key, other in itertools.permutations(keys, 2):
+        assert not other.startswith(key)
+
+def test_encode_row_takes_the_indexed_columns():
+    index = make_index("c", "a")
+    assert index.encode_row([1, "x", 730000]) == index.encode([730000, 1])
+
+def test_internal_names():
+    assert Index(Index.PRIMARY, ["a"]).is_internal()
+    assert Index(Index.foreign_key_name(2), ["a"]).is_internal()
+    assert not Index("foreigner", ["a"]).is_internal()
@@ -0,0 +1,88 @@
+import json
+import pytest
+from berkeleydb import db
+from databaseInstance import DB_FILE, FORMAT_KEY, FORMAT_VERSION, SCHEMA_PREFIX, ROW_PREFIX, SEPARATOR
+from message import Message
+from test_select import result_rows
+
+def column(column_name: str, data_type: str, data_len = None, not_null: bool = False) -> dict:
+    return {"column_name" : column_name, "data_type" : data_type, "data_len" : data_len, "not_null" : not_null}
+
+def constraint(key_type: str, column_list: list, reference_table = None, reference_column_list = None) -> dict:
+    return {"key_type" : key_type, "column_list" : column_list, "reference_table" : reference_table, "reference_column_list" : reference_column_list}
+
+# The tables of the older layouts, as their schemas and rows of texts
+TABLES = {
+    "parent" : (
+        {
+            "column_definitions" : [column("id", "int", not_null=True), column("name", "char", 10), column("born", "date")],
+            "table_constraints" : [constraint("primary_key", ["id"])],
+        },
+        [["1", "one", "2000-01-01"], ["2", "two", "2000-02-30"], ["3", None, None]],
+    ),
+    "child" : (
+        {
+            "column_definitions" : [column("id", "int", not_null=True), column("parent_id", "int")],
+            "table_constraints" : [constraint("primary_key", ["id"]), constraint("foreign_key", ["parent_id"], "parent", ["id"])],
+        },
+        [["10", "1"], ["11", "3"]],
+    ),
+}
+
+def to_bytes(item) -> bytes:
+    return json.dumps(item).encode('utf-8')
+
+def write_hash_file():
+    """
+    The first layout: a hash db whose values are the schema and all the rows of a table.
+    """
+    legacy = db.DB()
+    legacy.open(DB_FILE, dbtype=db.DB_HASH, flags=db.DB_CREATE)
+    for table_name, (schema, rows) in TABLES.items():
+        legacy.put(bytes(table_name, 'utf-8'), to_bytes({"schema" : schema, "rows" : rows}))
+    legacy.close()
+
+def write_json_rows_file():
+    """
+    The format 1 of the B-tree layout: a record per row, as a json list of texts.
+    """
+    legacy = db.DB()
+    legacy.open(DB_FILE, dbtype=db.DB_BTREE, flags=db.DB_CREATE)
+    for table_name, (schema, rows) in TABLES.items():
+        legacy.put(SCHEMA_PREFIX + bytes(table_name, 'utf-8'), to_bytes({"schema" : schema}))
+        for rowid, row in enumerate(rows, start=1):
+            legacy.put(ROW_PREFIX + bytes(table_name, 'utf-8') + SEPARATOR + rowid.to_bytes(8, 'big'), to_bytes(row))
+    legacy.put(FORMAT_KEY, b"1")
+    legacy.close()
+
+@pytest.fixture
+def db_files(request, tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    request.param()
+
+pytestmark = pytest.mark.parametrize("db_files", [write_hash_file, write_json_rows_file], indirect=True)
+
+def test_rows_are_migrated(repo, run_sql):
+    assert repo.dbInstance.format_version == FORMAT_VERSION
+    # 2000-02-30 could be inserted before the values were checked, and becomes null
+    assert result_rows(run_sql("select * from parent;")) == [["1", "one", "2000-01-01"], ["2", "two", "null"], ["3", "null", "null"]]
+    assert result_rows(run_sql("select * from child;")) == [["10", "1"], ["11", "3"]]
+
+def test_indexes_are_built(repo, run_sql):
+    for table_name, index_count in [("parent", 1), ("child", 2)]:
+        table = repo.get_table_instance(table_name)
+        assert len(table.indexes) == index_count
+        for index in table.indexes.values():
+            entries = list(repo.dbInstance.iter_prefix(repo.dbInstance.index_prefix(table_name, index.index_name)))
+            assert len(entries) == len(TABLES[table_name][1])
+    assert result_rows(run_sql("select name from parent where id = 2;")) == [["two"]]
+    assert result_rows(run_sql("select born from parent where born = 2000-01-01;")) == [["2000-01-01"]]
+
+def test_keys_are_enforced(run_sql):
+    assert run_sql("insert into parent values (1, 'again', 2001-01-01);") == [Message.InsertDuplicatePrimaryKeyError.get_message()]
+    assert run_sql("insert into child values (12, 4);") == [Message.InsertReferentialIntegrityError.get_message()]
+    assert run_sql("delete from parent where id = 3;") == [
+        Message.DeleteResult.get_message(0),
+        Message.DeleteReferentialIntegrityPassed.get_message(1),
+    ]
+    assert run_sql("drop table parent;") == [Message.DropReferencedTableError.get_message("parent")]
@@ -0,0 +1,243 @@
+import pytest
+import databaseRepository
+from databaseInstance import COUNT_PREFIX, STATS_PREFIX
+from databaseRepository import DatabaseRepository
+from message import Message
+from test_select import result_rows
+
+@pytest.fixture
+def parent(run_sql):
+    """
+    A table with a primary key and two rows.
+    """
+    run_sql("create table parent (id int not null, name char(10), primary key (id));")
+    run_sql("insert into parent values (1, 'one'), (2, 'two');")
+    return run_sql
+
+def test_duplicate_primary_key_is_not_inserted(parent):
+    assert parent("insert into parent values (1, 'again');") == [Message.InsertDuplicatePrimaryKeyError.get_message()]
+    assert result_rows(parent("select id from parent;")) == [["1"], ["2"]]
+
+def test_primary_key_duplicated_within_the_statement_is_not_inserted(parent):
+    assert parent("insert into parent values (3, 'x'), (3, 'y');") == [Message.InsertDuplicatePrimaryKeyError.get_message()]
+    assert result_rows(parent("select id from parent;")) == [["1"], ["2"]]
+
+def test_primary_key_is_not_nullable(parent):
+    assert parent("insert into parent (name) values ('none');") == [Message.InsertColumnNonNullableError.get_message("id")]
+
+def test_point_lookup_by_primary_key(parent):
+    assert result_rows(parent("select name from parent where id = 2;")) == [["two"]]
+    assert result_rows(parent("select name from parent where id = 3;")) == []
+
+@pytest.fixture
+def written_keys(repo, monkeypatch):
+    """
+    The keys which the statements write to the db, from the time the fixture is used.
+    """
+    keys = []
+    put = repo.dbInstance.put
+    def record(key, value, *args, **kwargs):
+        keys.append(key)
+        return put(key, value, *args, **kwargs)
+    monkeypatch.setattr(repo.dbInstance, "put", record)
+    return keys
+
+def test_statement_writes_only_its_rows(parent, written_keys):
+    parent("insert into parent values (3, 'three'); update parent set name = 'x' where id = 3; delete from parent where id = 3;")
+    assert written_keys
+    assert not [key for key in written_keys if key.startswith((COUNT_PREFIX, STATS_PREFIX))]
+    assert result_rows(parent("select count(*) from parent;")) == [["2"]]
+
+def test_counters_are_written_after_many_changes(repo, parent, monkeypatch):
+    # The two rows of the fixture are changed rows as well
+    monkeypatch.setattr(databaseRepository, "WRITE_COUNTERS_ROWS", 4)
+    parent("insert into parent values (3, 'three');")
+    # The count in the db is deleted until it is written again, so it is never stale
+    assert repo.dbInstance.get_row_count("parent") is None
+    parent("insert into parent values (4, 'four');")
+    assert repo.dbInstance.get_row_count("parent") == 4
+
+def test_counters_are_written_by_commit_and_analyze(repo, parent):
+    parent("begin; insert into parent values (3, 'three');")
+    assert repo.dbInstance.get_row_count("parent") is None
+    parent("commit;")
+    assert repo.dbInstance.get_row_count("parent") == 3
+    parent("delete from parent where id = 3;")
+    assert repo.dbInstance.get_row_count("parent") is None
+    parent("analyze parent;")
+    assert repo.dbInstance.get_row_count("parent") == 2
+    assert repo.dbInstance.get_statistics("parent") is not None
+
+def test_rollback_keeps_the_counters(parent):
+    parent("begin; insert into parent values (3, 'three'); delete from parent where id = 1; rollback;")
+    assert result_rows(parent("select count(*) from parent;")) == [["2"]]
+
+def test_counters_are_written_on_close(repo, parent):
+    parent("insert into parent values (3, 'three');")
+    repo.close()
+    repository = DatabaseRepository()
+    try :
+        assert repository.dbInstance.get_row_count("parent") == 3
+    finally :
+        repository.close()
+
+def test_count_of_a_db_which_is_not_closed(repo, parent):
+    parent("insert into parent values (3, 'three');")
+    # Another process opening the file now sees the rows, but no count
+    assert repo.dbInstance.get_row_count("parent") is None
+    repo.tables["parent"].row_count = None
+    assert result_rows(parent("select count(*) from parent;")) == [["3"]]
+
+@pytest.fixture
+def employees(run_sql):
+    """
+    A table whose foreign key references the table itself: 1 is its own boss, 1 is the boss of 2, and 2 of 3.
+    """
+    run_sql("create table employee (id int not null, boss int, primary key (id), foreign key (boss) references employee (id));")
+    run_sql("insert into employee values (1, 1), (2, 1), (3, 2);")
+    return run_sql
+
+def test_row_may_reference_a_row_of_the_same_statement(employees):
+    assert employees("insert into employee values (4, 5), (5, 4);") == [Message.InsertManyResult.get_message(2)]
+    assert employees("insert into employee values (6, 7);") == [Message.InsertReferentialIntegrityError.get_message()]
+
+def test_referenced_rows_are_kept_and_the_others_deleted(employees):
+    assert employees("delete from employee where id = 1 or id = 3;") == [
+        Message.DeleteResult.get_message(1),
+        Message.DeleteReferentialIntegrityPassed.get_message(1),
+    ]
+    assert result_rows(employees("select id from employee;")) == [["1"], ["2"]]
+
+def test_row_referenced_only_by_deleted_rows_is_deleted(employees):
+    assert employees("delete from employee where id > 1;") == [Message.DeleteResult.get_message(2)]
+    # The row which references itself
+    assert employees("delete from employee;") == [Message.DeleteResult.get_message(1)]
+    assert employees("drop table employee;") == [Message.DropSuccess.get_message("employee")]
+
+@pytest.fixture
+def staff(run_sql):
+    """
+    Ten rows with a primary key and an index on age, the age of i is 20 + i % 3.
+    """
+    run_sql("create table staff (id int not null, name char(10), age int, primary key (id));")
+    run_sql("create index staff_age on staff (age);")
+    run_sql("insert into staff values " + ", ".join(f"({i}, 's{i}', {20 + i % 3})" for i in range(10)) + ";")
+    return run_sql
+
+def index_entries(repo, table_name: str):
+    """
+    The number of entries of each index of the table.
+    """
+    return {
+        index_name : len(list(repo.dbInstance.iter_prefix(repo.dbInstance.index_prefix(table_name, index_name))))
+        for index_name in repo.tables[table_name].indexes
+    }
+
+def test_delete_reports_the_deleted_rows(staff):
+    assert staff("delete from staff where age = 21;") == [Message.DeleteResult.get_message(3)]
+    assert result_rows(staff("select id from staff where age > 20;")) == [["2"], ["5"], ["8"]]
+    assert staff("delete from staff where id = 1;") == [Message.DeleteResult.get_message(0)]
+    assert staff("delete from staff;") == [Message.DeleteResult.get_message(7)]
+    assert result_rows(staff("select count(*) from staff;")) == [["0"]]
+
+def test_delete_removes_the_index_entries(repo, staff):
+    staff("delete from staff where id < 4;")
+    assert index_entries(repo, "staff") == {index_name : 6 for index_name in repo.tables["staff"].indexes}
+    assert result_rows(staff("select id from staff where age = 20;")) == [["6"], ["9"]]
+    # The key of a deleted row is free again
+    assert staff("insert into staff values (0, 'again', 20);") == [Message.InsertResult.get_message()]
+
+def test_delete_by_key_reads_only_the_deleted_row(repo, staff, monkeypatch):
+    def scan_rows(*args, **kwargs):
+        raise AssertionError("the table is scanned")
+    with monkeypatch.context() as patch:
+        patch.setattr(repo, "scan_rows", scan_rows)
+        assert staff("delete from staff where id = 4;") == [Message.DeleteResult.get_message(1)]
+    assert result_rows(staff("select count(*) from staff;")) == [["9"]]
+
+def test_update_reports_the_updated_rows(staff):
+    assert staff("update staff set age = 30 where age = 21;") == [Message.UpdateResult.get_message(3)]
+    assert result_rows(staff("select id from staff where age = 30;")) == [["1"], ["4"], ["7"]]
+    assert staff("update staff set name = 'x' where id = 10;") == [Message.UpdateResult.get_message(0)]
+
+def test_update_replaces_the_index_entries(repo, staff):
+    staff("update staff set age = 30 where id < 3; update staff set id = 12 where id = 9;")
+    assert index_entries(repo, "staff") == {index_name : 10 for index_name in repo.tables["staff"].indexes}
+    assert result_rows(staff("select id from staff where age = 30;")) == [["0"], ["1"], ["2"]]
+    assert result_rows(staff("select name from staff where id = 12;")) == [["s9"]]
+    assert result_rows(staff("select name from staff where id = 9;")) == []
+
+def test_update_to_duplicate_primary_key(staff):
+    assert staff("update staff set id = 1 where id = 2;") == [Message.UpdateDuplicatePrimaryKeyError.get_message()]
+    # Rows which would all take the same key
+    assert staff("update staff set id = 20 where id > 7;") == [Message.UpdateDuplicatePrimaryKeyError.get_message()]
+    assert result_rows(staff("select count(*) from staff where id < 10;")) == [["10"]]
+
+def test_update_checks_the_value_against_the_column(staff):
+    assert staff("update staff set height = 1;") == [Message.UpdateColumnExistenceError.get_message("height")]
+    assert staff("update staff set age = 'old';") == [Message.UpdateTypeMismatchError.get_message()]
+    assert staff("update staff set id = null;") == [Message.UpdateColumnNonNullableError.get_message("id")]
+    # A longer text is cut to the length of the column
+    staff("update staff set name = 'abcdefghijklmn' where id = 0;")
+    assert result_rows(staff("select name from staff where id = 0;")) == [["abcdefghij"]]
+
+def test_update_checks_the_value_once(staff, monkeypatch):
+    checks = []
+    is_valid_literal = databaseRepository.ColumnDefinition.is_valid_literal
+    def counted(column, value):
+        checks.append(value)
+        return is_valid_literal(column, value)
+    monkeypatch.setattr(databaseRepository.ColumnDefinition, "is_valid_literal", counted)
+    assert staff("update staff set age = 40;") == [Message.UpdateResult.get_message(10)]
+    assert len(checks) == 1
+
+@pytest.fixture
+def keyed(run_sql):
+    """
+    A parent table with a primary key, and a child table whose foreign key references it.
+    """
+    run_sql("create table parent (id int not null, name char(10), primary key (id));")
+    run_sql("create table child (id int not null, parent_id int, primary key (id), foreign key (parent_id) references parent (id));")
+    run_sql("insert into parent values (1, 'one'), (2, 'two');")
+    run_sql("insert into child values (10, 1);")
+    return run_sql
+
+def test_foreign_key_must_reference_a_row(keyed):
+    assert keyed("insert into child values (11, 3);") == [Message.InsertReferentialIntegrityError.get_message()]
+    assert keyed("insert into child values (11, 2);") == [Message.InsertResult.get_message()]
+    assert keyed("insert into child (id) values (12);") == [Message.InsertResult.get_message()]
+
+def test_referenced_row_is_not_deleted(keyed):
+    assert keyed("delete from parent;") == [
+        Message.DeleteResult.get_message(1),
+        Message.DeleteReferentialIntegrityPassed.get_message(1),
+    ]
+    assert result_rows(keyed("select id from parent;")) == [["1"]]
+
+def test_referenced_key_is_not_updated(keyed):
+    assert keyed("update parent set id = 5 where id = 1;") == [Message.UpdateReferentialIntegrityError.get_message()]
+    assert keyed("update child set parent_id = 3;") == [Message.UpdateReferentialIntegrityError.get_message()]
+    assert keyed("update child set parent_id = 2;") == [Message.UpdateResult.get_message(1)]
+    assert keyed("update parent set id = 5 where id = 1;") == [Message.UpdateResult.get_message(1)]
+
+def test_referenced_table_is_not_dropped(keyed):
+    assert keyed("drop table parent;") == [Message.DropReferencedTableError.get_message("parent")]
+    keyed("drop table child;")
+    assert keyed("drop table parent;") == [Message.DropSuccess.get_message("parent")]
+
+def test_references_are_checked_by_seeking_the_indexes(repo, keyed, monkeypatch):
+    # The rows to change are found by scanning a table this small, the tables they reference or are referenced by are not
+    scan = repo.scan_rows
+    def scan_rows(table, *args, **kwargs):
+        if table.table_name != "parent":
+            raise AssertionError(f"{table.table_name} is scanned")
+        return scan(table, *args, **kwargs)
+    with monkeypatch.context() as patch:
+        patch.setattr(repo, "scan_rows", scan_rows)
+        assert keyed("insert into child values (11, 2);") == [Message.InsertResult.get_message()]
+        assert keyed("delete from parent where id = 1;") == [
+            Message.DeleteResult.get_message(0),
+            Message.DeleteReferentialIntegrityPassed.get_message(1),
+        ]
+        assert keyed("update parent set id = 3 where id = 2;") == [Message.UpdateReferentialIntegrityError.get_message()]
+    assert keyed("update child set parent_id = 1 where id = 11;") == [Message.UpdateResult.get_message(1)]
@@ -0,0 +1,134 @@
+import asyncio
+import threading
+import time
+import pytest
+from dbClient import Connection, ConnectionPool
+from dbServer import DatabaseServer, ReadWriteLock
+from message import Message
+from test_select import result_rows
+from wireProtocol import encode_frame, recv_frame
+
+def output_rows(output: str):
+    return result_rows(output.splitlines())
+
+@pytest.fixture
+def address(repo):
+    """
+    The address of a server on the repository of the test, listening on an ephemeral port in a thread of its own.
+    """
+    loop = asyncio.new_event_loop()
+    server = loop.run_until_complete(asyncio.start_server(DatabaseServer().handle_client, "127.0.0.1", 0, start_serving=True))
+    thread = threading.Thread(target=loop.run_forever, daemon=True)
+    thread.start()
+    yield server.sockets[0].getsockname()[:2]
+    async def stop():
+        # The clients are closed by now, so the handlers end once their sessions are rolled back and closed
+        server.close()
+        handlers = [task for task in asyncio.all_tasks() if task is not asyncio.current_task()]
+        if handlers:
+            await asyncio.wait(handlers, timeout=10)
+        await server.wait_closed()
+    asyncio.run_coroutine_threadsafe(stop(), loop).result(timeout=10)
+    loop.call_soon_threadsafe(loop.stop)
+    thread.join(timeout=10)
+    loop.close()
+
+@pytest.fixture
+def pool(address):
+    pool = ConnectionPool(address, size=2)
+    pool.execute("create table t (a int, primary key (a));")
+    yield pool
+    pool.close()
+
+def test_round_trip(pool):
+    assert pool.execute("insert into t values (1), (2);") == Message.InsertManyResult.get_message(2) + "\n"
+    assert output_rows(pool.execute("select a from t;")) == [["1"], ["2"]]
+    assert pool.execute("selec a from t;") == Message.SyntaxError.get_message() + "\n"
+
+def test_not_utf8_request(address):
+    connection = Connection(address)
+    connection.sock.sendall(encode_frame(b"\xff;"))
+    assert recv_frame(connection.sock) == (Message.RequestEncodingError.get_message() + "\n").encode('utf-8')
+    assert recv_frame(connection.sock) == b""
+    recv_frame(connection.sock)
+    assert output_rows(connection.execute("select a from t;")) == []
+    connection.close()
+
+def test_session_reports_its_transaction(address):
+    connection = Connection(address)
+    connection.execute("create table t (a int);")
+    assert not connection.in_transaction
+    connection.execute("begin;")
+    assert connection.in_transaction
+    connection.execute("insert into t values (1);")
+    assert connection.in_transaction
+    connection.execute("commit;")
+    assert not connection.in_transaction
+    connection.close()
+
+def test_write_waits_for_the_transaction(pool):
+    finished = threading.Event()
+    def write():
+        with pool.connection() as connection:
+            connection.execute("insert into t values (2);")
+        finished.set()
+
+    with pool.connection() as connection:
+        connection.execute("begin; insert into t values (1);")
+        writer = threading.Thread(target=write)
+        writer.start()
+        # The write lock of the server is held from BEGIN, so the insert of the other client waits for COMMIT
+        assert not finished.wait(0.5)
+        assert output_rows(connection.execute("select a from t;")) == [["1"]]
+        connection.execute("commit;")
+    writer.join(timeout=10)
+    assert finished.is_set()
+    assert output_rows(pool.execute("select a from t;")) == [["1"], ["2"]]
+
+def test_transaction_left_in_the_pool_is_rolled_back(pool):
+    with pool.connection() as connection:
+        connection.execute("begin; insert into t values (1);")
+        left = connection
+    assert not left.in_transaction
+
+    # The other connection of the pool writes without waiting for a transaction
+    finished = threading.Event()
+    def write():
+        with pool.connection() as first, pool.connection() as second:
+            second.execute("insert into t values (2);")
+        finished.set()
+    threading.Thread(target=write, daemon=True).start()
+    assert finished.wait(10)
+    assert output_rows(pool.execute("select a from t;")) == [["2"]]
+
+def test_connection_of_an_unread_response_is_closed(pool):
+    with pool.connection() as connection:
+        next(connection.execute_stream("select a from t; select a from t;"))
+    assert connection.reading
+    assert pool.free.empty()
+    assert output_rows(pool.execute("select a from t;")) == []
+
+def test_waiting_writer_keeps_new_readers_out():
+    lock = ReadWriteLock()
+    lock.acquire_read()
+    events = []
+    def write():
+        lock.acquire_write()
+        events.append("write")
+        lock.release_write()
+    def read():
+        lock.acquire_read()
+        events.append("read")
+        lock.release_read()
+    writer = threading.Thread(target=write)
+    writer.start()
+    while lock.waiting_writers == 0:
+        time.sleep(0.01)
+    reader = threading.Thread(target=read)
+    reader.start()
+    time.sleep(0.1)
+    assert events == []
+    lock.release_read()
+    writer.join(timeout=10)
+    reader.join(timeout=10)
+    assert events == ["write", "read"]
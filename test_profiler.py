@@ -0,0 +1,77 @@
+import json
+import re
+import threading
+import pytest
+import profiler as profiler_module
+from message import Message
+from profiler import profiler, PHASES
+
+@pytest.fixture
+def profiling(run_sql, monkeypatch):
+    """
+    Runs the statements with the profiling state of a new session.
+    """
+    monkeypatch.setattr(profiler, "local", threading.local())
+    monkeypatch.setattr(profiler_module, "PROFILING", False)
+    run_sql("create table t (a int, b char(5)); insert into t values (1, 'x'), (2, 'y');")
+    return run_sql
+
+def profile_of(output):
+    """
+    The statement, the times of the phases, and the counters which SHOW PROFILE shows.
+    """
+    lines = [line.strip() for line in output if line.strip()]
+    statement = lines[1][len("statement ["):-1]
+    phases, counters = {}, {}
+    for line in lines[2:-1]:
+        fields = re.split(r"\s{2,}", line)
+        if fields[0] in PHASES or fields[0] == "total":
+            phases[fields[0]] = float(fields[1])
+        elif fields[0] not in ("phase", "counter"):
+            counters[fields[0]] = int(fields[1])
+    return statement, phases, counters
+
+def test_no_profile_until_profiling_is_on(profiling):
+    assert profiling("show profile;") == [Message.NoProfileError.get_message()]
+    assert profiling("set profiling on;") == [Message.ProfilingEnabled.get_message()]
+    assert profiling("show profile;") == [Message.NoProfileError.get_message()]
+
+def test_profile_of_the_last_statement(profiling):
+    profiling("set profiling on;")
+    profiling("select * from t where a > 1;")
+    statement, phases, counters = profile_of(profiling("show profile;"))
+    assert statement == "select * from t where a > 1"
+    assert {"parse", "transform", "plan", "storage read", "decode", "format", "output"} <= set(phases)
+    assert sum(time for phase, time in phases.items() if phase != "total") == pytest.approx(phases["total"], abs=0.01)
+    assert counters["rows read"] == 2 and counters["bytes read"] > 0
+    # SHOW PROFILE is not profiled itself, nor is SET PROFILING
+    profiling("set profiling on;")
+    assert profile_of(profiling("show profile;"))[0] == statement
+
+def test_profile_of_a_write(profiling):
+    profiling("set profiling on; insert into t values (3, 'z');")
+    statement, phases, counters = profile_of(profiling("show profile;"))
+    assert "storage write" in phases and "encode" in phases
+    assert counters["bytes written"] > 0
+
+def test_profiling_off(profiling):
+    profiling("set profiling on; select a from t;")
+    assert profiling("set profiling off;") == [Message.ProfilingDisabled.get_message()]
+    profiling("select b from t;")
+    assert profile_of(profiling("show profile;"))[0] == "select a from t"
+    assert not profiler.is_active()
+
+def test_profiles_are_appended_as_json_lines(profiling, tmp_path, monkeypatch):
+    path = tmp_path / "profile.jsonl"
+    monkeypatch.setattr(profiler_module, "PROFILE_FILE", str(path))
+    profiling("set profiling on; delete from t where a = 1; select count(*) from t;")
+    profiles = [json.loads(line) for line in path.read_text().splitlines()]
+    assert [(profile["statement"], profile["kind"]) for profile in profiles] == [
+        ("delete from t where a = 1", "delete_query"),
+        ("select count(*) from t", "select_query"),
+    ]
+    assert profiles[0]["total_ms"] == pytest.approx(sum(profiles[0]["phases_ms"].values()), abs=0.01)
+
+def test_statement_which_is_not_profiled_is_not_wrapped():
+    function = lambda value: value
+    assert profiler.wrap("decode", function) is function
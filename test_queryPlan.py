@@ -0,0 +1,44 @@
+import random
+import pytest
+from queryPlan import Plan, Sort, TopN
+
+class Rows(Plan):
+    """
+    A plan of the given rows.
+    """
+    def __init__(self, rows) -> None:
+        self.columns = []
+        self.estimate = len(rows)
+        self.given = rows
+
+    def rows(self):
+        return iter(self.given)
+
+ROWS = [[random.Random(number).choice([None, 1, 2, 3]), number] for number in range(50)]
+
+@pytest.mark.parametrize("keys", [[(0, False), (1, False)], [(0, True), (1, False)], [(1, True)]])
+@pytest.mark.parametrize("buffer_rows", [1, 7, 50, 100])
+def test_sort_in_runs(keys, buffer_rows):
+    def key(row):
+        return tuple(
+            (row[position] is not None, row[position] or 0) if not descending else (row[position] is None, -(row[position] or 0))
+            for position, descending in keys
+        )
+    assert list(Sort(Rows(ROWS), keys, buffer_rows).rows()) == sorted(ROWS, key=key)
+
+def test_large_input_is_spilled_to_runs(monkeypatch):
+    runs = []
+    write_run = Sort.write_run
+    def recorded(sort, rows):
+        runs.append(len(rows))
+        return write_run(sort, rows)
+    monkeypatch.setattr(Sort, "write_run", recorded)
+    assert list(Sort(Rows(ROWS), [(1, True)], 20).rows()) == sorted(ROWS, key=lambda row: -row[1])
+    assert runs == [20, 20, 10]
+    runs.clear()
+    # An input which is shorter than the buffer is sorted in memory
+    list(Sort(Rows(ROWS), [(1, True)], 51).rows())
+    assert runs == []
+
+def test_top_n():
+    assert list(TopN(Rows(ROWS), [(1, True)], 3).rows()) == [ROWS[49], ROWS[48], ROWS[47]]
@@ -0,0 +1,164 @@
+import re
+import pytest
+import queryPlanner
+from message import BORDER_LINE, Message
+from test_select import result_rows
+from writeBuffer import WriteBuffer
+
+@pytest.fixture
+def numbers(run_sql, monkeypatch):
+    """
+    A table whose filtered scans are run by the workers whatever its size.
+    """
+    monkeypatch.setattr(queryPlanner, "is_parallel", lambda row_count: True)
+    run_sql("create table numbers (n int, m int); insert into numbers values (1, 1), (2, 2), (3, 3);")
+    return run_sql
+
+def plan(run_sql) -> str:
+    return "\n".join(run_sql("explain select n from numbers where m > 1;"))
+
+def test_parallel_scan_reads_the_committed_rows(numbers):
+    assert "ParallelScan on numbers" in plan(numbers)
+    assert result_rows(numbers("select n from numbers where m > 1;")) == [["2"], ["3"]]
+
+def test_no_parallel_scan_in_transaction(numbers):
+    numbers("begin; insert into numbers values (4, 4);")
+    assert "ParallelScan" not in plan(numbers)
+    assert result_rows(numbers("select n from numbers where m > 2;")) == [["3"], ["4"]]
+    numbers("rollback;")
+
+def test_no_parallel_scan_in_snapshot(repo, numbers):
+    assert repo.begin_read()
+    assert "ParallelScan" not in plan(numbers)
+
+def test_no_parallel_scan_with_kept_records(repo, numbers):
+    repo.dbInstance.write_buffer = WriteBuffer("deferred", time_limit=3600)
+    numbers("insert into numbers values (4, 4);")
+    assert repo.has_pending_writes()
+    assert "ParallelScan" not in plan(numbers)
+    assert result_rows(numbers("select n from numbers where m > 2;")) == [["3"], ["4"]]
+    # Planning and reading write none of the kept records
+    assert repo.has_pending_writes()
+
+@pytest.fixture
+def ranked(run_sql):
+    """
+    A table with an index on n, whose rows are not inserted in its order.
+    """
+    run_sql("create table ranked (n int, name char(10)); create index ranked_n on ranked (n);")
+    run_sql("insert into ranked values (3, 'c'), (1, 'a'), (5, 'e'), (2, 'b'), (4, 'd');")
+    run_sql("insert into ranked (name) values ('none');")
+    return run_sql
+
+def test_descending_order_reads_the_index_backwards(ranked):
+    query = "select n, name from ranked order by n desc limit 3;"
+    explained = "\n".join(ranked("explain " + query))
+    assert "IndexRangeScan on ranked using ranked_n backward" in explained
+    assert "TopN" not in explained and "Sort" not in explained
+    assert result_rows(ranked(query)) == [["5", "e"], ["4", "d"], ["3", "c"]]
+    # A null sorts before every value, so it comes last
+    assert result_rows(ranked("select name from ranked order by n desc;"))[-1] == ["none"]
+
+def test_descending_order_of_a_range(ranked):
+    query = "select n from ranked where n > 1 and n <= 4 order by n desc;"
+    assert "backward" in "\n".join(ranked("explain " + query))
+    assert result_rows(ranked(query)) == [["4"], ["3"], ["2"]]
+
+def test_descending_order_with_kept_records(repo, ranked):
+    repo.dbInstance.write_buffer = WriteBuffer("deferred", time_limit=3600)
+    ranked("insert into ranked values (6, 'f'), (0, 'z'); delete from ranked where n = 4;")
+    assert repo.has_pending_writes()
+    assert result_rows(ranked("select n from ranked where n >= 0 order by n desc;")) == [["6"], ["5"], ["3"], ["2"], ["1"], ["0"]]
+
+def explain_rows(run_sql, query: str):
+    """
+    The nodes of the plan which EXPLAIN shows for the query, as [description, estimated rows, actual rows, time].
+    """
+    lines = [line.strip() for line in run_sql("explain " + query)]
+    return [re.split(r"\s{2,}", line) for line in lines[lines.index(BORDER_LINE) + 2:-1]]
+
+def plan_nodes(run_sql, query: str):
+    return [row[0] for row in explain_rows(run_sql, query)]
+
+@pytest.fixture
+def company(run_sql):
+    """
+    20 departments and 100 employees, the department of employee i is i % 20 + 1.
+    """
+    run_sql("create table dept (id int not null, name char(10), primary key (id));")
+    run_sql("create table emp (id int not null, dept int, name char(10), primary key (id), foreign key (dept) references dept (id));")
+    run_sql("insert into dept values " + ", ".join(f"({i}, 'd{i}')" for i in range(1, 21)) + ";")
+    run_sql("insert into emp values " + ", ".join(f"({i}, {i % 20 + 1}, 'e{i}')" for i in range(1, 101)) + ";")
+    return run_sql
+
+def test_join_of_one_row_seeks_the_primary_key(company):
+    query = "select e.name, d.name from emp as e, dept as d where e.id = 7 and e.dept = d.id;"
+    assert "IndexNestedLoopJoin on dept using primary" in plan_nodes(company, query)
+    assert result_rows(company(query)) == [["e7", "d8"]]
+
+def test_foreign_key_join_is_not_a_cartesian_product(company):
+    query = "select e.id, d.name from emp as e, dept as d where e.dept = d.id;"
+    assert "NestedLoopJoin" not in plan_nodes(company, query)
+    rows = result_rows(company(query))
+    assert sorted(rows, key=lambda row: int(row[0])) == [[str(i), f"d{i % 20 + 1}"] for i in range(1, 101)]
+
+def test_hash_join(run_sql):
+    run_sql("create table a (x int, y int); create table b (x int, z int);")
+    run_sql("insert into a values " + ", ".join(f"({i}, {i})" for i in range(30)) + ";")
+    run_sql("insert into b values " + ", ".join(f"({i % 10}, {i})" for i in range(30)) + ";")
+    run_sql("insert into a (y) values (-1); insert into b (z) values (-1);")
+    query = "select a.y, b.z from a, b where a.x = b.x;"
+    assert "HashJoin" in plan_nodes(run_sql, query)
+    # A null key matches nothing
+    expected = sorted([str(z % 10), str(z)] for z in range(30))
+    assert sorted(result_rows(run_sql(query))) == expected
+
+def test_merge_join_of_index_ranges(run_sql):
+    run_sql("create table p (id int not null, v int, primary key (id)); create table q (id int not null, w int, primary key (id));")
+    run_sql("insert into p values " + ", ".join(f"({i}, {i})" for i in range(1, 201)) + ";")
+    run_sql("insert into q values " + ", ".join(f"({i}, {i * 2})" for i in range(1, 201)) + ";")
+    query = "select p.v, q.w from p, q where p.id > 10 and p.id <= 20 and q.id > 10 and q.id <= 20 and p.id = q.id;"
+    assert "MergeJoin" in plan_nodes(run_sql, query)
+    assert result_rows(run_sql(query)) == [[str(i), str(i * 2)] for i in range(11, 21)]
+
+def test_join_without_equality_is_a_nested_loop(company):
+    query = "select e.id, d.id from emp as e, dept as d where e.id < 3 and d.id < e.id;"
+    assert "NestedLoopJoin" in plan_nodes(company, query)
+    assert result_rows(company(query)) == [["2", "1"]]
+
+@pytest.fixture
+def skewed(run_sql):
+    """
+    100 rows whose v is 1 for the first 90, and the id for the others.
+    """
+    run_sql("create table skew (id int not null, v int, primary key (id)); create index skew_v on skew (v);")
+    run_sql("insert into skew values " + ", ".join(f"({i}, {1 if i < 90 else i})" for i in range(100)) + ";")
+    return run_sql
+
+def test_explain_shows_the_estimated_and_actual_rows(skewed):
+    rows = explain_rows(skewed, "select id from skew where v = 95;")
+    assert [row[0] for row in rows] == ["Project", "Filter", "IndexLookup on skew using skew_v"]
+    for description, estimated, actual, time in rows:
+        assert actual == "1"
+        # The 11 distinct values are taken to be as frequent
+        assert estimated == "9"
+        assert float(time) >= 0
+
+def test_explain_of_a_missing_table(skewed):
+    assert skewed("explain select id from nothing;") == [Message.NoSuchTable.get_message()]
+    assert skewed("analyze nothing;") == [Message.NoSuchTable.get_message()]
+
+def test_analyze_builds_the_histogram(repo, skewed):
+    # Before ANALYZE a range is estimated from the smallest and largest value
+    assert explain_rows(skewed, "select id from skew where v <= 1;")[0][1:3] == ["1", "90"]
+    assert skewed("analyze skew;") == [Message.AnalyzeSuccess.get_message("skew")]
+    estimated, actual = explain_rows(skewed, "select id from skew where v <= 1;")[0][1:3]
+    assert actual == "90" and abs(int(estimated) - 90) <= 10
+    # The plan follows the estimate: most of the table is cheaper to scan
+    assert "TableScan on skew" in plan_nodes(skewed, "select id from skew where v <= 1;")
+    assert "IndexRangeScan on skew using skew_v" in plan_nodes(skewed, "select id from skew where v > 95;")
+
+def test_statistics_are_kept_by_the_statements(repo, skewed):
+    skewed("analyze skew; delete from skew where id < 45;")
+    estimated, actual = explain_rows(skewed, "select id from skew where v <= 1;")[0][1:3]
+    assert actual == "45" and abs(int(estimated) - 45) <= 10
@@ -0,0 +1,37 @@
+import pytest
+from databaseRepository import ColumnDefinition
+from rowCodec import RowCodec, PARSERS, FORMATTERS, INT_MIN, INT_MAX
+
+COLUMNS = [
+    ColumnDefinition("id", "int", None, True),
+    ColumnDefinition("name", "char", 10, False),
+    ColumnDefinition("born", "date", None, False),
+    ColumnDefinition("note", "char", 20, False),
+]
+
+ROWS = [
+    [1, "ann", PARSERS["date"]("2000-01-01"), "x"],
+    [INT_MIN, "", PARSERS["date"]("0001-01-01"), "한글 텍스트"],
+    [INT_MAX, None, PARSERS["date"]("9999-12-31"), None],
+    [-5, "a\x00b", None, ""],
+]
+
+@pytest.mark.parametrize("row", ROWS)
+def test_round_trip(row):
+    codec = RowCodec(COLUMNS)
+    assert codec.decoder()(codec.encode(row)) == row
+
+@pytest.mark.parametrize("row", ROWS)
+def test_decode_some_columns(row):
+    codec = RowCodec(COLUMNS)
+    assert codec.decoder([3, 0])(codec.encode(row)) == [row[3], row[0]]
+
+def test_null_bitmap_of_many_columns():
+    columns = [ColumnDefinition(f"c{number}", "int", None, False) for number in range(17)]
+    row = [None if number % 3 == 0 else number for number in range(17)]
+    codec = RowCodec(columns)
+    assert codec.decoder()(codec.encode(row)) == row
+
+@pytest.mark.parametrize("data_type, text", [("int", "-42"), ("char", "text"), ("date", "2020-02-29")])
+def test_text_round_trip(data_type, text):
+    assert FORMATTERS[data_type](PARSERS[data_type](text)) == text
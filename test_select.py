@@ -0,0 +1,171 @@
+import pytest
+import databaseRepository
+from message import Message
+from rowCodec import RowCodec
+
+LIMIT_ERROR = Message.SelectLimitError.get_message()
+
+def result_rows(output):
+    return [[cell.strip() for cell in line.strip("|").split("|")] for line in output if line.startswith("|")][1:]
+
+def create_numbers(run_sql):
+    run_sql("create table numbers (n int, primary key (n)); insert into numbers values (1), (2), (3);")
+
+def test_limit(run_sql):
+    create_numbers(run_sql)
+    assert result_rows(run_sql("select n from numbers limit 2;")) == [["1"], ["2"]]
+
+def test_limit_date_is_an_error(run_sql):
+    create_numbers(run_sql)
+    assert run_sql("select * from numbers limit 2020-01-01;") == [LIMIT_ERROR]
+    # explain is not normalized by the statement cache, so the date is not a parameter there
+    assert run_sql("explain select * from numbers limit 2020-01-01;") == [Message.SyntaxError.get_message()]
+
+def test_limit_string_parameter_is_an_error(run_sql):
+    create_numbers(run_sql)
+    run_sql("prepare q as select * from numbers limit $1;")
+    assert run_sql("execute q ('abc');") == [LIMIT_ERROR]
+    # The prompt still runs the statements after the error
+    assert result_rows(run_sql("execute q (1);")) == [["1"]]
+
+def test_negative_limit_is_an_error(run_sql):
+    create_numbers(run_sql)
+    assert run_sql("select * from numbers limit -1;") == [LIMIT_ERROR]
+
+def test_select_does_not_write(repo, run_sql, monkeypatch):
+    create_numbers(run_sql)
+    # A table saved before the row counts were kept is counted by the statement which reads it
+    repo.dbInstance.delete_row_count("numbers")
+    repo.end_statement()
+    repo.tables["numbers"].row_count = None
+    def put(key, value):
+        raise AssertionError(f"{key} is written")
+    with monkeypatch.context() as patch:
+        patch.setattr(repo.dbInstance, "put", put)
+        assert result_rows(run_sql("select count(*) from numbers;")) == [["3"]]
+        assert result_rows(run_sql("select n from numbers where n > 2;")) == [["3"]]
+    # The count is kept in memory by the next statement which writes the table
+    run_sql("insert into numbers values (4);")
+    assert result_rows(run_sql("select count(*) from numbers;")) == [["4"]]
+
+def header(output):
+    return [cell.strip() for cell in next(line for line in output if line.startswith("|")).strip("|").split("|")]
+
+@pytest.fixture
+def wide(run_sql):
+    run_sql("create table wide (a int, b char(5), c int, d date);")
+    run_sql("insert into wide values (1, 'x', 10, 2020-01-01), (2, 'y', 20, 2021-01-01);")
+    return run_sql
+
+def test_selected_columns_in_their_order(wide):
+    output = wide("select c, wide.a as first from wide where b = 'y';")
+    assert header(output) == ["C", "FIRST"]
+    assert result_rows(output) == [["20", "2"]]
+
+def test_columns_of_an_alias(wide):
+    output = wide("select w.a as n, b from wide as w;")
+    assert header(output) == ["N", "B"]
+    assert result_rows(output) == [["1", "x"], ["2", "y"]]
+
+def test_unknown_column(wide):
+    assert wide("select e from wide;") == [Message.SelectColumnResolveError.get_message("e")]
+
+def test_only_the_used_columns_are_decoded(wide, monkeypatch):
+    decoded = []
+    decoder = RowCodec.decoder
+    def record(codec, positions=None):
+        decoded.append(positions)
+        return decoder(codec, positions)
+    monkeypatch.setattr(RowCodec, "decoder", record)
+    assert result_rows(wide("select c from wide where a = 1;")) == [["10"]]
+    assert [sorted(positions) for positions in decoded] == [[0, 2]]
+
+@pytest.fixture
+def streamed(repo, run_sql, monkeypatch):
+    """
+    A table of ten rows, whose result table is measured on two rows and written three rows at a time.
+    Returns the chunks of a select with the number of rows the scan had read when each was written.
+    """
+    monkeypatch.setattr(databaseRepository, "SAMPLE_SIZE", 2)
+    monkeypatch.setattr(databaseRepository, "CHUNK_SIZE", 3)
+    run_sql("create table names (n int, name char(10));")
+    run_sql("insert into names values " + ", ".join(f"({i}, 'n{i}')" for i in range(10)) + ";")
+    produced = []
+    scan_rows = repo.scan_rows
+    def counted_scan(*args, **kwargs):
+        for item in scan_rows(*args, **kwargs):
+            produced.append(item)
+            yield item
+    monkeypatch.setattr(repo, "scan_rows", counted_scan)
+    chunks = []
+    select = repo.select
+    def recorded_select(query):
+        result = select(query)
+        if isinstance(result, str):
+            return result
+        def chunked():
+            for chunk in result:
+                chunks.append((len(produced), chunk))
+                yield chunk
+        return chunked()
+    monkeypatch.setattr(repo, "select", recorded_select)
+    def run(text: str):
+        chunks.clear()
+        output = run_sql(text)
+        return output, chunks
+    return run
+
+def test_result_is_written_while_the_rows_are_read(streamed):
+    output, chunks = streamed("select n, name from names;")
+    assert result_rows(output) == [[str(i), f"n{i}"] for i in range(10)]
+    # The header is written once the sample is read, and each chunk once its rows are read
+    assert [read for read, _ in chunks] == [2, 3, 6, 9, 10]
+    assert [chunk.count("\n") for _, chunk in chunks[1:]] == [3, 3, 3, 2]
+
+def test_widths_of_a_result_longer_than_the_sample(streamed):
+    output, _ = streamed("select name from names;")
+    # The values are shorter than char(10), which is the width of the column unless the whole result is in the sample
+    assert output[1] == "+" + "-" * 12 + "+"
+    output, _ = streamed("select name from names where n < 1;")
+    assert output[1] == "+" + "-" * 6 + "+"
+
+@pytest.fixture
+def sales(run_sql):
+    run_sql("create table sales (id int not null, region char(5), amount int, primary key (id));")
+    run_sql("insert into sales values (1, 'n', 10), (2, 's', 20), (3, 'n', 30), (4, 'e', 5);")
+    run_sql("insert into sales (id, region) values (5, 's');")
+    return run_sql
+
+def test_aggregates_of_groups(sales):
+    output = sales("select region, count(*), count(amount), sum(amount), min(amount), max(amount), avg(amount) from sales group by region order by region;")
+    assert header(output) == ["REGION", "COUNT(*)", "COUNT(AMOUNT)", "SUM(AMOUNT)", "MIN(AMOUNT)", "MAX(AMOUNT)", "AVG(AMOUNT)"]
+    assert result_rows(output) == [
+        ["e", "1", "1", "5", "5", "5", "5.0000"],
+        ["n", "2", "2", "40", "10", "30", "20.0000"],
+        ["s", "2", "1", "20", "20", "20", "20.0000"],
+    ]
+
+def test_aggregate_of_no_rows(sales):
+    assert result_rows(sales("select count(*), sum(amount) as total from sales where amount > 100;")) == [["0", "null"]]
+
+def test_column_which_is_not_grouped(sales):
+    assert sales("select amount, count(*) from sales;") == [Message.SelectGroupByError.get_message("amount")]
+
+def test_count_of_a_table_is_not_a_scan(repo, sales, monkeypatch):
+    assert "RowCount of sales" in "\n".join(sales("explain select count(*) from sales;"))
+    def scan_rows(*args, **kwargs):
+        raise AssertionError("the table is scanned")
+    monkeypatch.setattr(repo, "scan_rows", scan_rows)
+    assert result_rows(sales("select count(*) from sales;")) == [["5"]]
+
+def test_order_by(sales):
+    # A null sorts before every value, so it is last in the descending order
+    assert result_rows(sales("select id, amount from sales order by amount desc, id;")) == [
+        ["3", "30"], ["2", "20"], ["1", "10"], ["4", "5"], ["5", "null"],
+    ]
+    assert result_rows(sales("select id from sales order by region, id desc;")) == [["4"], ["3"], ["1"], ["5"], ["2"]]
+
+def test_order_by_an_aggregate_with_limit(sales):
+    query = "select region, sum(amount) as total from sales group by region order by total desc limit 2;"
+    assert "TopN 2" in "\n".join(sales("explain " + query))
+    assert result_rows(sales(query)) == [["n", "40"], ["s", "20"]]
@@ -0,0 +1,72 @@
+import pytest
+from message import Message
+from run import DatabaseManagementSystem
+from sqlParser import load_parser
+from statementCache import StatementCache, ParameterError, MAX_CACHED_LENGTH, MAX_CACHED_LITERALS
+from test_select import result_rows
+
+@pytest.fixture(scope="module")
+def sql_parser():
+    return load_parser()
+
+def test_statements_of_one_shape_share_a_tree(sql_parser):
+    cache = StatementCache(sql_parser)
+    first = cache.parse("select * from t where a = 1 and b = 'x';")
+    second = cache.parse("select * from t where a = 2 and b = 'y';")
+    assert len(cache.trees) == 1
+    assert first == sql_parser.parse("select * from t where a = 1 and b = 'x';")
+    assert second == sql_parser.parse("select * from t where a = 2 and b = 'y';")
+
+def test_statement_with_many_literals_is_not_kept(sql_parser):
+    cache = StatementCache(sql_parser)
+    statement = "insert into t values " + ", ".join(f"({n})" for n in range(MAX_CACHED_LITERALS + 1)) + ";"
+    assert cache.parse(statement) == sql_parser.parse(statement)
+    assert len(cache.trees) == 0
+
+def test_long_statement_is_not_kept(sql_parser):
+    cache = StatementCache(sql_parser)
+    statement = "select * from t where " + " or ".join(["a = b"] * (MAX_CACHED_LENGTH // 8 + 1)) + ";"
+    assert cache.parse(statement) == sql_parser.parse(statement)
+    assert len(cache.trees) == 0
+
+@pytest.mark.parametrize("statement", [
+    "select * from t where a = $1;",
+    "explain select * from t where a = $1;",
+    "delete from t where a = $1;",
+    "update t set a = 2 where a = $1;",
+    "execute q ($1);",
+])
+def test_parameter_out_of_prepare(run_sql, statement):
+    run_sql("create table t (a int); prepare q as select * from t where a = $1;")
+    assert run_sql(statement) == [Message.ParameterOutOfPrepareError.get_message()]
+
+@pytest.mark.parametrize("condition", ["a = $0", "a = $2", "a = $1 or a = $3"])
+def test_parameters_must_be_numbered_from_one(run_sql, condition):
+    run_sql("create table t (a int);")
+    assert run_sql(f"prepare q as select * from t where {condition};") == [Message.PrepareParameterNumberError.get_message()]
+    assert run_sql("execute q;") == [Message.NoSuchPreparedStatement.get_message()]
+
+def test_execute_binds_the_parameters(run_sql):
+    run_sql("create table t (a int, b int); insert into t values (1, 2), (2, 1);")
+    assert run_sql("prepare q as select a from t where b = $2 and a = $1;") == [Message.PrepareSuccess.get_message("q")]
+    assert result_rows(run_sql("execute q (2, 1);")) == [["2"]]
+    assert run_sql("execute q (2);") == [Message.ExecuteParameterCountError.get_message()]
+
+def test_bind_of_a_missing_value(sql_parser):
+    tree = sql_parser.parse("prepare q as select * from t where a = $2;")
+    with pytest.raises(ParameterError):
+        StatementCache.bind(tree, [])
+
+def test_large_insert(run_sql):
+    run_sql("create table t (a int);")
+    values = ", ".join(f"({n})" for n in range(MAX_CACHED_LITERALS * 2))
+    assert run_sql(f"insert into t values {values};") == [Message.InsertManyResult.get_message(MAX_CACHED_LITERALS * 2)]
+    assert result_rows(run_sql("select count(*) from t;")) == [[str(MAX_CACHED_LITERALS * 2)]]
+
+def test_error_of_the_parser_itself_is_not_hidden(monkeypatch):
+    dbms = DatabaseManagementSystem()
+    def parse(statement):
+        raise RuntimeError("parser bug")
+    monkeypatch.setattr(dbms.statement_cache, "parse", parse)
+    with pytest.raises(RuntimeError):
+        dbms.parse_queries(["select * from t"])
@@ -0,0 +1,44 @@
+import pytest
+from tableStatistics import ColumnStatistics, TableStatistics, REGISTER_COUNT
+
+@pytest.mark.parametrize("count", [0, 1, 10, 200, 5000])
+def test_distinct_count(count):
+    column = ColumnStatistics()
+    column.add_values(list(range(count)) * 2)
+    assert column.distinct_count() == pytest.approx(count, rel=0.1, abs=0.5)
+
+def test_nulls_and_bounds():
+    column = ColumnStatistics()
+    column.add_values([3, None, 1, 7, None])
+    assert (column.null_count, column.minimum, column.maximum) == (2, 1, 7)
+    assert column.null_fraction(5) == 0.4
+    assert column.equal_fraction(8, 5) == 0.0
+    assert column.equal_fraction(3, 5) == pytest.approx(0.2)
+
+def test_range_from_the_bounds_of_the_numbers():
+    column = ColumnStatistics()
+    column.add_values(list(range(101)))
+    assert column.range_fraction(None, 50, 101) == pytest.approx(0.5)
+    assert column.range_fraction(200, None, 101) == 0.0
+    # The chars are not spread evenly enough to be estimated from their bounds
+    texts = ColumnStatistics()
+    texts.add_values(["a", "z"])
+    assert texts.range_fraction("m", None, 2) is None
+
+def test_histogram_of_analyze():
+    # Nine tenths of the rows are 0, the others spread over 1..1000
+    rows = [[0 if number % 10 else number, str(number)] for number in range(1, 10001)]
+    statistics, row_count = TableStatistics.analyze(["a", "b"], iter(rows))
+    assert row_count == 10000
+    column = statistics.get_column("a")
+    assert column.range_fraction(None, 0, row_count) == pytest.approx(0.9, abs=0.05)
+    assert column.range_fraction(1, None, row_count) == pytest.approx(0.1, abs=0.05)
+    # Removed rows are taken out of the histogram
+    statistics.remove_rows(rows[:1000])
+    assert column.range_fraction(None, 0, 9000) == pytest.approx(0.9, abs=0.05)
+
+def test_statistics_are_saved_as_they_are():
+    statistics, _ = TableStatistics.analyze(["a"], iter([[number] for number in range(100)] + [[None]]))
+    loaded = TableStatistics(["a"], statistics.to_dict())
+    assert loaded.to_dict() == statistics.to_dict()
+    assert len(loaded.get_column("a").registers) == REGISTER_COUNT
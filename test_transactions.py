@@ -0,0 +1,110 @@
+import threading
+import pytest
+from bulkLoader import BulkLoader
+from dbServer import ReadWriteLock, Session
+from message import Message
+from sqlParser import load_parser
+from test_select import result_rows
+from writeBuffer import WriteBuffer
+
+def fail_index_writes(repo, patch):
+    """
+    Makes the statements fail after their rows are written, when the entries of the indexes are written.
+    """
+    def add_index_entries(table_name, index_name, entries):
+        raise RuntimeError("disk is full")
+    patch.setattr(repo.dbInstance, "add_index_entries", add_index_entries)
+
+@pytest.fixture
+def numbers(run_sql):
+    run_sql("create table numbers (n int, primary key (n)); insert into numbers values (1), (2);")
+    return run_sql
+
+@pytest.mark.parametrize("level", ["off", "batch"])
+def test_failed_statement_is_rolled_back(repo, numbers, monkeypatch, level):
+    repo.dbInstance.write_buffer = WriteBuffer(level)
+    with monkeypatch.context() as patch:
+        fail_index_writes(repo, patch)
+        output = numbers("insert into numbers values (3), (4); select count(*) from numbers;")
+    assert output[0] == Message.StatementError.get_message(repr(RuntimeError("disk is full")))
+    assert result_rows(output[1:]) == [["2"]]
+
+    numbers("insert into numbers values (3);")
+    assert result_rows(numbers("select n from numbers where n > 1;")) == [["2"], ["3"]]
+
+def test_failed_statement_in_transaction_keeps_the_others(repo, numbers, monkeypatch):
+    numbers("begin; insert into numbers values (3);")
+    with monkeypatch.context() as patch:
+        fail_index_writes(repo, patch)
+        assert numbers("insert into numbers values (4);")[0].startswith("Statement has failed")
+    assert repo.in_transaction()
+    numbers("commit;")
+    assert result_rows(numbers("select count(*) from numbers;")) == [["3"]]
+
+def test_failed_read_ends_its_snapshot(repo, numbers, monkeypatch):
+    assert repo.begin_read()
+    def plan_select(query):
+        raise RuntimeError("planner bug")
+    with monkeypatch.context() as patch:
+        patch.setattr(repo.planner, "plan_select", plan_select)
+        assert numbers("select * from numbers;")[0].startswith("Statement has failed")
+    assert not repo.reads_snapshot()
+    assert result_rows(numbers("select count(*) from numbers;")) == [["2"]]
+
+def test_abort_puts_back_the_records_which_were_taken():
+    buffer = WriteBuffer("deferred")
+    buffer.put(b"a", b"1")
+    buffer.end_statement()
+    buffer.put(b"a", b"2")
+    buffer.put(b"b", b"3")
+    assert buffer.take() == [(b"a", b"2"), (b"b", b"3")]
+    buffer.put(b"c", b"4")
+    buffer.abort_statement(written=False)
+    assert buffer.take() == [(b"a", b"1")]
+
+def test_snapshot_never_sees_half_of_a_statement(repo, monkeypatch, tmp_path):
+    """
+    One session writes pairs of rows whose amounts add up to 0, each pair in one statement,
+    while another reads in snapshots: every read sees whole statements, so an even count and sums of 0.
+    The writer also loads files which fail after their first row is written, which must never be seen.
+    """
+    monkeypatch.setattr(BulkLoader.read_batches, "__defaults__", (1,))
+    failing = tmp_path / "failing.csv"
+    failing.write_text("id,pair,grp,amount\n-1,-1,0,1\n-2,-1,0,x\n")
+    lock = ReadWriteLock()
+    writer = Session(load_parser(), lock)
+    reader = Session(load_parser(), lock)
+    def run(session, text):
+        output = []
+        session.run(text, output.append)
+        return result_rows("".join(output).splitlines())
+    run(writer, "create table ledger (id int, pair int, grp int, amount int, primary key (id));")
+    run(writer, "create index ledger_grp on ledger (grp);")
+
+    done = threading.Event()
+    def write():
+        try :
+            for pair in range(100):
+                run(writer, f"insert into ledger values ({pair * 2}, {pair}, {pair % 3}, {pair}), ({pair * 2 + 1}, {pair}, {pair % 3}, {-pair});")
+                if pair % 3 == 1:
+                    run(writer, f"update ledger set grp = 2 where pair = {pair - 1};")
+                if pair % 5 == 4:
+                    run(writer, f"delete from ledger where pair = {pair - 2};")
+                if pair % 4 == 0:
+                    assert run(writer, f"load data '{failing}' into ledger;") == []
+        finally :
+            done.set()
+    thread = threading.Thread(target=write)
+    thread.start()
+
+    reads = 0
+    while not done.is_set() or reads == 0:
+        [[count]] = run(reader, "select count(*) from ledger;")
+        assert int(count) % 2 == 0
+        [[total]] = run(reader, "select sum(amount) from ledger;")
+        assert total in ("0", "null")
+        [[total]] = run(reader, "select sum(amount) from ledger where grp = 2;")
+        assert total in ("0", "null")
+        reads += 1
+    thread.join()
+    assert run(reader, "select count(*) from ledger;") == [[str(100 * 2 - 20 * 2)]]
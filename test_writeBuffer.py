@@ -0,0 +1,93 @@
+import pytest
+from databaseRepository import DatabaseRepository
+from test_select import result_rows
+from writeBuffer import WriteBuffer, DELETED
+
+def test_record_written_again_is_kept_once():
+    buffer = WriteBuffer("deferred")
+    buffer.put(b"b", b"1")
+    buffer.put(b"a", b"1")
+    buffer.put(b"b", b"2")
+    buffer.put(b"c", DELETED)
+    assert buffer.take() == [(b"a", b"1"), (b"b", b"2"), (b"c", DELETED)]
+    assert buffer.is_empty()
+
+def test_records_are_due_by_level():
+    batch = WriteBuffer("batch", time_limit=0)
+    assert not batch.is_due(end_of_batch=True)
+    batch.put(b"a", b"1")
+    assert not batch.is_due(end_of_batch=False) and batch.is_due(end_of_batch=True)
+    deferred = WriteBuffer("deferred", time_limit=3600)
+    deferred.put(b"a", b"1")
+    assert not deferred.is_due(end_of_batch=True)
+    deferred.time_limit = 0
+    assert deferred.is_due(end_of_batch=False)
+    full = WriteBuffer("deferred", record_limit=2, time_limit=3600)
+    full.put(b"a", b"1")
+    full.put(b"b", b"1")
+    assert full.is_due(end_of_batch=False)
+
+@pytest.fixture
+def taken(repo, monkeypatch):
+    """
+    The records written to the db from the buffer, a list of them for each time it is emptied.
+    """
+    writes = []
+    def take():
+        items = WriteBuffer.take(repo.dbInstance.write_buffer)
+        if items:
+            writes.append(items)
+        return items
+    def use(level: str, **limits):
+        repo.dbInstance.write_buffer = WriteBuffer(level, **limits)
+        monkeypatch.setattr(repo.dbInstance.write_buffer, "take", take)
+        return writes
+    return use
+
+def test_off_writes_each_statement(repo, run_sql, taken):
+    writes = taken("off")
+    run_sql("create table t (a int); insert into t values (1); insert into t values (2);")
+    assert not repo.has_pending_writes()
+    assert writes == []
+
+def test_batch_writes_at_the_end_of_the_batch(repo, run_sql, taken):
+    writes = taken("batch")
+    run_sql("create table t (a int, primary key (a)); insert into t values (1); insert into t values (2); update t set a = 3 where a = 2;")
+    assert not repo.has_pending_writes()
+    # The statements of the line are written at once, the row written twice only once
+    assert len(writes) == 1
+    rows = [key for key, _ in writes[0] if key.startswith(repo.dbInstance.row_prefix("t"))]
+    assert len(rows) == 2
+    assert result_rows(run_sql("select a from t;")) == [["1"], ["3"]]
+
+def test_deferred_keeps_the_records_across_batches(repo, run_sql, taken):
+    writes = taken("deferred", time_limit=3600)
+    run_sql("create table t (a int);")
+    run_sql("insert into t values (1);")
+    assert repo.has_pending_writes() and writes == []
+    # The statements read the records which are kept
+    assert result_rows(run_sql("select a from t;")) == [["1"]]
+    run_sql("begin;")
+    assert not repo.has_pending_writes() and len(writes) == 1
+    run_sql("insert into t values (2);")
+    # In BEGIN the records go to the transaction
+    assert not repo.has_pending_writes()
+    run_sql("commit;")
+
+def test_deferred_records_are_written_once_they_are_old(repo, run_sql, taken):
+    writes = taken("deferred", time_limit=3600)
+    run_sql("create table t (a int); insert into t values (1);")
+    repo.dbInstance.write_buffer.time_limit = 0
+    run_sql("insert into t values (2);")
+    assert not repo.has_pending_writes() and len(writes) == 1
+
+def test_deferred_records_are_written_on_exit(repo, run_sql, taken):
+    taken("deferred", time_limit=3600)
+    run_sql("create table t (a int); insert into t values (1), (2);")
+    assert repo.has_pending_writes()
+    repo.close()
+    repository = DatabaseRepository()
+    try :
+        assert len(list(repository.dbInstance.iter_rows("t"))) == 2
+    finally :
+        repository.close()
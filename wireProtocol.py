@@ -0,0 +1,54 @@
+import asyncio
+import socket
+from typing import Optional
+
+# A frame is the byte length of its payload (4 bytes big endian) followed by the payload.
+# The client sends the text of one or more statements in a frame.
+# The server answers with the output of the statements in one or more frames, and then an empty frame
+# followed by a frame of one byte, the status of the session: whether it is in a transaction of BEGIN.
+LENGTH_SIZE = 4
+MAX_FRAME_SIZE = 64 * 1024 * 1024
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 5433
+STATUS_IDLE = b"I"
+STATUS_IN_TRANSACTION = b"T"
+
+class ProtocolError(Exception):
+    pass
+
+def encode_frame(payload: bytes) -> bytes:
+    return len(payload).to_bytes(LENGTH_SIZE, 'big') + payload
+
+def encode_end(in_transaction: bool) -> bytes:
+    """
+    The frames which end a response, for a session in a transaction or not.
+    """
+    return encode_frame(b"") + encode_frame(STATUS_IN_TRANSACTION if in_transaction else STATUS_IDLE)
+
+def decode_length(header: bytes) -> int:
+    length = int.from_bytes(header, 'big')
+    if length > MAX_FRAME_SIZE:
+        raise ProtocolError(f"Frame of {length} bytes is too large")
+    return length
+
+async def read_frame(reader: asyncio.StreamReader) -> Optional[bytes]:
+    """
+    Returns the payload of the next frame, or None if the connection is closed.
+    """
+    try :
+        header = await reader.readexactly(LENGTH_SIZE)
+        return await reader.readexactly(decode_length(header))
+    except asyncio.IncompleteReadError:
+        return None
+
+def recv_exactly(sock: socket.socket, size: int) -> bytes:
+    data = bytearray()
+    while len(data) < size:
+        chunk = sock.recv(size - len(data))
+        if not chunk:
+            raise ProtocolError("Connection is closed")
+        data += chunk
+    return bytes(data)
+
+def recv_frame(sock: socket.socket) -> bytes:
+    return recv_exactly(sock, decode_length(recv_exactly(sock, LENGTH_SIZE)))
@@ -0,0 +1,155 @@
+import os
+import threading
+import time
+from bisect import bisect_left, insort
+from typing import Dict, List, Optional, Tuple
+
+# MYDB_WRITE_BEHIND is how long the records written by the statements may stay in memory before they are written to the db:
+#   off       every statement is written and committed at its end (nothing is lost in a crash)
+#   batch     the records of a batch of statements (a line of the prompt, a request of a client) are written and
+#             committed at once at its end (a crash loses the statements of the batch which is running)
+#   deferred  the records are kept across batches until MYDB_WRITE_BEHIND_MS have passed since the oldest of them
+#             (a crash loses the statements of that window)
+# In every level they are also written at EXIT, BEGIN, COMMIT, and once MYDB_WRITE_BEHIND_RECORDS of them are kept.
+WRITE_BEHIND = os.environ.get("MYDB_WRITE_BEHIND", "off").lower()
+WRITE_BEHIND_RECORDS = int(os.environ.get("MYDB_WRITE_BEHIND_RECORDS", "10000"))
+WRITE_BEHIND_MS = int(os.environ.get("MYDB_WRITE_BEHIND_MS", "1000"))
+
+# The value of a key which is deleted
+DELETED = None
+
+class WriteBuffer:
+    """
+    The records which are written but not yet in the db, by key, DELETED for a deleted one.
+    A record written again replaces the one which is kept, so a key which every statement writes,
+    like the row count of a table, is written to the db once per flush.
+    The keys are also kept sorted, so that the records in a key range are merged into a cursor.
+    The buffer is shared by the threads, since the statements which write run one at a time.
+
+    What the statement which is running changed is remembered until its transaction commits (end_statement),
+    so that abort_statement puts back the records as they were before it, including those it took to write them.
+    """
+    def __init__(self, level: str = WRITE_BEHIND, record_limit: int = WRITE_BEHIND_RECORDS, time_limit: float = WRITE_BEHIND_MS / 1000) -> None:
+        self.level = level
+        self.record_limit = record_limit
+        self.time_limit = time_limit
+        self.records: Dict[bytes, Optional[bytes]] = {}
+        self.keys: List[bytes] = []
+        # perf_counter of the oldest record which is kept
+        self.since: Optional[float] = None
+        self.lock = threading.Lock()
+        # (kept, value) of each key before the statement first wrote it
+        self.undo: Dict[bytes, Tuple[bool, Optional[bytes]]] = {}
+        # Records which the statement took to write them in its transaction
+        self.taken: Dict[bytes, Optional[bytes]] = {}
+
+    def is_enabled(self) -> bool:
+        return self.level != "off"
+
+    def is_empty(self) -> bool:
+        return not self.records
+
+    def put(self, key: bytes, value: Optional[bytes]):
+        with self.lock:
+            if key not in self.undo:
+                if key in self.records:
+                    self.undo[key] = (True, self.records[key])
+                else :
+                    self.undo[key] = (key in self.taken, self.taken.get(key))
+            if key not in self.records:
+                insort(self.keys, key)
+            self.records[key] = value
+            if self.since is None:
+                self.since = time.perf_counter()
+
+    def get(self, key: bytes) -> Tuple[bool, Optional[bytes]]:
+        """
+        Returns whether the key is kept, and its value.
+        """
+        with self.lock:
+            if key in self.records:
+                return True, self.records[key]
+            return False, None
+
+    def items_from(self, start: bytes, in_range, reverse: bool = False) -> List[Tuple[bytes, Optional[bytes]]]:
+        """
+        The records from the start key as long as in_range(key) is true, in key order,
+        as they are now, so that a cursor is not changed by the writes made while it is read.
+        With reverse, the records before the start key in the reverse order.
+        """
+        with self.lock:
+            items = []
+            if reverse:
+                positions = range(bisect_left(self.keys, start) - 1, -1, -1)
+            else :
+                positions = range(bisect_left(self.keys, start), len(self.keys))
+            for position in positions:
+                key = self.keys[position]
+                if not in_range(key):
+                    break
+                items.append((key, self.records[key]))
+            return items
+
+    def last_key(self, prefix: bytes) -> Optional[bytes]:
+        """
+        The largest key starting with the prefix which is written and not deleted.
+        The prefix ends with a separator, which is not the largest byte.
+        """
+        with self.lock:
+            position = bisect_left(self.keys, prefix[:-1] + bytes([prefix[-1] + 1]))
+            while position > 0 and self.keys[position - 1].startswith(prefix):
+                position -= 1
+                if self.records[self.keys[position]] is not DELETED:
+                    return self.keys[position]
+            return None
+
+    def is_due(self, end_of_batch: bool) -> bool:
+        """
+        Whether the records are to be written: when there are too many of them, at the end of a batch
+        for the batch level, and when the oldest is too old for the deferred level.
+        """
+        if not self.records:
+            return False
+        if len(self.records) >= self.record_limit:
+            return True
+        if self.level == "batch":
+            return end_of_batch
+        return time.perf_counter() - self.since >= self.time_limit
+
+    def take(self) -> List[Tuple[bytes, Optional[bytes]]]:
+        """
+        Empties the buffer, and returns its records in key order, which is the order of the pages of the B-tree.
+        """
+        with self.lock:
+            items = [(key, self.records[key]) for key in self.keys]
+            self.taken.update(self.records)
+            self.records = {}
+            self.keys = []
+            self.since = None
+            return items
+
+    def end_statement(self):
+        """
+        The statement is committed, with the records it took.
+        """
+        with self.lock:
+            self.undo = {}
+            self.taken = {}
+
+    def abort_statement(self, written: bool):
+        """
+        Puts back the records as they were before the statement. The records it took are put back
+        unless they are written, which they are when the db has no transactions to abort.
+        """
+        with self.lock:
+            records = self.records if written else {**self.taken, **self.records}
+            for key, (kept, value) in self.undo.items():
+                if kept:
+                    records[key] = value
+                else :
+                    records.pop(key, None)
+            self.records = records
+            self.keys = sorted(records)
+            self.since = None if not records else self.since or time.perf_counter()
+            self.undo = {}
+            self.taken = {}